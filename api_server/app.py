@@ -1,24 +1,152 @@
+import json
 import os
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, cast
 
-from flask import Flask, render_template, request
-from pandas import DataFrame
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 
-from motion_title_generator.motion_title_generator import MotionTitleGenerator
-from utils.text import prep_text
+from api_server.batcher import MicroBatcher
+from api_server.cache import PredictionCache
+from api_server.jobs import JobQueue
+from api_server.model_loader import ModelLoader, ModelNotReady
+from motion_title_generator.motion_title_generator import (
+    MotionTitleGenerator,
+    get_model_id,
+)
+from utils.decoding import DecodingConfig
+from utils.encode_decode import STREAM_DECODING
+from utils.text import clean_text
 
 os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Do not use GPU
 
+MIN_TEXT_LENGTH = 300
+# Requests with more texts than this are run as jobs, unless mode is "sync"
+SYNC_MAX_TEXTS = int(os.environ.get("PREDICT_SYNC_MAX_TEXTS", 8))
+MAX_JOB_TEXTS = int(os.environ.get("PREDICT_MAX_JOB_TEXTS", 10000))
+RETRY_AFTER_SECONDS = 5
+
 
 app = Flask(__name__)
-model = MotionTitleGenerator()
+# The model is loaded in the background unless MODEL_LOADING is "eager", so
+# that /health answers right away and /ready tells when titles can be made
+model_loader: ModelLoader[MotionTitleGenerator] = ModelLoader(MotionTitleGenerator)
+if os.environ.get("MODEL_LOADING", "background") == "eager":
+    model_loader.load()
+else:
+    model_loader.start()
+batcher = MicroBatcher.from_env(
+    lambda texts, decoding=None: model_loader.get().predict_batch(
+        texts, decoding=decoding
+    )
+)
+cache = PredictionCache.from_env(get_model_id())
+# Streamed titles are decoded with other settings, so they are cached apart
+stream_cache = PredictionCache.from_env(get_model_id(decoding=STREAM_DECODING))
+
+
+def predict_titles(
+    texts: List[str], predict_fn: Callable[[List[str]], List[str]]
+) -> List[str]:
+    """Return the titles of cleaned texts, using cached titles where there are
+    any and predicting and caching the rest with `predict_fn`.
+    """
+    titles = [cache.get(text) if cache is not None else None for text in texts]
+    missing = [i for i, title in enumerate(titles) if title is None]
+    if missing:
+        preds = predict_fn([texts[i] for i in missing])
+        for i, pred in zip(missing, preds):
+            titles[i] = pred
+            if cache is not None:
+                cache.set(texts[i], pred)
+    # Every missing title has been predicted
+    return cast(List[str], titles)
+
+
+def predict_with_batcher(
+    texts: List[str], decoding: Optional[DecodingConfig] = None
+) -> List[str]:
+    """Predict titles through the batcher, to batch them with other requests
+    of the same decoding settings.
+    """
+    futures = [batcher.submit(text, decoding) for text in texts]
+    return [future.result() for future in futures]
+
+
+# Jobs call the model directly, so they don't hold up the batcher's queue
+jobs = JobQueue.from_env(
+    lambda texts: predict_titles(texts, model_loader.get().predict_batch)
+)
 
 
 @app.route("/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint, that fails if the model could not be loaded."""
+    if model_loader.error is not None:
+        return "Failed to load the model", 500
     return "OK"
 
 
+@app.route("/ready")
+def readiness_check():
+    """Readiness check endpoint, that fails until the model is loaded."""
+    if model_loader.error is not None:
+        return "Failed to load the model", 500
+    if not model_loader.ready:
+        return "Loading the model", 503, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+    return "OK"
+
+
+class InvalidRequest(ValueError):
+    """A request that can't be answered, with the status and details of the
+    error response.
+    """
+
+    def __init__(self, message: str, status: int = 400, **details) -> None:
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+@app.errorhandler(InvalidRequest)
+def invalid_request(error):
+    """Tell the client what is wrong with its request."""
+    return _error(str(error), error.status, **error.details)
+
+
+@app.errorhandler(ModelNotReady)
+def model_not_ready(error):
+    """Ask clients to come back when the model is loaded."""
+    response, status = _error(str(error), 503)
+    return response, status, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+
+
+def require_model() -> MotionTitleGenerator:
+    """Return the model, or raise ModelNotReady if it is still loading."""
+    return model_loader.get(timeout=0)
+
+
+@app.route("/cache_stats")
+def cache_stats():
+    """Return the hit and miss counts of the prediction cache, of the
+    streamed titles' cache under "stream", and of the model's encoder output
+    cache under "encoder" once the model is loaded.
+    """
+    stats: Dict[str, Any] = dict(cache.stats()) if cache is not None else {}
+    if stream_cache is not None:
+        stats["stream"] = stream_cache.stats()
+    if model_loader.ready and model_loader.get().encoder_cache is not None:
+        stats["encoder"] = model_loader.get().encoder_cache.stats()
+    return jsonify(stats)
+
+
 @app.route("/")
 def home():
     """Render prediction input form."""
@@ -32,18 +160,174 @@ def predict():
     if not text:
         return "Please enter some text"
 
-    text = prep_text(DataFrame({"text": [text]}), has_title_cols=False)[0]
-    if len(text) < 300:
+    text = clean_text(text)
+    if len(text) < MIN_TEXT_LENGTH:
         pred = "Please enter a longer text"
+    elif not model_loader.ready:
+        pred = "The model is still loading, please try again in a moment"
     else:
-        pred = model.predict(text)
+        pred = predict_titles([text], predict_with_batcher)[0]
 
     return render_template("predict_form.html", text=text or "", pred=pred or "")
 
 
+def _error(message: str, status: int, **details):
+    """Return a JSON error response."""
+    return jsonify({"error": message, **details}), status
+
+
+def _parse_texts(body) -> List[str]:
+    """Return the cleaned texts of a /v1/titles request body, or raise
+    InvalidRequest if they are missing or invalid.
+    """
+    if not isinstance(body, dict):
+        raise InvalidRequest("Expected a JSON object with 'text' or 'texts'")
+    texts = [body["text"]] if "text" in body else body.get("texts")
+    if not isinstance(texts, list) or not texts:
+        raise InvalidRequest("Expected 'text' or a non-empty list of 'texts'")
+    if not all(isinstance(text, str) for text in texts):
+        raise InvalidRequest("Texts must be strings")
+    if len(texts) > MAX_JOB_TEXTS:
+        raise InvalidRequest(f"At most {MAX_JOB_TEXTS} texts are allowed", 413)
+
+    texts = [clean_text(text) for text in texts]
+    too_short = [i for i, text in enumerate(texts) if len(text) < MIN_TEXT_LENGTH]
+    if too_short:
+        raise InvalidRequest(
+            f"Texts must be at least {MIN_TEXT_LENGTH} characters long",
+            too_short=too_short,
+        )
+    return texts
+
+
+def _parse_decoding(
+    body: Dict, model: MotionTitleGenerator
+) -> Optional[DecodingConfig]:
+    """Return the decoding settings of a request body, or None if it has
+    none or they are the model's own. Raises InvalidRequest if they are
+    invalid or can't be used with the model.
+    """
+    if body.get("decoding") is None:
+        return None
+    if not isinstance(body["decoding"], dict):
+        raise InvalidRequest("Decoding settings must be an object")
+    try:
+        decoding = DecodingConfig.from_dict(body["decoding"], model.decoding)
+        model.check_decoding(decoding)
+    except ValueError as e:
+        raise InvalidRequest(str(e)) from e
+    if decoding.strategy == "speculative" and not model.draft_model_loaded:
+        # Loading it in a request would copy the model in every worker
+        raise InvalidRequest(
+            "Speculative decoding is only available when the draft model is "
+            "loaded at startup, see PREDICT_DRAFT_MODEL"
+        )
+    return decoding if decoding != model.decoding else None
+
+
+@app.route("/v1/titles", methods=["POST"])
+def generate_titles():
+    """Generate titles for the texts in a JSON body.
+
+    The body holds either "text", a string, or "texts", a list of strings.
+    Titles of at most PREDICT_SYNC_MAX_TEXTS texts are returned right away.
+    More texts are titled in a background job, and the response is a 202 with
+    the job's id and a Location header where the job's status and titles can
+    be polled. Set "mode" to "sync" or "async" to choose. An optional
+    "decoding" object overrides the model's decoding settings, see
+    `utils.decoding.DecodingConfig.to_dict`, and such titles are not cached.
+    """
+    body = request.get_json(silent=True)
+    texts = _parse_texts(body)
+    model = require_model()
+    decoding = _parse_decoding(body, model)
+    predict_fn: Optional[Callable[[List[str]], List[str]]] = None
+    if decoding is not None:
+        predict_fn = partial(model.predict_batch, decoding=decoding)
+
+    mode = body.get("mode") or ("sync" if len(texts) <= SYNC_MAX_TEXTS else "async")
+    if mode == "sync":
+        if len(texts) > SYNC_MAX_TEXTS:
+            return _error(f"At most {SYNC_MAX_TEXTS} texts are titled in sync", 400)
+        if decoding is not None:
+            return jsonify({"titles": predict_with_batcher(texts, decoding)})
+        return jsonify({"titles": predict_titles(texts, predict_with_batcher)})
+    if mode == "async":
+        job = jobs.submit(texts, predict_fn)
+        location = url_for("job_status", job_id=job.id)
+        return jsonify(job.to_dict()), 202, {"Location": location}
+    return _error("Mode must be 'sync' or 'async'", 400)
+
+
+def _event(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/v1/titles/stream", methods=["POST"])
+def stream_title():
+    """Stream the title of a text as server-sent events while it is decoded.
+
+    The text is read from a JSON body's "text" or a form's "text" field. Each
+    "token" event holds the new piece of the title and the title so far, and
+    a final "done" event holds the whole title. Streamed titles are cached
+    apart from the other endpoints' titles, as they are decoded differently,
+    and a cached title is sent in one piece. Errors during generation are sent
+    as an "error" event. The generation stops if the client disconnects.
+    """
+    body = request.get_json(silent=True)
+    text = body.get("text") if isinstance(body, dict) else request.form.get("text")
+    if not isinstance(text, str):
+        return _error("Expected a 'text'", 400)
+    text = clean_text(text)
+    if len(text) < MIN_TEXT_LENGTH:
+        return _error(f"Texts must be at least {MIN_TEXT_LENGTH} characters long", 400)
+    model = require_model()
+
+    def events() -> Iterator[str]:
+        cached = stream_cache.get(text) if stream_cache is not None else None
+        if cached is not None:
+            yield _event("token", {"text": cached, "title": cached})
+            yield _event("done", {"title": cached})
+            return
+        pieces = model.predict_stream(text)
+        title = ""
+        try:
+            for piece in pieces:
+                title += piece
+                yield _event("token", {"text": piece, "title": title})
+        except Exception as e:  # pylint: disable=broad-except
+            app.logger.exception("Streaming a title failed.")
+            yield _event("error", {"error": str(e)})
+            return
+        finally:
+            # Stops the generation if the client has disconnected
+            pieces.close()
+        title = title.strip()
+        if stream_cache is not None:
+            stream_cache.set(text, title)
+        yield _event("done", {"title": title})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/v1/jobs/<job_id>")
+def job_status(job_id: str):
+    """Return the status of a job, and its titles when it is done."""
+    job = jobs.get(job_id)
+    if job is None:
+        return _error(f"No job with id {job_id}", 404)
+    return jsonify(job.to_dict())
+
+
 def main():
     """Run the app."""
-    app.run(host="0.0.0.0", port=8000, debug=False)  # nosec
+    port = int(os.environ.get("PORT", 8000))
+    app.run(host="0.0.0.0", port=port, debug=False, threaded=True)  # nosec
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, List, Optional, Tuple
+
+from utils.decoding import DecodingConfig
+from utils.log import logger
+
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 10.0
+# A queued text, its decoding settings and the future of its title
+Item = Tuple[str, Optional[DecodingConfig], Future]
+
+
+class MicroBatcher:
+    """Collect texts arriving within `max_wait_ms` and predict them together."""
+
+    def __init__(
+        self,
+        predict_fn: Callable[..., List[str]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Item]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, predict_fn: Callable[..., List[str]]):
+        """Create a batcher configured by environment variables."""
+        return cls(
+            predict_fn,
+            max_batch_size=int(
+                os.environ.get("PREDICT_MAX_BATCH_SIZE", MAX_BATCH_SIZE)
+            ),
+            max_wait_ms=float(os.environ.get("PREDICT_MAX_WAIT_MS", MAX_WAIT_MS)),
+        )
+
+    def submit(self, text: str, decoding: Optional[DecodingConfig] = None) -> Future:
+        """Queue a text for prediction and return a future holding its title.
+        The title is decoded as set by `decoding`, if given.
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, decoding, future))
+        return future
+
+    def predict(
+        self,
+        text: str,
+        timeout: Optional[float] = None,
+        decoding: Optional[DecodingConfig] = None,
+    ) -> str:
+        """Queue a text for prediction and block until its title is ready."""
+        return self.submit(text, decoding).result(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread if it isn't running in this process."""
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            if self._worker_pid is not None:
+                # Threads don't survive a fork, and neither should queued items
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(
+                target=self._run, name="predict-batcher", daemon=True
+            )
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _collect_batch(self, held: Deque[Item]) -> List[Item]:
+        """Block for one request, then gather more with the same decoding
+        settings until the batch is full or the wait window has closed.
+        Requests with other settings are added to `held`, the requests taken
+        off the queue that wait for a later batch, which are batched first.
+        """
+        batch = [held.popleft() if held else self._queue.get()]
+        decoding = batch[0][1]
+        for _ in range(len(held)):
+            item = held.popleft()
+            if item[1] == decoding and len(batch) < self.max_batch_size:
+                batch.append(item)
+            else:
+                held.append(item)
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[1] == decoding:
+                batch.append(item)
+            else:
+                held.append(item)
+        return batch
+
+    def _run(self) -> None:
+        """Predict batches of queued texts until the process exits."""
+        held: Deque[Item] = deque()
+        while True:
+            batch = self._collect_batch(held)
+            # Skip requests whose callers have given up on them
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            decoding = batch[0][1]
+            logger.debug("Predicting batch of %s texts.", len(texts))
+            try:
+                if decoding is None:
+                    preds = self.predict_fn(texts)
+                else:
+                    preds = self.predict_fn(texts, decoding=decoding)
+                if len(preds) != len(texts):
+                    raise RuntimeError(
+                        f"Got {len(preds)} predictions for {len(texts)} texts"
+                    )
+            except Exception as e:  # pylint: disable=broad-except
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), pred in zip(batch, preds):
+                future.set_result(pred)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from api_server.shared_db import SharedDatabase
+from utils.log import logger
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 24 * 60 * 60
+# Rows in the disk tier are only pruned every this many writes
+PRUNE_INTERVAL = 100
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS titles "
+    "(key TEXT PRIMARY KEY, title TEXT NOT NULL, created REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS titles_created ON titles (created)",
+)
+
+
+class PredictionCache:  # pylint: disable=too-many-instance-attributes
+    """LRU cache of titles, optionally shared between processes through SQLite."""
+
+    def __init__(
+        self,
+        model_id: str,
+        max_entries: int = MAX_ENTRIES,
+        ttl_seconds: float = TTL_SECONDS,
+        path: Optional[str] = None,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.database = SharedDatabase(path, SCHEMA) if path is not None else None
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, model_id: str) -> Optional["PredictionCache"]:
+        """Create a cache configured by environment variables, or return None
+        if caching is turned off with PREDICT_CACHE_SIZE=0.
+        """
+        max_entries = int(os.environ.get("PREDICT_CACHE_SIZE", MAX_ENTRIES))
+        if max_entries == 0:
+            return None
+        return cls(
+            model_id,
+            max_entries=max_entries,
+            ttl_seconds=float(os.environ.get("PREDICT_CACHE_TTL_S", TTL_SECONDS)),
+            path=os.environ.get("PREDICT_CACHE_PATH") or None,
+        )
+
+    def key(self, text: str) -> str:
+        """Return the cache key of a text."""
+        digest = hashlib.sha256()
+        digest.update(self.model_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, text: str) -> Optional[str]:
+        """Return the cached title of a text, or None if there is none."""
+        key = self.key(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+            entry = self._get_from_disk(key, now)
+            if entry is not None:
+                self._set_in_memory(key, *entry)
+                self.disk_hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, text: str, title: str) -> None:
+        """Cache the title of a text."""
+        key = self.key(text)
+        now = time.time()
+        with self._lock:
+            self._set_in_memory(key, title, now)
+            self._set_on_disk(key, title, now)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit and miss counts, and the number of titles in memory."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+    def _set_in_memory(self, key: str, title: str, created: float) -> None:
+        """Add a title to the in-memory LRU, dropping the oldest if it is full."""
+        self._entries[key] = (title, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_from_disk(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """Return a title and its creation time from the disk tier, if fresh."""
+        if self.database is None:
+            return None
+        try:
+            row = self.database.execute(
+                "SELECT title, created FROM titles WHERE key = ? AND created > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(
+                "Failed to read from prediction cache %s: %s", self.database.path, e
+            )
+            return None
+        return (row[0], row[1]) if row else None
+
+    def _set_on_disk(self, key: str, title: str, created: float) -> None:
+        """Write a title to the disk tier, and now and then drop stale rows."""
+        if self.database is None:
+            return
+        try:
+            self.database.execute(
+                "INSERT OR REPLACE INTO titles (key, title, created) VALUES (?, ?, ?)",
+                (key, title, created),
+            )
+            self._writes += 1
+            if self._writes % PRUNE_INTERVAL == 0:
+                self.database.execute(
+                    "DELETE FROM titles WHERE created <= ? OR key NOT IN "
+                    "(SELECT key FROM titles ORDER BY created DESC LIMIT ?)",
+                    (created - self.ttl_seconds, self.max_entries),
+                )
+        except sqlite3.Error as e:
+            logger.warning(
+                "Failed to write to prediction cache %s: %s", self.database.path, e
+            )
@@ -0,0 +1,66 @@
+"""Gunicorn settings for serving the app in production.
+
+Run from the repository root with
+
+    gunicorn -c api_server/gunicorn.conf.py api_server.app:app
+
+The app, and with it the model, is loaded once in the master process before
+the workers are forked, so the workers share the model weights' memory pages
+copy-on-write instead of loading a copy each. Set MODEL_LOADING=background
+to instead have each worker load the model in the background after forking,
+so that workers answer /health at once and /ready once their model is loaded.
+"""
+
+import gc
+import os
+import tempfile
+
+import torch
+
+# Gunicorn reads its settings from these lower case names
+# pylint: disable=invalid-name
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Threads let requests of a worker wait on its micro batcher together
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+# Read by the app when it is imported
+os.environ.setdefault("MODEL_LOADING", "eager")
+preload_app = os.environ["MODEL_LOADING"] == "eager"
+# A job runs in the worker that got the request, but is polled from any worker,
+# so the workers share the jobs' statuses through an SQLite file
+if workers > 1:
+    os.environ.setdefault(
+        "PREDICT_JOB_PATH",
+        os.path.join(tempfile.gettempdir(), "motion_title_jobs.sqlite"),
+    )
+
+
+def torch_num_threads(num_workers: int) -> int:
+    """Return the number of intra-op threads each worker should use.
+
+    Set with TORCH_NUM_THREADS, by default the CPU cores are split between the
+    workers so they don't oversubscribe them.
+    """
+    if os.environ.get("TORCH_NUM_THREADS"):
+        return int(os.environ["TORCH_NUM_THREADS"])
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+
+def when_ready(server):
+    """Keep the garbage collector from touching the preloaded app's objects,
+    which would copy their memory pages into every worker.
+    """
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        "Froze %s preloaded objects, workers use %s torch threads each.",
+        gc.get_freeze_count(),
+        torch_num_threads(server.cfg.workers),
+    )
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Limit the torch threads of a new worker."""
+    torch.set_num_threads(torch_num_threads(server.cfg.workers))
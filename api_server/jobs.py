@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from api_server.shared_db import SharedDatabase
+from utils.log import logger
+
+MAX_WORKERS = 1
+CHUNK_SIZE = 8
+TTL_SECONDS = 60 * 60
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, "
+    "status TEXT NOT NULL, num_texts INTEGER NOT NULL, "
+    "num_done INTEGER NOT NULL, titles TEXT, error TEXT, "
+    "created REAL NOT NULL, finished REAL)",
+)
+
+
+class Job:  # pylint: disable=too-many-instance-attributes
+    """Titles for a list of texts that are generated in the background."""
+
+    def __init__(self, texts: List[str]) -> None:
+        self.id = uuid.uuid4().hex
+        self.texts = texts
+        self.num_texts = len(texts)
+        self.titles: List[str] = []
+        self.num_done = 0
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        """Create a job from its row in a job store, without its texts."""
+        job = cls([])
+        job.id = row["id"]
+        job.num_texts = row["num_texts"]
+        job.num_done = row["num_done"]
+        job.titles = json.loads(row["titles"]) if row["titles"] else []
+        job.status = row["status"]
+        job.error = row["error"]
+        job.created = row["created"]
+        job.finished = row["finished"]
+        return job
+
+    def to_dict(self) -> Dict:
+        """Return the job's status, and its titles once they are all done."""
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "num_texts": self.num_texts,
+            "num_done": self.num_done,
+        }
+        if self.status == DONE:
+            result["titles"] = self.titles
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+class JobQueue:  # pylint: disable=too-many-instance-attributes
+    """Run jobs of titling many texts on a pool of threads, a chunk at a time."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        predict_fn: Callable[[List[str]], List[str]],
+        max_workers: int = MAX_WORKERS,
+        chunk_size: int = CHUNK_SIZE,
+        ttl_seconds: float = TTL_SECONDS,
+        path: Optional[str] = None,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        self.predict_fn = predict_fn
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.database = SharedDatabase(path, SCHEMA) if path is not None else None
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, predict_fn: Callable[[List[str]], List[str]]):
+        """Create a job queue configured by environment variables."""
+        return cls(
+            predict_fn,
+            max_workers=int(os.environ.get("PREDICT_JOB_WORKERS", MAX_WORKERS)),
+            chunk_size=int(os.environ.get("PREDICT_JOB_CHUNK_SIZE", CHUNK_SIZE)),
+            ttl_seconds=float(os.environ.get("PREDICT_JOB_TTL_S", TTL_SECONDS)),
+            path=os.environ.get("PREDICT_JOB_PATH") or None,
+        )
+
+    def submit(
+        self,
+        texts: List[str],
+        predict_fn: Optional[Callable[[List[str]], List[str]]] = None,
+    ) -> Job:
+        """Queue a job of titling the texts and return it. The texts are titled
+        by `predict_fn` if given, instead of by the queue's.
+        """
+        job = Job(list(texts))
+        with self._lock:
+            self._remove_expired()
+            self._jobs[job.id] = job
+            self._save(job)
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="predict-job"
+                )
+                self._pool_pid = os.getpid()
+            self._pool.submit(self._run, job, predict_fn or self.predict_fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by its id, or None if there is no such job. Jobs of
+        other processes are looked up in the shared database, if there is one.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job
+            return self._load(job_id)
+
+    def _remove_expired(self) -> None:
+        """Forget jobs that finished more than `ttl_seconds` ago."""
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished is not None and now - job.finished > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.database is None:
+            return
+        try:
+            self.database.execute(
+                "DELETE FROM jobs WHERE finished < ?", (now - self.ttl_seconds,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(
+                "Failed to remove expired jobs from %s: %s", self.database.path, e
+            )
+
+    def _save(self, job: Job) -> None:
+        """Write a job's status, and its titles if it is done, to the shared
+        database. Must be called with the lock held.
+        """
+        if self.database is None:
+            return
+        try:
+            self.database.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, num_texts, num_done, "
+                "titles, error, created, finished) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    job.num_texts,
+                    job.num_done,
+                    json.dumps(job.titles) if job.status == DONE else None,
+                    job.error,
+                    job.created,
+                    job.finished,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(
+                "Failed to save job %s to %s: %s", job.id, self.database.path, e
+            )
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        """Return a job of another process from the shared database, if there
+        is one and it hasn't expired. Must be called with the lock held.
+        """
+        if self.database is None:
+            return None
+        try:
+            row = self.database.execute(
+                "SELECT * FROM jobs WHERE id = ? AND "
+                "(finished IS NULL OR finished >= ?)",
+                (job_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(
+                "Failed to read job %s from %s: %s", job_id, self.database.path, e
+            )
+            return None
+        return Job.from_row(row) if row else None
+
+    def _update(self, job: Job, **changes) -> None:
+        """Change a job's attributes and save it to the shared database."""
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            self._save(job)
+
+    def _run(self, job: Job, predict_fn: Callable[[List[str]], List[str]]) -> None:
+        """Title the texts of a job, a chunk at a time."""
+        self._update(job, status=RUNNING)
+        try:
+            for start in range(0, len(job.texts), self.chunk_size):
+                end = start + self.chunk_size
+                chunk = job.texts[start:end]
+                titles = predict_fn(chunk)
+                if len(titles) != len(chunk):
+                    raise RuntimeError(
+                        f"Got {len(titles)} predictions for {len(chunk)} texts"
+                    )
+                job.titles.extend(titles)
+                self._update(job, num_done=len(job.titles))
+            self._update(job, status=DONE, finished=time.time())
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Job %s failed.", job.id)
+            self._update(job, status=FAILED, error=str(e), finished=time.time())
@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+from utils.log import logger
+
+ModelT = TypeVar("ModelT")
+
+
+class ModelNotReady(Exception):
+    """Raised when the model is requested before it has been loaded."""
+
+
+class ModelLoader(Generic[ModelT]):
+    """Load a model once, either in a background thread or right away."""
+
+    def __init__(self, load_fn: Callable[[], ModelT]) -> None:
+        self.load_fn = load_fn
+        self._model: Optional[ModelT] = None
+        self.error: Optional[BaseException] = None
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the model has been loaded."""
+        return self._model is not None
+
+    def start(self) -> None:
+        """Start loading the model in a background thread, unless it is
+        loaded or being loaded in this process.
+        """
+        with self._lock:
+            if self._model is not None or self.error is not None:
+                return
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(
+                target=self._load, name="model-loader", daemon=True
+            )
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def load(self) -> ModelT:
+        """Load the model in this thread, unless it is already loaded, and
+        return it. If it is being loaded in the background, wait for that.
+        """
+        with self._lock:
+            loading = self._thread is not None and self._thread_pid == os.getpid()
+        if loading:
+            return self.get()
+        if self._model is None and self.error is None:
+            self._load()
+        return self.get(timeout=0)
+
+    def get(self, timeout: Optional[float] = None) -> ModelT:
+        """Return the model, waiting at most `timeout` seconds for it to load.
+
+        Raises ModelNotReady if it is still loading, and the loading error if
+        loading failed.
+        """
+        if self._model is None and self.error is None:
+            self.start()
+            self._loaded.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        if self._model is None:
+            raise ModelNotReady("The model is still loading")
+        return self._model
+
+    def _load(self) -> None:
+        """Load the model and signal waiting threads."""
+        logger.info("Loading model ...")
+        try:
+            self._model = self.load_fn()
+            logger.info("Model loaded.")
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Failed to load the model.")
+            self.error = e
+        self._loaded.set()
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+from typing import Optional, Sequence, Tuple
+
+
+class SharedDatabase:
+    """SQLite database that the workers of a multi-process server share.
+
+    The connection is reopened if the process has been forked since it was
+    opened, as is MicroBatcher's thread, JobQueue's pool and ModelLoader's
+    load, so these can all be created at import time, before a server forks.
+    """
+
+    def __init__(self, path: str, schema: Sequence[str]) -> None:
+        self.path = path
+        self.schema = schema
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Return the connection of this process, opening it if needed."""
+        if self._connection is None or self._connection_pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5.0, check_same_thread=False
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self.schema:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def execute(self, statement: str, parameters: Tuple = ()) -> sqlite3.Cursor:
+        """Run a statement in a transaction of its own and return its cursor."""
+        with self.connect() as connection:
+            return connection.execute(statement, parameters)
@@ -1,7 +1,9 @@
+import json
 import os
+import time
 import unittest
 
-from api_server.app import app
+from api_server.app import app, model_loader
 
 os.environ["CUDA_VISIBLE_DEVICES"] = ""
 
@@ -18,12 +20,18 @@ class TestIntegrations(unittest.TestCase):
 
     def setUp(self):
         self.app = app.test_client()
+        model_loader.get(timeout=120)
 
     def test_index(self):
         """Test that the health check page returns the expected text."""
         response = self.app.get("/health")
         assert response.get_data().decode() == "OK"
 
+    def test_ready(self):
+        """Test that the app is ready once the model is loaded."""
+        response = self.app.get("/ready")
+        self.assertEqual(response.status_code, 200)
+
     def test_predict_valid_input(self):
         """Test that the predict page contains the expected text for valid input."""
         response = self.app.post("/predict", data={"text": VALID_TEXT})
@@ -31,6 +39,114 @@ class TestIntegrations(unittest.TestCase):
         self.assertIn(b"Suggested title:", response.data)
         self.assertNotIn(b"Please enter a longer text", response.data)
 
+    def test_repeated_text_is_predicted_from_cache(self):
+        """Test that a text that differs only in whitespace is a cache hit."""
+        self.app.post("/predict", data={"text": VALID_TEXT})
+        hits_before = self.app.get("/cache_stats").get_json()["hits"]
+        response = self.app.post("/predict", data={"text": f"  {VALID_TEXT}\n"})
+        self.assertIn(b"Suggested title:", response.data)
+        hits_after = self.app.get("/cache_stats").get_json()["hits"]
+        self.assertEqual(hits_after, hits_before + 1)
+
+    def test_titles_sync(self):
+        """Test that a few texts are titled right away."""
+        response = self.app.post("/v1/titles", json={"texts": [VALID_TEXT] * 2})
+        self.assertEqual(response.status_code, 200)
+        titles = response.get_json()["titles"]
+        self.assertEqual(len(titles), 2)
+        self.assertTrue(all(isinstance(title, str) for title in titles))
+
+    def test_titles_async(self):
+        """Test that a job is queued and its titles can be polled."""
+        response = self.app.post(
+            "/v1/titles", json={"texts": [VALID_TEXT] * 3, "mode": "async"}
+        )
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+        self.assertEqual(job["num_texts"], 3)
+
+        deadline = time.monotonic() + 60
+        while job["status"] in ("queued", "running"):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+            job = self.app.get(response.headers["Location"]).get_json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(len(job["titles"]), 3)
+
+    def test_titles_invalid_input(self):
+        """Test that invalid JSON requests get an error."""
+        for body, status in [
+            ({"texts": []}, 400),
+            ({"texts": [VALID_TEXT, 1]}, 400),
+            ({"texts": [VALID_TEXT, INVALID_TEXT]}, 400),
+            ({"text": VALID_TEXT, "mode": "later"}, 400),
+        ]:
+            response = self.app.post("/v1/titles", json=body)
+            self.assertEqual(response.status_code, status)
+            self.assertIn("error", response.get_json())
+        self.assertEqual(self.app.get("/v1/jobs/unknown").status_code, 404)
+
+    def test_titles_with_decoding_settings(self):
+        """Test that titles can be decoded with other settings than the model's."""
+        response = self.app.post(
+            "/v1/titles",
+            json={"text": VALID_TEXT, "decoding": {"strategy": "greedy"}},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()["titles"]), 1)
+
+        for decoding in [
+            {"strategy": "sampling"},
+            {"beams": 3},
+            "greedy",
+            {"num_beams": 1000},
+            {"repetition_penalty": float("nan")},
+            {"num_beams": 2.7},
+            {"early_stopping": "false"},
+            # No draft model is loaded at startup
+            {"strategy": "speculative", "repetition_penalty": 1.0},
+        ]:
+            response = self.app.post(
+                "/v1/titles", json={"text": VALID_TEXT, "decoding": decoding}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.get_json())
+
+    def test_stream_title(self):
+        """Test that a title is streamed as server-sent events."""
+        response = self.app.post("/v1/titles/stream", json={"text": VALID_TEXT})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [
+            event.split("\n", 1)
+            for event in response.get_data(as_text=True).strip().split("\n\n")
+        ]
+        names = [name for name, _ in events]
+        data = [json.loads(line.replace("data: ", "", 1)) for _, line in events]
+        self.assertEqual(names[-1], "event: done")
+        self.assertTrue(all(name == "event: token" for name in names[:-1]))
+        self.assertEqual(data[-1]["title"], data[-2]["title"].strip())
+
+        response = self.app.post("/v1/titles/stream", data={"text": INVALID_TEXT})
+        self.assertEqual(response.status_code, 400)
+
+    def test_streamed_titles_are_cached_apart(self):
+        """Test that a streamed title is cached for streams, and that streams
+        don't get the beam search titles of the other endpoints.
+        """
+        text = VALID_TEXT + " Tåg."
+        self.app.post("/v1/titles", json={"text": text})
+        stream_hits = self.app.get("/cache_stats").get_json()["stream"]["hits"]
+
+        # Streamed bodies are only generated when read
+        first = self.app.post("/v1/titles/stream", json={"text": text})
+        first_events = first.get_data(as_text=True).strip().split("\n\n")
+        second = self.app.post("/v1/titles/stream", json={"text": text})
+        second_events = second.get_data(as_text=True).strip().split("\n\n")
+        stats = self.app.get("/cache_stats").get_json()
+        self.assertEqual(stats["stream"]["hits"], stream_hits + 1)
+        self.assertEqual(first_events[-1], second_events[-1])
+
     def test_predict_invalid_input(self):
         """Test that the predict page contains the expected text for too short input."""
         response = self.app.post("/predict", data={"text": INVALID_TEXT})
@@ -0,0 +1,90 @@
+# pylint: disable=missing-function-docstring
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_server.batcher import MicroBatcher
+from utils.decoding import DecodingConfig
+
+
+class RecordingPredictor:
+    """Fake batch predictor that records the batches it was called with."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+def test_predict_returns_title_for_own_text():
+    batcher = MicroBatcher(RecordingPredictor(), max_batch_size=4, max_wait_ms=5)
+    assert batcher.predict("a text", timeout=5) == "A TEXT"
+
+
+def test_concurrent_requests_are_batched():
+    predictor = RecordingPredictor(delay=0.05)
+    batcher = MicroBatcher(predictor, max_batch_size=4, max_wait_ms=200)
+    texts = [f"text {i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        preds = list(pool.map(lambda t: batcher.predict(t, timeout=5), texts))
+
+    assert preds == [t.upper() for t in texts]
+    assert all(len(batch) <= 4 for batch in predictor.batches)
+    assert len(predictor.batches) < len(texts)
+
+
+def test_batch_is_flushed_after_max_wait():
+    predictor = RecordingPredictor()
+    batcher = MicroBatcher(predictor, max_batch_size=100, max_wait_ms=20)
+    start = time.monotonic()
+    batcher.predict("only text", timeout=5)
+    assert time.monotonic() - start < 1
+    assert predictor.batches == [["only text"]]
+
+
+def test_errors_are_routed_to_every_caller():
+    def failing_predict(texts):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(failing_predict, max_batch_size=2, max_wait_ms=5)
+    future = batcher.submit("a text")
+    with pytest.raises(RuntimeError, match="model failed"):
+        future.result(timeout=5)
+
+
+def test_texts_are_batched_by_decoding_settings():
+    batches = []
+
+    def predict(texts, decoding=None):
+        batches.append((list(texts), decoding))
+        suffix = "" if decoding is None else f" ({decoding.strategy})"
+        return [text.upper() + suffix for text in texts]
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=200)
+    greedy = DecodingConfig("greedy")
+    futures = [
+        batcher.submit("a"),
+        batcher.submit("b", greedy),
+        batcher.submit("c"),
+        batcher.submit("d", DecodingConfig("greedy")),
+    ]
+    assert [future.result(timeout=5) for future in futures] == [
+        "A",
+        "B (greedy)",
+        "C",
+        "D (greedy)",
+    ]
+    assert batches == [(["a", "c"], None), (["b", "d"], greedy)]
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        MicroBatcher(RecordingPredictor(), max_batch_size=0)
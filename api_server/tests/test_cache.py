@@ -0,0 +1,79 @@
+# pylint: disable=missing-function-docstring,protected-access
+import pytest
+
+from api_server.cache import PredictionCache
+
+
+def test_get_returns_cached_title():
+    cache = PredictionCache("model-a")
+    assert cache.get("a text") is None
+    cache.set("a text", "A title")
+    assert cache.get("a text") == "A title"
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_titles_of_other_models_are_not_returned():
+    cache = PredictionCache("model-a")
+    cache.set("a text", "A title")
+    assert cache.key("a text") != PredictionCache("model-b").key("a text")
+
+
+def test_least_recently_used_title_is_dropped():
+    cache = PredictionCache("model-a", max_entries=2)
+    cache.set("first", "1")
+    cache.set("second", "2")
+    assert cache.get("first") == "1"
+    cache.set("third", "3")
+    assert cache.get("second") is None
+    assert cache.get("first") == "1"
+    assert cache.get("third") == "3"
+
+
+def test_stale_titles_are_not_returned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("api_server.cache.time.time", lambda: now[0])
+    cache = PredictionCache("model-a", ttl_seconds=60)
+    cache.set("a text", "A title")
+    now[0] += 59
+    assert cache.get("a text") == "A title"
+    now[0] += 2
+    assert cache.get("a text") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    PredictionCache("model-a", path=path).set("a text", "A title")
+
+    other_worker = PredictionCache("model-a", path=path)
+    assert other_worker.get("a text") == "A title"
+    assert other_worker.get("a text") == "A title"
+    assert other_worker.stats() == {
+        "hits": 1,
+        "disk_hits": 1,
+        "misses": 0,
+        "entries": 1,
+    }
+    assert PredictionCache("model-b", path=path).get("a text") is None
+
+
+def test_disk_tier_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr("api_server.cache.PRUNE_INTERVAL", 5)
+    path = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache("model-a", max_entries=3, path=path)
+    for i in range(10):
+        cache.set(f"text {i}", str(i))
+    connection = cache.database.connect()
+    (count,) = connection.execute("SELECT COUNT(*) FROM titles").fetchone()
+    assert count == 3
+
+
+@pytest.mark.parametrize("size, expected", [("0", False), ("16", True)])
+def test_from_env(monkeypatch, size, expected):
+    monkeypatch.setenv("PREDICT_CACHE_SIZE", size)
+    monkeypatch.delenv("PREDICT_CACHE_PATH", raising=False)
+    cache = PredictionCache.from_env("model-a")
+    assert (cache is not None) == expected
+    if cache is not None:
+        assert cache.max_entries == 16
+        assert cache.database is None
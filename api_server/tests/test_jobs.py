@@ -0,0 +1,87 @@
+# pylint: disable=missing-function-docstring
+import time
+
+import pytest
+
+from api_server.jobs import DONE, FAILED, JobQueue
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in (DONE, FAILED):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job.id} is still {job.status}")
+        time.sleep(0.01)
+    return job
+
+
+def test_job_titles_texts_in_chunks():
+    chunks = []
+
+    def predict(texts):
+        chunks.append(list(texts))
+        return [text.upper() for text in texts]
+
+    queue = JobQueue(predict, chunk_size=2)
+    job = wait_for(queue.submit(["a", "b", "c"]))
+    assert job.to_dict() == {
+        "job_id": job.id,
+        "status": DONE,
+        "num_texts": 3,
+        "num_done": 3,
+        "titles": ["A", "B", "C"],
+    }
+    assert chunks == [["a", "b"], ["c"]]
+    assert queue.get(job.id) is job
+    assert queue.get("no-such-job") is None
+
+
+def test_job_with_its_own_predict_fn():
+    queue = JobQueue(lambda texts: texts)
+    job = wait_for(queue.submit(["a", "b"], lambda texts: [t.upper() for t in texts]))
+    assert job.titles == ["A", "B"]
+
+
+def test_failed_job_reports_error():
+    def predict(texts):
+        raise RuntimeError("model crashed")
+
+    job = wait_for(JobQueue(predict).submit(["a"]))
+    assert job.status == FAILED
+    assert job.to_dict()["error"] == "model crashed"
+    assert "titles" not in job.to_dict()
+
+
+def test_finished_jobs_expire():
+    queue = JobQueue(lambda texts: texts, ttl_seconds=0)
+    job = wait_for(queue.submit(["a"]))
+    time.sleep(0.01)
+    queue.submit(["b"])
+    assert queue.get(job.id) is None
+
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        JobQueue(lambda texts: texts, chunk_size=0)
+
+
+def test_jobs_are_shared_through_the_database(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(lambda texts: [t.upper() for t in texts], chunk_size=1, path=path)
+    other_queue = JobQueue(lambda texts: texts, path=path)
+    job = wait_for(queue.submit(["a", "b"]))
+
+    # The job is polled from another worker than the one that ran it
+    shared_job = other_queue.get(job.id)
+    assert shared_job is not job
+    assert shared_job.to_dict() == job.to_dict()
+    assert shared_job.titles == ["A", "B"]
+    assert other_queue.get("no-such-job") is None
+
+
+def test_shared_jobs_expire(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(lambda texts: texts, ttl_seconds=0, path=path)
+    job = wait_for(queue.submit(["a"]))
+    time.sleep(0.01)
+    assert JobQueue(lambda texts: texts, ttl_seconds=0, path=path).get(job.id) is None
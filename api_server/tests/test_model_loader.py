@@ -0,0 +1,46 @@
+# pylint: disable=missing-function-docstring
+import threading
+
+import pytest
+
+from api_server.model_loader import ModelLoader, ModelNotReady
+
+
+def test_model_is_loaded_in_the_background():
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return "model"
+
+    loader = ModelLoader(load)
+    loader.start()
+    loader.start()
+    assert not loader.ready
+    with pytest.raises(ModelNotReady):
+        loader.get(timeout=0)
+    release.set()
+    assert loader.get(timeout=5) == "model"
+    assert loader.ready
+    assert calls == [1]
+
+
+def test_load_blocks_until_the_model_is_loaded():
+    loader = ModelLoader(lambda: "model")
+    assert loader.load() == "model"
+    assert loader.ready
+    assert loader.load() == "model"
+
+
+def test_loading_error_is_raised_by_get():
+    def load():
+        raise OSError("no such model")
+
+    loader = ModelLoader(load)
+    loader.start()
+    with pytest.raises(OSError, match="no such model"):
+        loader.get(timeout=5)
+    assert isinstance(loader.error, OSError)
+    assert not loader.ready
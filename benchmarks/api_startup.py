@@ -0,0 +1,59 @@
+"""Time how long the app takes to start answering health checks and titles.
+
+Usage:
+    PYTHONPATH=. python benchmarks/api_startup.py [--runs=3]
+
+The app is started with the Flask development server, and the time is taken
+from starting the process until /health answers, until /ready answers (the
+same as /health for an app without a /ready endpoint) and until the first
+title is returned.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from typing import Dict
+
+import pandas as pd
+import requests
+
+from benchmarks.app_process import REPO_DIR, app_process, wait_for
+
+TEST_DATA_PATH = REPO_DIR / "data" / "test" / "test_data.csv"
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8124)
+    parser.add_argument("--runs", type=int, default=3)
+    return parser
+
+
+def time_startup(port: int, text: str) -> Dict[str, float]:
+    """Start the app once and return the seconds until each milestone."""
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    command = [sys.executable, "api_server/app.py"]
+    with app_process(command, port, quiet=True) as process:
+        seconds = {"healthy": wait_for(f"{url}/health", process, start)}
+        seconds["ready"] = wait_for(f"{url}/ready", process, start)
+        response = requests.post(f"{url}/predict", data={"text": text}, timeout=600)
+        response.raise_for_status()
+        seconds["first title"] = time.perf_counter() - start
+    return seconds
+
+
+def main():
+    """Start the app a few times and print the median times."""
+    args = _setup_parser().parse_args()
+    text = pd.read_csv(TEST_DATA_PATH)["text"].iloc[0]
+    runs = [time_startup(args.port, text) for _ in range(args.runs)]
+    for milestone in runs[0]:
+        median = statistics.median(run[milestone] for run in runs)
+        print(f"{'Time to ' + milestone + ':':<25}{median:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Start the title app in a subprocess for the benchmarks that load it."""
+
+import os
+import subprocess  # nosec
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+import requests
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+TIMEOUT = 600.0
+POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def app_process(
+    command: List[str], port: int, quiet: bool = False
+) -> Iterator[subprocess.Popen]:
+    """Start the app with a server command, and stop it on exit.
+
+    The prediction cache is turned off, so every request runs the model.
+    """
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(REPO_DIR),
+        "PORT": str(port),
+        "PREDICT_CACHE_SIZE": "0",
+    }
+    output = subprocess.DEVNULL if quiet else None
+    with subprocess.Popen(  # nosec
+        command, cwd=REPO_DIR, env=env, stdout=output, stderr=output
+    ) as process:
+        try:
+            yield process
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def wait_for(
+    url: str, process: subprocess.Popen, start: float, timeout: float = TIMEOUT
+) -> float:
+    """Poll a URL until it answers with a success status, or 404 if the app
+    doesn't have that endpoint, and return the number of seconds since
+    `start`, a `time.perf_counter` value.
+    """
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode}")
+        try:
+            response = requests.get(url, timeout=1)
+            if response.ok or response.status_code == 404:
+                return time.perf_counter() - start
+        except requests.ConnectionError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"{url} did not answer in {timeout} seconds")
@@ -0,0 +1,77 @@
+"""Compare the speed of parse_html_text with the BeautifulSoup reference.
+
+Usage:
+    PYTHONPATH=. python benchmarks/html_parsing.py [--max_docs 500]
+
+The motions in data/downloaded/zipped are used if downloaded, otherwise
+synthetic motion-like documents.
+"""
+
+import argparse
+import json
+import time
+import zipfile
+from typing import Callable, List
+
+from training_data_pipeline.utils.zip_data_reader import (
+    ZIP_DIR,
+    parse_html_text,
+    parse_html_text_bs4,
+)
+
+SYNTHETIC_PARAGRAPH = (
+    '<p class="Normal">Riksdagen st&auml;ller sig bakom det som anf&ouml;rs i '
+    "motionen om &aring;tg&auml;rder f&ouml;r b&auml;ttre persontrafik "
+    "och tillk&auml;nnager detta f&ouml;r regeringen.</p>\n"
+)
+SYNTHETIC_DOC = (
+    "<div><style>p.Normal { margin: 0cm; }</style>\n"
+    '<div class="Section1"><h1>Motion till riksdagen</h1>\n'
+    + SYNTHETIC_PARAGRAPH * 60
+    + "<table><tr><td>Stockholm den 1 oktober 2018</td></tr></table>\n"
+    + "</div></div>"
+)
+
+
+def load_documents(max_docs: int) -> List[str]:
+    """Return the html of up to `max_docs` downloaded motions, or synthetic ones."""
+    docs: List[str] = []
+    for zip_file in sorted(ZIP_DIR.glob("*.zip")):
+        with zipfile.ZipFile(zip_file) as zipped:
+            for filename in zipped.namelist():
+                data = json.loads(zipped.read(filename).decode("utf-8-sig"))
+                try:
+                    docs.append(data["dokumentstatus"]["dokument"]["html"])
+                except (KeyError, TypeError):
+                    continue
+                if len(docs) == max_docs:
+                    return docs
+    return docs or [SYNTHETIC_DOC] * max_docs
+
+
+def docs_per_second(parse: Callable[[str], str], docs: List[str]) -> float:
+    """Return the number of documents parsed per second."""
+    start = time.perf_counter()
+    for html in docs:
+        parse(html)
+    return len(docs) / (time.perf_counter() - start)
+
+
+def main():
+    """Time both parsers on the same documents and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max_docs", type=int, default=500)
+    args = parser.parse_args()
+
+    docs = load_documents(args.max_docs)
+    mismatches = sum(parse_html_text(d) != parse_html_text_bs4(d) for d in docs)
+    before = docs_per_second(parse_html_text_bs4, docs)
+    after = docs_per_second(parse_html_text, docs)
+    print(f"Documents:          {len(docs)} ({mismatches} with different output)")
+    print(f"BeautifulSoup:      {before:10.1f} docs/s")
+    print(f"Streaming parser:   {after:10.1f} docs/s")
+    print(f"Speedup:            {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""Time each stage of generating titles with MotionTitleGenerator.
+
+Usage:
+    PYTHONPATH=. python benchmarks/inference.py --model_path=<artifact dir or HF repo> \
+        [--backends pytorch onnx] [--lengths 64 128 256 512] [--batch_sizes 1 8] \
+        [--threads 1 4] [--output=results.json] [--baseline=baseline.json]
+
+For every backend, text length in tokens, batch size and torch thread count,
+a batch of motion texts is titled `--runs` times, and the median time of each
+stage of the serving path is reported:
+
+- prep: preprocessing the texts with `prep_text`
+- encode: tokenizing the texts with the generator's `encode_text`
+- encoder: running the model's encoder on the tokenized texts
+- generate: running the decoder, with beam search by default, from the
+  encoder outputs
+- decode: turning the generated token ids into titles
+
+The results are written as JSON to --output. Pass a results file of an
+earlier run as --baseline to compare with it. Stages that take more than
+--tolerance longer than in the baseline are reported as regressions, and
+then the script exits with status 1. Results are only compared with a baseline
+of the same model, decoding settings, torch version and CPU count. The
+generator's encoder cache is turned off, so every run runs the encoder.
+
+The ONNX Runtime sessions use their own threads, so for the onnx backend the
+thread sweep is skipped and its results have no thread count.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import torch
+
+from motion_title_generator.motion_title_generator import (
+    MAX_TITLE_TOKENS,
+    MODEL,
+    MotionTitleGenerator,
+)
+from utils.decoding import DecodingConfig
+from utils.text import prep_text
+
+TEST_DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "test" / "test_data.csv"
+STAGES = ("prep", "encode", "encoder", "generate", "decode")
+# Results are matched with the baseline's on these keys
+KEYS = ("backend", "tokens", "batch_size", "threads")
+TOLERANCE = 0.1
+# Stages faster than this are too noisy to flag as regressions
+MIN_REGRESSION_MS = 1.0
+# Results are only compared with a baseline run with the same settings
+COMPARED_SETTINGS = (
+    "model_path",
+    "onnx_model_path",
+    "decoding",
+    "torch_version",
+    "cpu_count",
+)
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model_path", default=MODEL)
+    parser.add_argument("--onnx_model_path", default=None)
+    parser.add_argument(
+        "--backends", nargs="+", choices=["pytorch", "onnx"], default=["pytorch"]
+    )
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        default=[64, 128, 256, 512],
+        help="Text lengths in tokens",
+    )
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[torch.get_num_threads()],
+        help="Torch thread counts",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="inference_benchmark.json")
+    parser.add_argument(
+        "--baseline", default=None, help="Results file of an earlier run"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="Fraction a stage can be slower than in the baseline",
+    )
+    DecodingConfig.add_to_argparse(parser)
+    return parser
+
+
+def make_texts(tokenizer, motions: List[str], num_tokens: int, num_texts: int):
+    """Return `num_texts` different texts of about `num_tokens` tokens each,
+    made from the motion texts.
+    """
+    texts = []
+    for i in range(num_texts):
+        shift = i % len(motions)
+        shifted = motions[shift:] + motions[:shift]
+        ids = tokenizer(" ".join(shifted), add_special_tokens=False)["input_ids"]
+        while len(ids) < num_tokens:
+            ids = ids + ids
+        texts.append(tokenizer.decode(ids[:num_tokens]))
+    return texts
+
+
+def run_encoder(model, encoding):
+    """Return the encoder outputs of the model for tokenized texts."""
+    with torch.no_grad():
+        return model.get_encoder()(
+            input_ids=encoding["input_ids"],
+            attention_mask=encoding["attention_mask"],
+        )
+
+
+def time_stages(
+    generator: MotionTitleGenerator, texts: List[str], decoding: DecodingConfig
+) -> Tuple[Dict[str, float], List[str]]:
+    """Title the texts once and return the seconds of each stage and the
+    titles.
+    """
+    seconds = {}
+    start = time.perf_counter()
+    texts = prep_text(pd.DataFrame({"text": texts}), has_title_cols=False).tolist()
+    seconds["prep"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoding = generator.encode_text(texts)
+    seconds["encode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoder_outputs = run_encoder(generator.model, encoding)
+    seconds["encoder"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        generated_ids = generator.model.generate(
+            encoder_outputs=encoder_outputs,
+            attention_mask=encoding["attention_mask"],
+            max_length=MAX_TITLE_TOKENS,
+            **decoding.generate_kwargs(),
+        )
+    seconds["generate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    titles = generator.tokenizer.batch_decode(
+        generated_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True
+    )
+    seconds["decode"] = time.perf_counter() - start
+    return seconds, titles
+
+
+def benchmark(
+    generator: MotionTitleGenerator,
+    texts: List[str],
+    decoding: DecodingConfig,
+    runs: int,
+) -> Dict[str, float]:
+    """Return the median milliseconds of each stage and in total, and the
+    titles per second, of titling the texts `runs` times.
+    """
+    time_stages(generator, texts, decoding)  # Warm up
+    timings = [time_stages(generator, texts, decoding)[0] for _ in range(runs)]
+    result = {
+        f"{stage}_ms": 1000 * statistics.median(run[stage] for run in timings)
+        for stage in STAGES
+    }
+    total = statistics.median(sum(run.values()) for run in timings)
+    result["total_ms"] = 1000 * total
+    result["titles_per_s"] = len(texts) / total
+    return result
+
+
+def run_settings(args: argparse.Namespace, decoding: DecodingConfig) -> Dict:
+    """Return the settings of a run, that are saved with its results."""
+    return {
+        "model_path": args.model_path,
+        "onnx_model_path": args.onnx_model_path,
+        "runs": args.runs,
+        "decoding": decoding.to_dict(),
+        "torch_version": torch.__version__,
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform(),
+    }
+
+
+def check_settings(settings: Dict, baseline_settings: Dict) -> None:
+    """Raise ValueError if the results of runs with these settings can't be
+    compared, because they differ in one of COMPARED_SETTINGS.
+    """
+    differences = [
+        f"{name} {baseline_settings.get(name)!r} -> {settings[name]!r}"
+        for name in COMPARED_SETTINGS
+        if baseline_settings.get(name) != settings[name]
+    ]
+    if differences:
+        raise ValueError(
+            "The baseline was run with other settings: " + ", ".join(differences)
+        )
+
+
+def find_regressions(
+    results: List[Dict], settings: Dict, baseline: Dict, tolerance: float
+) -> List[str]:
+    """Return a description of each stage of the results that is more than
+    `tolerance` slower than in the baseline result with the same keys.
+
+    `baseline` is the saved output of an earlier run, with its "settings" and
+    "results". Raises ValueError if it was run with other settings, see
+    `check_settings`.
+    """
+    check_settings(settings, baseline["settings"])
+    baseline_by_key = {
+        tuple(row[key] for key in KEYS): row for row in baseline["results"]
+    }
+    regressions = []
+    for row in results:
+        key = tuple(row[key] for key in KEYS)
+        if key not in baseline_by_key:
+            continue
+        described = ", ".join(f"{name}={value}" for name, value in zip(KEYS, key))
+        for stage in STAGES + ("total",):
+            before, after = baseline_by_key[key][f"{stage}_ms"], row[f"{stage}_ms"]
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+                regressions.append(
+                    f"{stage} {before:.1f} ms -> {after:.1f} ms "
+                    f"(+{100 * (after / before - 1):.0f}%) with {described}"
+                )
+    return regressions
+
+
+def print_header(compare: bool) -> None:
+    """Print the column names of the results, see `print_row`."""
+    header = f"{'backend':>8}{'tokens':>8}{'batch':>7}{'threads':>8}"
+    width = 18 if compare else 12
+    header += "".join(f"{stage + ' ms':>{width}}" for stage in STAGES + ("total",))
+    print(header + f"{'titles/s':>10}")
+
+
+def print_row(row: Dict, baseline_row: Optional[Dict], compare: bool) -> None:
+    """Print the stage times of a result, and if `compare`, the change from the
+    baseline result with the same settings, if there is one.
+    """
+    line = (
+        f"{row['backend']:>8}{row['tokens']:>8}{row['batch_size']:>7}"
+        f"{row['threads'] if row['threads'] is not None else '-':>8}"
+    )
+    for stage in STAGES + ("total",):
+        line += f"{row[f'{stage}_ms']:>12.1f}"
+        if compare and baseline_row is not None:
+            change = row[f"{stage}_ms"] / baseline_row[f"{stage}_ms"] - 1
+            line += f"{100 * change:>+5.0f}%"
+        elif compare:
+            line += " " * 6
+    print(line + f"{row['titles_per_s']:>10.2f}")
+
+
+def run_benchmarks(
+    args: argparse.Namespace,
+    decoding: DecodingConfig,
+    baseline: Optional[Dict],
+) -> List[Dict]:
+    """Time the stages for all settings, printing each result as it is done,
+    with its change from the baseline if there is one.
+    """
+    motions = pd.read_csv(TEST_DATA_PATH)["text"].tolist()
+    baseline_by_key = {
+        tuple(row[key] for key in KEYS): row
+        for row in (baseline["results"] if baseline is not None else [])
+    }
+    print_header(compare=baseline is not None)
+    results = []
+    for backend in args.backends:
+        model_path = args.model_path
+        if backend == "onnx" and args.onnx_model_path is not None:
+            model_path = args.onnx_model_path
+        generator = MotionTitleGenerator(model_path, backend, long_input=False)
+        generator.encoder_cache = None
+        for num_threads in args.threads if backend == "pytorch" else [None]:
+            if num_threads is not None:
+                torch.set_num_threads(num_threads)
+            for num_tokens in args.lengths:
+                for batch_size in args.batch_sizes:
+                    texts = make_texts(
+                        generator.tokenizer, motions, num_tokens, batch_size
+                    )
+                    row = {
+                        "backend": backend,
+                        "tokens": num_tokens,
+                        "batch_size": batch_size,
+                        "threads": num_threads,
+                        **benchmark(generator, texts, decoding, args.runs),
+                    }
+                    results.append(row)
+                    print_row(
+                        row,
+                        baseline_by_key.get(tuple(row[key] for key in KEYS)),
+                        compare=baseline is not None,
+                    )
+    return results
+
+
+def main():
+    """Time the stages for all settings, save the results and compare them
+    with the baseline.
+    """
+    args = _setup_parser().parse_args()
+    decoding = DecodingConfig.from_args(vars(args))
+    if decoding.strategy == "speculative":
+        sys.exit(
+            "Speculative decoding can't be timed by stage, as the draft model "
+            "encodes the texts itself"
+        )
+    settings = run_settings(args, decoding)
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        try:
+            check_settings(settings, baseline["settings"])
+        except ValueError as e:
+            sys.exit(f"Can't compare with {args.baseline}. {e}")
+
+    results = run_benchmarks(args, decoding, baseline)
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump({"settings": settings, "results": results}, output_file, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, settings, baseline, args.tolerance)
+        print(f"Regressions against {args.baseline}: {len(regressions)}")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
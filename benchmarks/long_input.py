@@ -0,0 +1,112 @@
+"""Compare the title latency of truncated, windowed and whole long texts.
+
+Usage:
+    PYTHONPATH=. python benchmarks/long_input.py --model_path=<artifact dir or HF repo>
+
+Texts of increasing length are made by repeating the test motions, and each is
+titled after truncating it to 512 tokens, after splitting it into overlapping
+512 token windows whose encoder outputs are fused (PREDICT_LONG_INPUT=1), and
+with the whole text encoded as one sequence, whose attention cost grows
+quadratically with its length. The time to run the encoder is reported next to
+the time to make the whole title, which also depends on the title's length.
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import pandas as pd
+import torch
+
+from motion_title_generator.motion_title_generator import (
+    MAX_TEXT_TOKENS,
+    MAX_TITLE_TOKENS,
+    MODEL,
+    WINDOW_OVERLAP,
+    MotionTitleGenerator,
+)
+from utils.encode_decode import encode, encode_fused, encode_windows, generate
+
+TEST_DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "test" / "test_data.csv"
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model_path", default=MODEL)
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        default=[256, 512, 1024, 2048, 4096],
+        help="Text lengths in tokens",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    return parser
+
+
+def make_text(tokenizer, motions, num_tokens: int) -> str:
+    """Return a text of about `num_tokens` tokens made from motion texts."""
+    ids = tokenizer(" ".join(motions), add_special_tokens=False)["input_ids"]
+    while len(ids) < num_tokens:
+        ids = ids + ids
+    return tokenizer.decode(ids[:num_tokens])
+
+
+def median_seconds(fn: Callable[[], str], runs: int) -> float:
+    """Return the median number of seconds that fn takes to run."""
+    fn()  # Warm up
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def run_encoder(model, encoding: Dict) -> None:
+    """Run the model's encoder on an encoding, fusing windows if it has them."""
+    with torch.no_grad():
+        if encoding["input_ids"].dim() == 3:
+            encode_fused(model, encoding["input_ids"], encoding["attention_mask"])
+        else:
+            model.get_encoder()(**encoding)
+
+
+def main():
+    """Time titles for each text length and mode and print a table."""
+    args = _setup_parser().parse_args()
+    generator = MotionTitleGenerator(args.model_path, "pytorch", long_input=False)
+    model, tokenizer = generator.model, generator.tokenizer
+    motions = pd.read_csv(TEST_DATA_PATH)["text"].tolist()
+
+    modes = ["truncated", "windows", "whole text"]
+    print(f"{'':>8}" + "".join(f"{mode:>20}" for mode in modes))
+    print(f"{'tokens':>8}" + f"{'encoder':>10}{'title':>10}" * len(modes))
+    for num_tokens in args.lengths:
+        text = make_text(tokenizer, motions, num_tokens)
+        encodings: Dict[str, Dict] = {
+            "truncated": encode(text, tokenizer, MAX_TEXT_TOKENS, padding="longest"),
+            "windows": encode_windows(
+                text, tokenizer, MAX_TEXT_TOKENS, WINDOW_OVERLAP, max_windows=None
+            ),
+            "whole text": encode(text, tokenizer, num_tokens + 1, padding="longest"),
+        }
+        row = f"{num_tokens:>8}"
+        for mode in modes:
+            encoding = encodings[mode]
+            encoder_seconds = median_seconds(
+                lambda enc=encoding: run_encoder(model, enc), args.runs
+            )
+            title_seconds = median_seconds(
+                lambda enc=encoding: generate(model, tokenizer, enc, MAX_TITLE_TOKENS),
+                args.runs,
+            )
+            row += f"{1000 * encoder_seconds:>8.0f}ms{1000 * title_seconds:>8.0f}ms"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
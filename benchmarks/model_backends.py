@@ -0,0 +1,66 @@
+"""Compare the per-title latency of the PyTorch and ONNX Runtime model backends.
+
+Usage:
+    PYTHONPATH=. python benchmarks/model_backends.py \
+        --model_path=<artifact dir or HF repo> [--onnx_model_path=<dir>]
+
+The ONNX model is exported from --model_path when loaded, unless an
+exported model is given with --onnx_model_path.
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from motion_title_generator.motion_title_generator import MODEL, MotionTitleGenerator
+
+TEST_DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "test" / "test_data.csv"
+
+
+def time_titles(generator: MotionTitleGenerator, texts: List[str]):
+    """Return the titles of the texts and the seconds it took to make each."""
+    generator.predict(texts[0])  # Warm up
+    titles, seconds = [], []
+    for text in texts:
+        start = time.perf_counter()
+        titles.append(generator.predict(text))
+        seconds.append(time.perf_counter() - start)
+    return titles, seconds
+
+
+def main():
+    """Time both backends on the same texts and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model_path", default=MODEL)
+    parser.add_argument("--onnx_model_path", default=None)
+    parser.add_argument("--num_titles", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(TEST_DATA_PATH)["text"].tolist()
+    texts = [texts[i % len(texts)][: 100 + 50 * i] for i in range(args.num_titles)]
+
+    results = {}
+    for backend, model_path in [
+        ("pytorch", args.model_path),
+        ("onnx", args.onnx_model_path or args.model_path),
+    ]:
+        generator = MotionTitleGenerator(model_path, backend)
+        generator.encoder_cache = None  # Time the encoder too
+        results[backend] = time_titles(generator, texts)
+
+    same = sum(a == b for a, b in zip(results["pytorch"][0], results["onnx"][0]))
+    print(f"Titles:             {len(texts)} ({same} identical for both backends)")
+    for backend, (_, seconds) in results.items():
+        print(
+            f"{backend + ':':<20}"
+            f"mean {1000 * statistics.mean(seconds):8.1f} ms, "
+            f"median {1000 * statistics.median(seconds):8.1f} ms per title"
+        )
+
+
+if __name__ == "__main__":
+    main()
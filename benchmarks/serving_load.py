@@ -0,0 +1,148 @@
+"""Load test the title API, and compare the development server with gunicorn.
+
+Usage:
+    PYTHONPATH=. python benchmarks/serving_load.py [--workers=2]
+    PYTHONPATH=. python benchmarks/serving_load.py --url=http://localhost:8000
+
+Without --url, the app is started first with the Flask development server and
+then with gunicorn, and the same load is sent to both. The prediction cache
+is turned off in the started servers, so every request runs the model. The
+memory of a started server is reported as the summed proportional set size
+(PSS) of its processes, where pages shared between processes are split
+between them.
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from benchmarks.app_process import REPO_DIR, app_process, wait_for
+
+TEST_DATA_PATH = REPO_DIR / "data" / "test" / "test_data.csv"
+STARTUP_TIMEOUT = 300.0
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="Test an already running app")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers")
+    parser.add_argument("--num_requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    return parser
+
+
+def make_texts(num_texts: int) -> List[str]:
+    """Return distinct motion texts, so that no request is a cache hit."""
+    text = pd.read_csv(TEST_DATA_PATH)["text"].iloc[0]
+    return [f"{i}. {text}" for i in range(num_texts)]
+
+
+def run_load(url: str, texts: List[str], concurrency: int) -> Dict[str, float]:
+    """Post one text per request from `concurrency` threads and time them."""
+    local = threading.local()
+
+    def post(text: str) -> float:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        response = local.session.post(f"{url}/v1/titles", json={"text": text})
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    post(texts[0])  # Warm up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        seconds = sorted(pool.map(post, texts))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_s": len(texts) / elapsed,
+        "median_ms": 1000 * statistics.median(seconds),
+        "p95_ms": 1000 * seconds[int(0.95 * (len(seconds) - 1))],
+    }
+
+
+def process_tree_pss_mb(pid: int) -> Optional[float]:
+    """Return the summed PSS in MB of a process and its descendants, if the
+    platform reports it.
+    """
+    pids, total_kb = [pid], 0
+    try:
+        while pids:
+            current = pids.pop()
+            with open(f"/proc/{current}/smaps_rollup", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total_kb += int(line.split()[1])
+            for task in Path(f"/proc/{current}/task").iterdir():
+                pids.extend(int(c) for c in (task / "children").read_text().split())
+    except OSError:
+        return None
+    return total_kb / 1000
+
+
+def load_started_server(
+    command: List[str], port: int, texts: List[str], concurrency: int
+) -> Tuple[Dict[str, float], Optional[float]]:
+    """Start a server, run the load on it and return the results and the
+    server's memory use.
+    """
+    url = f"http://127.0.0.1:{port}"
+    with app_process(command, port) as process:
+        wait_for(f"{url}/health", process, time.perf_counter(), STARTUP_TIMEOUT)
+        result = run_load(url, texts, concurrency)
+        return result, process_tree_pss_mb(process.pid)
+
+
+def main():
+    """Run the load test and print the results."""
+    args = _setup_parser().parse_args()
+    texts = make_texts(args.num_requests)
+
+    if args.url:
+        servers = {args.url: None}
+    else:
+        servers = {
+            "flask dev server": [sys.executable, "api_server/app.py"],
+            f"gunicorn, {args.workers} workers": [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "-c",
+                "api_server/gunicorn.conf.py",
+                "-b",
+                f"127.0.0.1:{args.port}",
+                "-w",
+                str(args.workers),
+                "api_server.app:app",
+            ],
+        }
+
+    print(f"Requests: {len(texts)}, concurrency: {args.concurrency}")
+    for name, command in servers.items():
+        if command is None:
+            result, memory = run_load(name, texts, args.concurrency), None
+        else:
+            result, memory = load_started_server(
+                command, args.port, texts, args.concurrency
+            )
+        print(
+            f"{name + ':':<30}"
+            f"{result['requests_per_s']:6.2f} requests/s, "
+            f"median {result['median_ms']:8.1f} ms, "
+            f"p95 {result['p95_ms']:8.1f} ms"
+            + (f", {memory:8.1f} MB PSS" if memory is not None else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
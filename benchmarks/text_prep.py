@@ -0,0 +1,70 @@
+"""Compare prep_text with preprocessing the motions one row function at a time.
+
+Usage:
+    PYTHONPATH=. python benchmarks/text_prep.py [--repeat 2000]
+
+The texts in data/test/test_data.csv are repeated `--repeat` times.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utils.text import (
+    delete_footer,
+    prep_text,
+    set_empty_when_leading_date,
+    trim_leadning_motivation,
+    trim_linebreaks,
+    trim_motion_text_by_leading_title,
+    trim_motion_text_by_proposed_decision,
+    trim_motion_text_by_subtitle,
+    trim_whitespace,
+)
+
+TEST_DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "test" / "test_data.csv"
+
+
+def prep_text_by_row_functions(df):
+    """Preprocess texts the way prep_text used to, with one apply per step."""
+    df["text"] = trim_linebreaks(df["text"])
+    df["text"] = trim_whitespace(df["text"])
+    for row_function in [
+        trim_motion_text_by_subtitle,
+        trim_motion_text_by_leading_title,
+        trim_motion_text_by_proposed_decision,
+        trim_leadning_motivation,
+        set_empty_when_leading_date,
+        delete_footer,
+    ]:
+        df["text"] = df.apply(row_function, axis=1)
+    return df["text"]
+
+
+def main():
+    """Time both implementations on the same texts and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    motions = pd.read_csv(TEST_DATA_PATH)
+    df = pd.concat([motions] * args.repeat, ignore_index=True)
+    df["subtitle"] = df["text"].str[:20]
+
+    start = time.perf_counter()
+    before = prep_text_by_row_functions(df.copy())
+    before_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    after = prep_text(df.copy())
+    after_seconds = time.perf_counter() - start
+
+    print(f"Texts:              {len(df)} (identical output: {before.equals(after)})")
+    print(f"Row functions:      {len(df) / before_seconds:10.1f} texts/s")
+    print(f"prep_text:          {len(df) / after_seconds:10.1f} texts/s")
+    print(f"Speedup:            {before_seconds / after_seconds:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Command line interface of the motion title generator.
+
+Usage:
+    python -m motion_title_generator batch <input> <output> [options]
+"""
+
+import argparse
+
+from motion_title_generator import batch
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(prog="python -m motion_title_generator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help=batch.__doc__.splitlines()[0],
+        description=batch.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    batch.add_to_argparse(batch_parser)
+    batch_parser.set_defaults(func=batch.run)
+    return parser
+
+
+def main():
+    """Run the given command."""
+    args = _setup_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
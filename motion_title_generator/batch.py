@@ -0,0 +1,387 @@
+"""Generate titles for every text in a feather, parquet or CSV file.
+
+Usage:
+    python -m motion_title_generator batch <input> <output.parquet> \
+        [--workers=2] [--batch_size=16] [--chunk_size=512]
+
+Rows are read a chunk at a time, and each chunk is titled by one of the worker
+processes, in batches of texts of similar length. A chunk's titles are saved
+to a part file in <output>.parts as soon as they are done, so a run that is
+stopped resumes from the chunks that are left. The parts are only resumed by a
+run of the same input file, model and settings, see `make_manifest`. When all
+chunks are done, the parts are joined into the output file, with the input's
+row number, the id column if one is given, and the title.
+"""
+
+import argparse
+import json
+import math
+import shutil
+import os
+import time
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.feather
+import pyarrow.parquet as pq
+
+from motion_title_generator.motion_title_generator import get_model_id
+from utils.decoding import DecodingConfig
+from utils.log import logger
+from utils.text import clean_text
+
+WORKERS = 1
+BATCH_SIZE = 16
+CHUNK_SIZE = 512
+TEXT_COLUMN = "text"
+PARTS_SUFFIX = ".parts"
+MANIFEST_FILENAME = "manifest.json"
+
+# The model of a worker process, loaded once by _init_worker
+_generator = None  # pylint: disable=invalid-name
+_decoding: Optional[DecodingConfig] = None
+
+
+def add_to_argparse(parser):
+    """Add the arguments of a batch run to an argument parser and return it."""
+    parser.add_argument("input", help="Feather, parquet or CSV file of texts")
+    parser.add_argument("output", help="Parquet or feather file to save titles to")
+    parser.add_argument("--text_column", default=TEXT_COLUMN)
+    parser.add_argument(
+        "--id_column", default=None, help="Column to copy to the output with titles"
+    )
+    parser.add_argument(
+        "--model_path",
+        default=None,
+        help="Model artifact or huggingface repo, by default HF_REPO_OR_ARTIFACT_PATH "
+        "or the published model",
+    )
+    parser.add_argument("--backend", default=None, help="pytorch or onnx")
+    parser.add_argument(
+        "--long_input",
+        action="store_true",
+        help="Split long texts into windows instead of truncating them.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="Number of worker processes, each with its own model.",
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=None,
+        help="Torch threads of each worker, by default the CPU cores divided "
+        "by the number of workers.",
+    )
+    parser.add_argument("--batch_size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Number of rows to save progress after.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Remove the saved parts of an earlier run and start over.",
+    )
+    DecodingConfig.add_to_argparse(parser)
+    return parser
+
+
+def count_rows(path: Path) -> Optional[int]:
+    """Return the number of rows of a feather or parquet file, or None for CSV."""
+    if path.suffix == ".parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if path.suffix == ".feather":
+        return pyarrow.feather.read_table(path, columns=[], memory_map=True).num_rows
+    return None
+
+
+def read_schema(path: Path) -> pa.Schema:
+    """Return the schema of a feather, parquet or CSV file."""
+    if path.suffix == ".parquet":
+        return pq.read_schema(path)
+    if path.suffix == ".feather":
+        return pa.ipc.open_file(path).schema
+    return pyarrow.csv.open_csv(path).schema
+
+
+def _iter_feather_batches(path: Path, columns: List[str]) -> Iterator[pa.RecordBatch]:
+    """Yield the given columns of each record batch of a feather file."""
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield pa.RecordBatch.from_arrays(
+                [batch.column(column) for column in columns], names=columns
+            )
+
+
+def iter_chunks(
+    path: Path, columns: List[str], chunk_size: int
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Yield the chunk number and the given columns of each chunk of rows.
+
+    Parquet files are read one chunk at a time, feather files one record
+    batch at a time, which is decompressed when the file is compressed, and
+    CSV files are parsed in blocks, so the whole file is never held in memory.
+    """
+    if path.suffix == ".parquet":
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=columns
+        )
+    elif path.suffix == ".feather":
+        batches = _iter_feather_batches(path, columns)
+    elif path.suffix == ".csv":
+        batches = pyarrow.csv.open_csv(
+            path, convert_options=pyarrow.csv.ConvertOptions(include_columns=columns)
+        )
+    else:
+        raise ValueError(f"Expected a .feather, .parquet or .csv file, got {path}")
+
+    # Batches of the readers don't all have chunk_size rows, so rows are
+    # buffered to make chunks of exactly chunk_size rows
+    buffered: List[pa.RecordBatch] = []
+    num_buffered, chunk = 0, 0
+    for batch in batches:
+        buffered.append(batch)
+        num_buffered += batch.num_rows
+        while num_buffered >= chunk_size:
+            table = pa.Table.from_batches(buffered)
+            yield chunk, table.slice(0, chunk_size).to_pandas()
+            buffered = table.slice(chunk_size).to_batches()
+            num_buffered -= chunk_size
+            chunk += 1
+    if num_buffered:
+        yield chunk, pa.Table.from_batches(buffered).to_pandas()
+
+
+def part_path(parts_dir: Path, chunk: int) -> Path:
+    """Return the path of a chunk's part file."""
+    return parts_dir / f"part-{chunk:06d}.parquet"
+
+
+def _init_worker(
+    model_settings: Dict, decoding: DecodingConfig, num_threads: int
+) -> None:
+    """Limit the worker's torch threads and load its model."""
+    # pylint: disable=global-statement,import-outside-toplevel
+    global _generator, _decoding
+    import torch
+
+    from motion_title_generator.motion_title_generator import MotionTitleGenerator
+
+    torch.set_num_threads(num_threads)
+    _generator = MotionTitleGenerator(**model_settings)
+    _generator.encoder_cache = None  # Each text is only titled once
+    _decoding = decoding
+
+
+def title_chunk(texts: List[str], batch_size: int) -> List[str]:
+    """Title texts with the worker's model, batching texts of similar length
+    together, and return the titles in the order of the texts.
+    """
+    texts = [clean_text(text) if isinstance(text, str) else "" for text in texts]
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    titles = [""] * len(texts)
+    for start in range(0, len(order), batch_size):
+        end = start + batch_size
+        batch = order[start:end]
+        preds = _generator.predict_batch(  # type: ignore
+            [texts[i] for i in batch], decoding=_decoding
+        )
+        for i, pred in zip(batch, preds):
+            titles[i] = pred
+    return titles
+
+
+def _title_part(
+    chunk: int, first_row: int, frame: pd.DataFrame, part_settings: Dict
+) -> int:
+    """Title the texts of a chunk and save them to the chunk's part file.
+
+    `part_settings` holds the run's "text_column", "id_column", "batch_size"
+    and "parts_dir". The part is written to a temporary file that is renamed
+    when complete, so a stopped run never leaves a partial part behind.
+    Returns the number of titles.
+    """
+    titles = title_chunk(
+        frame[part_settings["text_column"]].tolist(), part_settings["batch_size"]
+    )
+    part = pd.DataFrame({"row": range(first_row, first_row + len(frame))})
+    id_column = part_settings["id_column"]
+    if id_column is not None:
+        part[id_column] = frame[id_column].to_numpy()
+    part["title"] = titles
+    path = part_path(part_settings["parts_dir"], chunk)
+    tmp_path = path.with_suffix(".tmp")
+    part.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(titles)
+
+
+def make_manifest(args: argparse.Namespace, decoding: DecodingConfig) -> Dict:
+    """Return what the parts of a run depend on: the size and modification time
+    of the input file, how it is split into chunks, the model and the decoding
+    settings.
+    """
+    stat = Path(args.input).stat()
+    return {
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunk_size": args.chunk_size,
+        "text_column": args.text_column,
+        "id_column": args.id_column,
+        "model_id": get_model_id(
+            args.model_path, args.backend, args.long_input or None, decoding
+        ),
+        "decoding": decoding.to_dict(),
+    }
+
+
+def prepare_parts_dir(parts_dir: Path, manifest: Dict, restart: bool) -> None:
+    """Create the parts directory with the run's manifest, or check that the
+    saved parts of an earlier run were made with the same manifest.
+
+    Raises ValueError if they were not, unless `restart`, in which case the
+    saved parts are removed.
+    """
+    manifest_path = parts_dir / MANIFEST_FILENAME
+    if restart and parts_dir.exists():
+        shutil.rmtree(parts_dir)
+    if parts_dir.exists():
+        saved = None
+        if manifest_path.is_file():
+            with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+                saved = json.load(manifest_file)
+        if saved != manifest and any(parts_dir.glob("part-*.parquet")):
+            raise ValueError(
+                f"The parts in {parts_dir} were made from another input file or "
+                "with other settings. Pass --restart to remove them and start over."
+            )
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+def output_schema(input_path: Path, id_column: Optional[str]) -> pa.Schema:
+    """Return the schema of the output file of titles of an input file."""
+    fields = [pa.field("row", pa.int64())]
+    if id_column is not None:
+        fields.append(read_schema(input_path).field(id_column))
+    return pa.schema(fields + [pa.field("title", pa.string())])
+
+
+def join_parts(parts_dir: Path, output: Path, schema: pa.Schema) -> None:
+    """Join the part files in order into the output file and remove them.
+
+    Without parts, as for an input without rows, an empty file with the given
+    schema is written.
+    """
+    paths = sorted(parts_dir.glob("part-*.parquet"))
+    if paths:
+        table = pa.concat_tables(pq.read_table(path) for path in paths)
+    else:
+        table = schema.empty_table()
+    if output.suffix == ".feather":
+        pyarrow.feather.write_feather(table, output)
+    else:
+        pq.write_table(table, output)
+    shutil.rmtree(parts_dir)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Title every text of the input file, resuming from saved parts."""
+    input_path, output = Path(args.input), Path(args.output)
+    parts_dir = output.with_name(output.name + PARTS_SUFFIX)
+    decoding = DecodingConfig.from_args(vars(args))
+    prepare_parts_dir(parts_dir, make_manifest(args, decoding), args.restart)
+    columns = [args.text_column] + ([args.id_column] if args.id_column else [])
+    num_rows = count_rows(input_path)
+    num_chunks = math.ceil(num_rows / args.chunk_size) if num_rows is not None else None
+    num_threads = args.threads_per_worker or max(
+        1, (os.cpu_count() or 1) // args.workers
+    )
+    worker_args = (
+        {
+            "model_path": args.model_path,
+            "backend": args.backend,
+            "long_input": args.long_input or None,
+        },
+        decoding,
+        num_threads,
+    )
+    logger.info(
+        "Titling %s rows of %s with %s workers of %s torch threads ...",
+        num_rows if num_rows is not None else "the",
+        input_path,
+        args.workers,
+        num_threads,
+    )
+
+    part_settings = {
+        "text_column": args.text_column,
+        "id_column": args.id_column,
+        "batch_size": args.batch_size,
+        "parts_dir": parts_dir,
+    }
+    tasks = (
+        (chunk, chunk * args.chunk_size, frame, part_settings)
+        for chunk, frame in iter_chunks(input_path, columns, args.chunk_size)
+        if not part_path(parts_dir, chunk).is_file()
+    )
+    _title_parts(tasks, args.workers, worker_args, parts_dir, num_chunks)
+    join_parts(parts_dir, output, output_schema(input_path, args.id_column))
+    logger.info("Saved titles to %s", output)
+
+
+def _title_parts(
+    tasks: Iterator[Tuple],
+    workers: int,
+    worker_args: Tuple,
+    parts_dir: Path,
+    num_chunks: Optional[int],
+) -> None:
+    """Title the parts of the tasks, see `_title_part`, in this process or
+    in a pool of `workers` processes.
+    """
+    start, num_titled = time.perf_counter(), 0
+    if workers == 1:
+        _init_worker(*worker_args)
+        for task in tasks:
+            num_titled += _title_part(*task)
+            _log_progress(num_titled, start, parts_dir, num_chunks)
+        return
+    # Spawned workers don't inherit the parent's torch threads, and each loads
+    # its own model
+    with get_context("spawn").Pool(workers, _init_worker, worker_args) as pool:
+        pending = []
+        for task in tasks:
+            pending.append(pool.apply_async(_title_part, task))
+            # Bound the rows held in memory to a couple of chunks per worker
+            while len(pending) >= 2 * workers:
+                num_titled += pending.pop(0).get()
+                _log_progress(num_titled, start, parts_dir, num_chunks)
+        for result in pending:
+            num_titled += result.get()
+            _log_progress(num_titled, start, parts_dir, num_chunks)
+
+
+def _log_progress(
+    num_titled: int, start: float, parts_dir: Path, num_chunks: Optional[int]
+) -> None:
+    """Log the number of done chunks and the throughput of this run."""
+    seconds = time.perf_counter() - start
+    logger.info(
+        "%s/%s chunks done, %.2f titles/s",
+        len(list(parts_dir.glob("part-*.parquet"))),
+        num_chunks if num_chunks is not None else "?",
+        num_titled / seconds,
+    )
@@ -2,9 +2,7 @@ from pathlib import Path
 from typing import Dict, Optional, Union
 
 import lightning as L
-from torch.utils.data import ConcatDataset, DataLoader
-
-from motion_title_generator.data.base_dataset import BaseDataset
+from torch.utils.data import ConcatDataset, DataLoader, Dataset
 
 BATCH_SIZE = 8
 NUM_WORKERS = 0
@@ -24,9 +22,9 @@ class BaseDataModule(L.LightningDataModule):
         self.on_gpu = isinstance(self.args.get("gpus", None), (str, int))
 
         # Make sure to set the variables below in subclasses
-        self.data_train: Union[BaseDataset, ConcatDataset]
-        self.data_val: Union[BaseDataset, ConcatDataset]
-        self.data_test: Union[BaseDataset, ConcatDataset]
+        self.data_train: Union[Dataset, ConcatDataset]
+        self.data_val: Union[Dataset, ConcatDataset]
+        self.data_test: Union[Dataset, ConcatDataset]
 
     @classmethod
     def data_dirname(cls):
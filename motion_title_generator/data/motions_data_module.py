@@ -1,11 +1,22 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 
 import pandas as pd
 from torch.utils.data import DataLoader
+from transformers.models.mt5 import MT5Tokenizer
 
 from motion_title_generator.data.base_data_module import BaseDataModule
-from motion_title_generator.data.t5_encodings_dataset import MT5EncodingsDataset
-from motion_title_generator.data.util import split_data
+from motion_title_generator.data.samplers import LengthBucketBatchSampler
+from motion_title_generator.data.t5_encodings_dataset import (
+    MAX_TEXT_TOKENS,
+    MAX_TITLE_TOKENS,
+    MAX_WINDOWS,
+    MT5_VERSION,
+    WINDOW_OVERLAP,
+    MT5EncodingsDataset,
+    MT5TokenCacheDataset,
+)
+from motion_title_generator.data.token_cache import TokenCache
+from motion_title_generator.data.util import DynamicPaddingCollator, split_data
 from training_data_pipeline.pipeline import get_data
 from utils.log import logger
 
@@ -13,13 +24,14 @@ DATA_PATH = (
     BaseDataModule.data_dirname() / "downloaded" / "prepped_training_data.feather"
 )
 TEST_DATA_PATH = BaseDataModule.data_dirname() / "test" / "test_data.csv"
+TOKEN_CACHE_DIR = BaseDataModule.data_dirname() / "downloaded" / "token_cache"
 
 DATA_FRACTION = 1.0  # Allows scaling data down for faster training
 TRAIN_FRAC = 0.75
 VAL_FRAC = 0.15
 
 
-class MotionsDataModule(BaseDataModule):
+class MotionsDataModule(BaseDataModule):  # pylint: disable=too-many-instance-attributes
     """Pytorch lightning DataModule class for the motion data."""
 
     def __init__(self, args: Optional[Dict] = None) -> None:
@@ -27,16 +39,75 @@ class MotionsDataModule(BaseDataModule):
         self.args = args if args is not None else {}
         self.data_fraction = float(self.args.get("data_fraction", DATA_FRACTION))
         self.seed = 2
+        self.dynamic_padding = bool(self.args.get("dynamic_padding", False))
+        self.pad_to_multiple_of = self.args.get("pad_to_multiple_of")
+        self.collate_fn: Optional[DynamicPaddingCollator] = None
+        self.bucket_batches = bool(self.args.get("bucket_batches", False))
+        self.use_token_cache = bool(self.args.get("token_cache", False))
+        self.long_input = bool(self.args.get("long_input", False))
+        if self.use_token_cache and self.long_input:
+            raise ValueError("--token_cache can't be used with --long_input.")
+        self.token_cache: Optional[TokenCache] = None
+        self.tokenizer = MT5Tokenizer.from_pretrained(f"google/mt5-{MT5_VERSION}")
+        if self.bucket_batches and not self.dynamic_padding:
+            logger.warning("--bucket_batches has no effect without --dynamic_padding.")
 
     @staticmethod
     def add_to_argparse(parser):  # pylint: disable=missing-function-docstring
         BaseDataModule.add_to_argparse(parser)
+        parser.add_argument(
+            "--prep_workers",
+            type=int,
+            default=None,
+            help="Number of processes to prep the data in, by default one per "
+            "CPU core.",
+        )
         parser.add_argument(
             "--data_fraction",
             type=float,
             default=DATA_FRACTION,
             help="Share of total training examples to use.",
         )
+        parser.add_argument(
+            "--dynamic_padding",
+            action="store_true",
+            help="Pad each batch to its longest example instead of to max length.",
+        )
+        parser.add_argument(
+            "--pad_to_multiple_of",
+            type=int,
+            default=None,
+            help="Round dynamically padded length up to a multiple of this number.",
+        )
+        parser.add_argument(
+            "--bucket_batches",
+            action="store_true",
+            help="Batch examples of similar token length together.",
+        )
+        parser.add_argument(
+            "--token_cache",
+            action="store_true",
+            help="Tokenize the data once and read token ids from a memory-mapped "
+            "cache in data/downloaded/token_cache.",
+        )
+        parser.add_argument(
+            "--long_input",
+            action="store_true",
+            help="Split texts longer than 512 tokens into overlapping windows "
+            "and fuse their encoder outputs, instead of truncating them.",
+        )
+        parser.add_argument(
+            "--window_overlap",
+            type=int,
+            default=WINDOW_OVERLAP,
+            help="Number of tokens that consecutive windows share.",
+        )
+        parser.add_argument(
+            "--max_windows",
+            type=int,
+            default=MAX_WINDOWS,
+            help="Max number of windows to split a text into.",
+        )
         return parser
 
     def prepare_data(self, *args, **kwargs):
@@ -48,7 +119,7 @@ class MotionsDataModule(BaseDataModule):
         elif self.trainer and self.trainer.testing:
             pass
         else:
-            get_data()
+            get_data(prep_workers=self.args.get("prep_workers"))
 
     def setup(self, stage: Optional[str] = None) -> None:
         """Define steps that should be done on every GPU, like splitting data,
@@ -61,9 +132,19 @@ class MotionsDataModule(BaseDataModule):
         if self.args.get("overfit_batches", 0) == 1:
             data = pd.read_csv(TEST_DATA_PATH)
         else:
-            data = pd.read_feather(DATA_PATH)
+            data = pd.read_feather(DATA_PATH, columns=["title", "text"])
 
         total_rows = len(data)
+        if self.use_token_cache:
+            # Cache the full data so the cache is reused for any data fraction
+            self.token_cache = TokenCache.load_or_build(
+                TOKEN_CACHE_DIR,
+                data["text"].tolist(),
+                data["title"].tolist(),
+                self.tokenizer,
+                self.args.get("max_text_tokens", MAX_TEXT_TOKENS),
+                self.args.get("max_title_tokens", MAX_TITLE_TOKENS),
+            )
         data = data.sample(frac=self.data_fraction, random_state=self.seed)
         logger.info("Using %s of %s examples.", len(data), total_rows)
 
@@ -71,42 +152,73 @@ class MotionsDataModule(BaseDataModule):
             data, TRAIN_FRAC, VAL_FRAC, self.seed
         )
 
-        self.data_train = MT5EncodingsDataset(
-            data=data.iloc[list(data_train.indices)]["text"].tolist(),
-            targets=data.iloc[list(data_train.indices)]["title"].tolist(),
-        )
-        self.data_val = MT5EncodingsDataset(
-            data=data.iloc[list(data_val.indices)]["text"].tolist(),
-            targets=data.iloc[list(data_val.indices)]["title"].tolist(),
-        )
-        self.data_test = MT5EncodingsDataset(
-            data=data.iloc[list(data_test.indices)]["text"].tolist(),
-            targets=data.iloc[list(data_test.indices)]["title"].tolist(),
-        )
-
-    def train_dataloader(self):
-        """Return DataLoader for Training Data."""
+        if self.token_cache is not None:
+            # The sampled data keeps the row numbers of the full data as index
+            self.data_train, self.data_val, self.data_test = (
+                MT5TokenCacheDataset(
+                    self.token_cache,
+                    indices=data.index[list(split.indices)].tolist(),
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    args=self.args,
+                )
+                for split in (data_train, data_val, data_test)
+            )
+        else:
+            self.data_train = MT5EncodingsDataset(
+                data=data.iloc[list(data_train.indices)]["text"].tolist(),
+                targets=data.iloc[list(data_train.indices)]["title"].tolist(),
+                args=self.args,
+            )
+            self.data_val = MT5EncodingsDataset(
+                data=data.iloc[list(data_val.indices)]["text"].tolist(),
+                targets=data.iloc[list(data_val.indices)]["title"].tolist(),
+                args=self.args,
+            )
+            self.data_test = MT5EncodingsDataset(
+                data=data.iloc[list(data_test.indices)]["text"].tolist(),
+                targets=data.iloc[list(data_test.indices)]["title"].tolist(),
+                args=self.args,
+            )
+        # Texts split into windows have different numbers of windows to pad
+        if self.dynamic_padding or self.long_input:
+            self.collate_fn = DynamicPaddingCollator(
+                pad_token_id=self.tokenizer.pad_token_id,
+                pad_to_multiple_of=self.pad_to_multiple_of,
+            )
+
+    def _dataloader(
+        self, dataset: Union[MT5EncodingsDataset, MT5TokenCacheDataset], shuffle: bool
+    ) -> DataLoader:
+        """Return a DataLoader, with length bucketed batches if enabled."""
+        if self.bucket_batches:
+            batch_sampler = LengthBucketBatchSampler(
+                dataset.token_lengths(),
+                batch_size=self.batch_size,
+                shuffle=shuffle,
+                seed=self.seed,
+            )
+            return DataLoader(
+                dataset,
+                batch_sampler=batch_sampler,
+                num_workers=self.num_workers,
+                collate_fn=self.collate_fn,
+            )
         return DataLoader(
-            self.data_train,
+            dataset,
             batch_size=self.batch_size,
-            shuffle=True,
+            shuffle=shuffle,
             num_workers=self.num_workers,
+            collate_fn=self.collate_fn,
         )
 
+    def train_dataloader(self):
+        """Return DataLoader for Training Data."""
+        return self._dataloader(self.data_train, shuffle=True)
+
     def val_dataloader(self):
         """Return DataLoader for Validation Data."""
-        return DataLoader(
-            self.data_val,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=self.num_workers,
-        )
+        return self._dataloader(self.data_val, shuffle=False)
 
     def test_dataloader(self):
         """Return DataLoader for Test Data."""
-        return DataLoader(
-            self.data_test,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=self.num_workers,
-        )
+        return self._dataloader(self.data_test, shuffle=False)
@@ -0,0 +1,126 @@
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+from torch.utils.data import Sampler
+
+from utils.log import logger
+
+BUCKET_SIZE_MULTIPLIER = 50
+
+
+class LengthBucketBatchSampler(  # pylint: disable=too-many-instance-attributes
+    Sampler[List[int]]
+):
+    """Batch sampler that puts examples of similar length in the same batch.
+
+    When shuffling, the examples are shuffled and split into buckets of
+    `batch_size * bucket_size_multiplier` examples. Each bucket is sorted by
+    length and cut into batches, and the batches from all buckets are then
+    shuffled. Without shuffling, all examples are sorted by length. The order is
+    deterministic for a given seed and epoch. The epoch is advanced every time
+    the sampler is iterated over, unless set with `set_epoch`.
+
+    Parameters
+    ----------
+    lengths
+        token length of each example in the dataset
+    batch_size
+        number of examples per batch
+    shuffle
+        whether to shuffle examples within and batches across buckets
+    seed
+        seed for the shuffling, combined with the epoch set by `set_epoch`
+    bucket_size_multiplier
+        number of batches per bucket
+    drop_last
+        whether to drop the last batch of each bucket if it is not full
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        lengths: Sequence[int],
+        batch_size: int,
+        shuffle: bool = True,
+        seed: int = 0,
+        bucket_size_multiplier: int = BUCKET_SIZE_MULTIPLIER,
+        drop_last: bool = False,
+    ) -> None:
+        super().__init__(None)
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.bucket_size = batch_size * bucket_size_multiplier
+        self.drop_last = drop_last
+        self.epoch = 0
+        self.padding_efficiency: Optional[float] = None
+
+    def set_epoch(self, epoch: int) -> None:
+        """Set the epoch that the next iteration should use."""
+        self.epoch = epoch
+
+    def _batches(self, epoch: int) -> List[np.ndarray]:
+        """Return the batches of dataset indices for an epoch."""
+        if not self.shuffle:
+            order = np.argsort(self.lengths, kind="stable")
+            return self._split(order)
+
+        rng = np.random.default_rng([self.seed, epoch])
+        indices = rng.permutation(len(self.lengths))
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            end = start + self.bucket_size
+            bucket = indices[start:end]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            batches.extend(self._split(bucket))
+        return [batches[i] for i in rng.permutation(len(batches))]
+
+    def _split(self, indices: np.ndarray) -> List[np.ndarray]:
+        """Cut an array of indices into batches."""
+        if len(indices) == 0:
+            return []
+        batches = np.split(
+            indices, range(self.batch_size, len(indices), self.batch_size)
+        )
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        """Yield lists of dataset indices, one list per batch."""
+        epoch = self.epoch
+        self.epoch += 1
+        batches = self._batches(epoch)
+        self.padding_efficiency = padding_efficiency(self.lengths, batches)
+        logger.info(
+            "Epoch %s: padding efficiency of length bucketed batches is %.1f%%.",
+            epoch,
+            100 * self.padding_efficiency,
+        )
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self) -> int:
+        """Return the number of batches per epoch."""
+        if self.shuffle:
+            full_buckets, last_bucket = divmod(len(self.lengths), self.bucket_size)
+            batches_per_bucket = self._num_batches(self.bucket_size)
+            return full_buckets * batches_per_bucket + self._num_batches(last_bucket)
+        return self._num_batches(len(self.lengths))
+
+    def _num_batches(self, num_examples: int) -> int:
+        """Return the number of batches that a number of examples is split into."""
+        if self.drop_last:
+            return num_examples // self.batch_size
+        return -(-num_examples // self.batch_size)
+
+
+def padding_efficiency(lengths: np.ndarray, batches: Sequence[np.ndarray]) -> float:
+    """Return the share of tokens that are not padding when each batch is
+    padded to its longest example.
+    """
+    real_tokens = sum(int(lengths[batch].sum()) for batch in batches)
+    padded_tokens = sum(int(lengths[batch].max()) * len(batch) for batch in batches)
+    return real_tokens / padded_tokens if padded_tokens else 1.0
@@ -1,16 +1,23 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
+import numpy as np
+import torch
+from torch.utils.data import Dataset
 from transformers.models.mt5 import MT5Tokenizer
 
 from motion_title_generator.data.base_dataset import BaseDataset
-from utils.encode_decode import encode
+from motion_title_generator.data.token_cache import TokenCache
+from motion_title_generator.data.util import LABEL_PAD_ID
+from utils.encode_decode import encode, encode_windows
 
 MAX_TEXT_TOKENS = 512
 MAX_TITLE_TOKENS = 64
+WINDOW_OVERLAP = 64
+MAX_WINDOWS = 8
 MT5_VERSION = "small"
 
 
-class MT5EncodingsDataset(BaseDataset):
+class MT5EncodingsDataset(BaseDataset):  # pylint: disable=too-many-instance-attributes
     """Extends base class to return text encodings."""
 
     def __init__(self, data, targets, args: Optional[Dict] = None) -> None:
@@ -26,6 +33,14 @@ class MT5EncodingsDataset(BaseDataset):
         self.tokenizer = MT5Tokenizer.from_pretrained(model)
         self.max_text_tokens = self.args.get("max_text_tokens", MAX_TEXT_TOKENS)
         self.max_title_tokens = self.args.get("max_title_tokens", MAX_TITLE_TOKENS)
+        # Leave padding to the DataLoader's collate function, see
+        # motion_title_generator.data.util.DynamicPaddingCollator
+        self.padding = False if self.args.get("dynamic_padding") else "max_length"
+        # Split long texts into windows of max_text_tokens instead of truncating
+        self.long_input = bool(self.args.get("long_input", False))
+        self.window_overlap = self.args.get("window_overlap", WINDOW_OVERLAP)
+        self.max_windows = self.args.get("max_windows", MAX_WINDOWS)
+        self._token_lengths: Optional[List[int]] = None
 
     @staticmethod
     def add_to_argparse(parser):  # pylint: disable=missing-function-docstring
@@ -49,14 +64,51 @@ class MT5EncodingsDataset(BaseDataset):
         )
         return parser
 
+    def token_lengths(self) -> List[int]:
+        """Return the number of tokens in each encoded text, after truncation,
+        or before it in long input mode.
+        """
+        if self._token_lengths is None and len(self.data) == 0:
+            self._token_lengths = []
+        if self._token_lengths is None:
+            encodings = self.tokenizer(
+                list(self.data),
+                max_length=self.max_text_tokens,
+                truncation=not self.long_input,
+            )
+            self._token_lengths = [len(ids) for ids in encodings["input_ids"]]
+        return self._token_lengths
+
     def __getitem__(self, index: int) -> Dict[Any, Any]:
-        """Return text and title with their encodings and attention masks."""
+        """Return text and title with their encodings and attention masks.
+
+        In long input mode, the text's input ids and attention mask have the
+        shape (windows, tokens).
+        """
         items = super().__getitem__(index)
         text = items["datum"]
         title = items["target"]
 
-        text_encoding = encode(text, self.tokenizer, self.max_text_tokens)
-        title_encoding = encode(title, self.tokenizer, self.max_title_tokens)
+        if self.long_input:
+            text_encoding = encode_windows(
+                text,
+                self.tokenizer,
+                self.max_text_tokens,
+                self.window_overlap,
+                self.max_windows,
+                padding=self.padding or "longest",
+            )
+            input_ids = text_encoding["input_ids"][0]
+            attention_mask = text_encoding["attention_mask"][0]
+        else:
+            text_encoding = encode(
+                text, self.tokenizer, self.max_text_tokens, padding=self.padding
+            )
+            input_ids = text_encoding["input_ids"].flatten()
+            attention_mask = text_encoding["attention_mask"].flatten()
+        title_encoding = encode(
+            title, self.tokenizer, self.max_title_tokens, padding=self.padding
+        )
 
         title_mod_ids = title_encoding["input_ids"]
         title_mod_ids[title_mod_ids == 0] = -100
@@ -64,8 +116,83 @@ class MT5EncodingsDataset(BaseDataset):
         return {
             "text": text,
             "title": title,
-            "input_ids": text_encoding["input_ids"].flatten(),
-            "attention_mask": text_encoding["attention_mask"].flatten(),
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
             "title_mod_ids": title_mod_ids.flatten(),
             "title_attention_mask": title_encoding["attention_mask"].flatten(),
         }
+
+
+class MT5TokenCacheDataset(Dataset):
+    """Return encodings of examples that are read from a pre-tokenized TokenCache.
+
+    Unlike MT5EncodingsDataset, no texts are held in memory and nothing is
+    tokenized when an example is fetched. Items don't hold the raw text and title.
+
+    Parameters
+    ----------
+    token_cache
+        the cache to read token ids from
+    indices
+        the cache indices of the examples in this dataset
+    pad_token_id
+        id to pad input ids with
+    args
+        dict that may set "dynamic_padding", "max_text_tokens" and
+        "max_title_tokens"
+    """
+
+    def __init__(
+        self,
+        token_cache: TokenCache,
+        indices: Sequence[int],
+        pad_token_id: int,
+        args: Optional[Dict] = None,
+    ) -> None:
+        super().__init__()
+        self.args = args if args is not None else {}
+        self.token_cache = token_cache
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.pad_token_id = pad_token_id
+        self.max_text_tokens = self.args.get("max_text_tokens", MAX_TEXT_TOKENS)
+        self.max_title_tokens = self.args.get("max_title_tokens", MAX_TITLE_TOKENS)
+        self.dynamic_padding = bool(self.args.get("dynamic_padding"))
+
+    def __len__(self) -> int:
+        """Return length of the dataset."""
+        return len(self.indices)
+
+    def token_lengths(self) -> List[int]:
+        """Return the number of tokens in each encoded text, after truncation."""
+        return self.token_cache.lengths("text")[self.indices].tolist()
+
+    def _to_tensors(self, ids: np.ndarray, max_tokens: int, pad_value: int):
+        """Return ids and attention mask as tensors, padded to max_tokens unless
+        padding is left to the collate function.
+        """
+        num_pad = 0 if self.dynamic_padding else max_tokens - len(ids)
+        ids_tensor = torch.full((len(ids) + num_pad,), pad_value, dtype=torch.long)
+        ids_tensor[: len(ids)] = torch.from_numpy(ids.astype(np.int64))
+        attention_mask = torch.zeros(len(ids) + num_pad, dtype=torch.long)
+        attention_mask[: len(ids)] = 1
+        return ids_tensor, attention_mask
+
+    def __getitem__(self, index: int) -> Dict[Any, Any]:
+        """Return text and title encodings and attention masks."""
+        cache_index = self.indices[index]
+        input_ids, attention_mask = self._to_tensors(
+            self.token_cache.ids("text", cache_index),
+            self.max_text_tokens,
+            self.pad_token_id,
+        )
+        title_mod_ids, title_attention_mask = self._to_tensors(
+            self.token_cache.ids("title", cache_index),
+            self.max_title_tokens,
+            LABEL_PAD_ID,
+        )
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "title_mod_ids": title_mod_ids,
+            "title_attention_mask": title_attention_mask,
+        }
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.log import logger
+
+TOKENIZE_CHUNK_SIZE = 1000
+FIELDS = ("text", "title")
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Return a hash that changes whenever the tokenizer's vocabulary does."""
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode())
+    digest.update(str(len(tokenizer)).encode())
+    vocab_file = getattr(tokenizer, "vocab_file", None)
+    if vocab_file and Path(vocab_file).is_file():
+        digest.update(Path(vocab_file).read_bytes())
+    else:
+        digest.update(str(tokenizer.name_or_path).encode())
+    return digest.hexdigest()
+
+
+def cache_key(
+    texts: Sequence[str],
+    titles: Sequence[str],
+    tokenizer,
+    max_text_tokens: int,
+    max_title_tokens: int,
+) -> str:
+    """Return a key for a token cache built from the given data and settings."""
+    digest = hashlib.sha256()
+    digest.update(tokenizer_fingerprint(tokenizer).encode())
+    digest.update(f"{max_text_tokens}:{max_title_tokens}".encode())
+    for column in (texts, titles):
+        digest.update(str(len(column)).encode())
+        for value in column:
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _write_field(
+    cache_dir: Path, field: str, values: Sequence[str], tokenizer, max_tokens: int
+) -> None:
+    """Tokenize the values of a field, a chunk at a time, and write their ids
+    and the offsets of each example's ids to the cache directory.
+    """
+    offsets = [0]
+    with open(cache_dir / f"{field}_ids.int32", "wb") as ids_file:
+        for start in range(0, len(values), TOKENIZE_CHUNK_SIZE):
+            end = start + TOKENIZE_CHUNK_SIZE
+            chunk = list(values[start:end])
+            encodings = tokenizer(chunk, max_length=max_tokens, truncation=True)
+            for ids in encodings["input_ids"]:
+                ids_file.write(np.asarray(ids, dtype=np.int32).tobytes())
+                offsets.append(offsets[-1] + len(ids))
+    np.save(cache_dir / f"{field}_offsets.npy", np.asarray(offsets, np.int64))
+
+
+class TokenCache:
+    """Token ids of texts and titles, stored in flat memory-mapped files.
+
+    For each of the fields "text" and "title" a cache directory holds
+    `<field>_ids.int32`, every example's token ids after each other, and
+    `<field>_offsets.npy`, where example i's ids are found between offsets i and
+    i + 1. The files are opened as read-only memory maps, so processes reading
+    the same cache share its pages through the OS page cache.
+
+    The memory maps are opened on first access and are not pickled, so a
+    TokenCache can be passed to DataLoader worker processes cheaply.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+
+    def __getstate__(self):
+        """Drop the memory maps when pickling, they are reopened on access."""
+        return {"cache_dir": self.cache_dir, "_arrays": None}
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Return the memory-mapped id and offset arrays, opening them if needed."""
+        if self._arrays is None:
+            arrays = {}
+            for field in FIELDS:
+                ids_path = self.cache_dir / f"{field}_ids.int32"
+                if ids_path.stat().st_size == 0:
+                    arrays[f"{field}_ids"] = np.zeros(0, dtype=np.int32)
+                else:
+                    arrays[f"{field}_ids"] = np.memmap(
+                        ids_path, dtype=np.int32, mode="r"
+                    )
+                arrays[f"{field}_offsets"] = np.load(
+                    self.cache_dir / f"{field}_offsets.npy", mmap_mode="r"
+                )
+            self._arrays = arrays
+        return self._arrays
+
+    def __len__(self) -> int:
+        """Return the number of cached examples."""
+        return len(self.arrays["text_offsets"]) - 1
+
+    def ids(self, field: str, index: int) -> np.ndarray:
+        """Return a read-only view of the token ids of one example's field."""
+        offsets = self.arrays[f"{field}_offsets"]
+        start, end = offsets[index], offsets[index + 1]
+        return self.arrays[f"{field}_ids"][start:end]
+
+    def lengths(self, field: str) -> np.ndarray:
+        """Return the number of tokens in the field of every example."""
+        return np.diff(self.arrays[f"{field}_offsets"])
+
+    @classmethod
+    def build(  # pylint: disable=too-many-arguments
+        cls,
+        cache_dir: Path,
+        texts: Sequence[str],
+        titles: Sequence[str],
+        tokenizer,
+        max_text_tokens: int,
+        max_title_tokens: int,
+    ) -> "TokenCache":
+        """Tokenize texts and titles and write them to a new cache directory."""
+        cache_dir = Path(cache_dir)
+        tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        logger.info("Tokenizing %s examples to %s ...", len(texts), cache_dir)
+        columns = {
+            "text": (texts, max_text_tokens),
+            "title": (titles, max_title_tokens),
+        }
+        for field, (values, max_tokens) in columns.items():
+            _write_field(tmp_dir, field, values, tokenizer, max_tokens)
+
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as meta_file:
+            json.dump(
+                {
+                    "num_examples": len(texts),
+                    "max_text_tokens": max_text_tokens,
+                    "max_title_tokens": max_title_tokens,
+                    "tokenizer": str(tokenizer.name_or_path),
+                },
+                meta_file,
+            )
+        tmp_dir.rename(cache_dir)
+        logger.info("Token cache saved to %s", cache_dir)
+        return cls(cache_dir)
+
+    @classmethod
+    def load_or_build(  # pylint: disable=too-many-arguments
+        cls,
+        root_dir: Path,
+        texts: Sequence[str],
+        titles: Sequence[str],
+        tokenizer,
+        max_text_tokens: int,
+        max_title_tokens: int,
+    ) -> "TokenCache":
+        """Return the cache for the data and settings, building it if missing."""
+        key = cache_key(texts, titles, tokenizer, max_text_tokens, max_title_tokens)
+        cache_dir = Path(root_dir) / key
+        if (cache_dir / "meta.json").is_file():
+            logger.info("Using token cache at %s", cache_dir)
+            return cls(cache_dir)
+        return cls.build(
+            cache_dir, texts, titles, tokenizer, max_text_tokens, max_title_tokens
+        )
@@ -1,8 +1,13 @@
+from typing import Any, Dict, List, Optional
+
 import torch
+from torch.nn.utils.rnn import pad_sequence
 from torch.utils.data import random_split
 
 from utils.log import logger
 
+LABEL_PAD_ID = -100  # Ignored by the loss function
+
 
 def split_data(df, train_frac, val_frac, seed):
     """Return train, validation and test dataframes"""
@@ -24,3 +29,63 @@ def split_data(df, train_frac, val_frac, seed):
         lengths=[train_size, val_size, test_size],
         generator=torch.Generator().manual_seed(seed),
     )
+
+
+class DynamicPaddingCollator:
+    """Collate unpadded encodings into a batch padded to its longest example.
+
+    Parameters
+    ----------
+    pad_token_id
+        id to pad input ids with
+    pad_to_multiple_of
+        optionally round the padded length up to a multiple of this number
+    """
+
+    # Value to pad each tensor key with. Other keys are collated into lists.
+    PAD_VALUES = {
+        "input_ids": None,  # Set to pad_token_id
+        "attention_mask": 0,
+        "title_mod_ids": LABEL_PAD_ID,
+        "title_attention_mask": 0,
+    }
+
+    def __init__(self, pad_token_id: int, pad_to_multiple_of: Optional[int] = None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, examples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pad and stack a list of examples from a dataset into a batch."""
+        batch: Dict[str, Any] = {}
+        for key in examples[0]:
+            values = [example[key] for example in examples]
+            if key not in self.PAD_VALUES:
+                batch[key] = values
+                continue
+            pad_value = self.PAD_VALUES[key]
+            if pad_value is None:
+                pad_value = self.pad_token_id
+            batch[key] = self.pad(values, pad_value)
+        return batch
+
+    def pad(self, tensors: List[torch.Tensor], pad_value: int) -> torch.Tensor:
+        """Stack 1-D tensors into a 2-D tensor, padding them at the end.
+
+        2-D tensors, of texts split into windows, are stacked into a 3-D tensor,
+        padded with empty windows to the same number of windows.
+        """
+        if tensors[0].dim() == 2:
+            length = max(tensor.shape[-1] for tensor in tensors)
+            tensors = [
+                torch.nn.functional.pad(
+                    tensor, (0, length - tensor.shape[-1]), value=pad_value
+                )
+                for tensor in tensors
+            ]
+        padded = pad_sequence(tensors, batch_first=True, padding_value=pad_value)
+        if self.pad_to_multiple_of:
+            remainder = padded.shape[-1] % self.pad_to_multiple_of
+            if remainder:
+                extra = self.pad_to_multiple_of - remainder
+                padded = torch.nn.functional.pad(padded, (0, extra), value=pad_value)
+        return padded
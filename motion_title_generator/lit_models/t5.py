@@ -4,7 +4,9 @@ from typing import Dict, List, Optional
 from transformers.models.mt5 import MT5Tokenizer
 
 from motion_title_generator.data.t5_encodings_dataset import MAX_TITLE_TOKENS
+from motion_title_generator.data.util import LABEL_PAD_ID
 from motion_title_generator.lit_models.base import BaseLitModel
+from utils.decoding import DecodingConfig
 from utils.encode_decode import generate
 
 
@@ -17,6 +19,10 @@ class MT5LitModel(BaseLitModel):  # pylint: disable=too-many-ancestors
         self.model = model
         self.tokenizer = MT5Tokenizer.from_pretrained(model.model_name)
         self.validation_step_outputs: List[Dict] = []
+        # How sample titles are decoded at the end of each validation epoch
+        self.decoding = DecodingConfig.from_args(self.args)
+        if self.decoding.strategy == "speculative":
+            raise ValueError("Speculative decoding is not supported in training")
 
     def forward(self, input_ids, attention_mask, decoder_attention_mask, labels=None):
         """Forward pass through self.model."""
@@ -63,14 +69,27 @@ class MT5LitModel(BaseLitModel):  # pylint: disable=too-many-ancestors
             self.tokenizer,
             sample_output,
             self.args.get("max_title_tokens", MAX_TITLE_TOKENS),
+            decoding=self.decoding,
         )
         self.logger.experiment.add_text(
-            "actual title", sample_output["title"][0], global_step=self.global_step
+            "actual title",
+            self._actual_title(sample_output),
+            global_step=self.global_step,
         )
         self.logger.experiment.add_text(
             "generated title", generated_title, global_step=self.global_step
         )
 
+    def _actual_title(self, batch) -> str:
+        """Return the first title in a batch, decoding it if the batch has no raw
+        titles, as when reading from a token cache.
+        """
+        if "title" in batch:
+            return batch["title"][0]
+        title_ids = batch["title_mod_ids"][0]
+        title_ids = title_ids[title_ids != LABEL_PAD_ID]
+        return self.tokenizer.decode(title_ids, skip_special_tokens=True)
+
     def test_step(self, batch, batch_idx):
         """Run forward pass and log loss."""
         loss, _ = self(
@@ -3,6 +3,8 @@ from typing import Any, Dict, Optional
 from torch import nn
 from transformers.models.mt5.modeling_mt5 import MT5ForConditionalGeneration
 
+from utils.encode_decode import encode_fused
+
 MT5_VERSION = "small"
 
 
@@ -31,11 +33,26 @@ class MT5(nn.Module):
         return parser
 
     def forward(self, input_ids, attention_mask, decoder_attention_mask, labels=None):
-        """Forward pass through self.model."""
-        output = self.model(
-            input_ids,
-            attention_mask=attention_mask,
-            labels=labels,
-            decoder_attention_mask=decoder_attention_mask,
-        )
+        """Forward pass through self.model.
+
+        Texts that are split into windows, with input ids of shape (texts,
+        windows, tokens), have their windows' encoder outputs fused.
+        """
+        if input_ids.dim() == 3:
+            encoder_outputs, attention_mask = encode_fused(
+                self.model, input_ids, attention_mask
+            )
+            output = self.model(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                labels=labels,
+                decoder_attention_mask=decoder_attention_mask,
+            )
+        else:
+            output = self.model(
+                input_ids,
+                attention_mask=attention_mask,
+                labels=labels,
+                decoder_attention_mask=decoder_attention_mask,
+            )
         return output.loss, output.logits
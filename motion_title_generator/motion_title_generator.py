@@ -1,30 +1,440 @@
+import copy
+import json
 import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Generator, List, Optional, Tuple
 
-import torch
-from transformers.models.auto.modeling_auto import AutoModelForSeq2SeqLM
-from transformers.models.mt5 import MT5Tokenizer
+from utils.decoding import DecodingConfig
+from utils.encode_decode import (
+    encode,
+    encode_windows,
+    generate,
+    generate_batch,
+    generate_stream,
+)
+from utils.encoder_cache import EncoderCache
 
-from utils.encode_decode import encode, generate
+# torch and transformers take seconds to import, so they are imported when a
+# model is loaded. That lets the API server answer health checks meanwhile.
+# pylint: disable=import-outside-toplevel
 
 MODEL = "erikgrip2/mt5-finetuned-for-motion-title"
 MAX_TEXT_TOKENS = 512
 MAX_TITLE_TOKENS = 64
+# Pad batches to their longest text, rounded up to a multiple of 8. Set the
+# PREDICT_PADDING environment variable to "max_length" to always pad to 512 tokens.
+PADDING = "longest"
+PAD_TO_MULTIPLE_OF = 8
+# Set the PREDICT_LONG_INPUT environment variable to "1" to split texts longer than
+# MAX_TEXT_TOKENS into overlapping windows, instead of truncating them, and fuse
+# the windows' encoder outputs to generate the title from
+WINDOW_OVERLAP = 64
+MAX_WINDOWS = 8
+# Largest number of beams of a beam search, set with PREDICT_MAX_BEAMS, so that
+# one request can't hold the model for long
+MAX_BEAMS = 8
+# Set the MODEL_BACKEND environment variable to "onnx" to run on ONNX Runtime
+BACKENDS = ("pytorch", "onnx")
+DEFAULT_BACKEND = "pytorch"
+ONNX_ENCODER_FILENAME = "encoder_model.onnx"
+# Marks an artifact saved by training/save_quantized_artifact.py
+QUANTIZATION_CONFIG_FILENAME = "quantization_config.json"
+QUANTIZED_WEIGHTS_FILENAME = "quantized_model.pt"
+# Quantized weights are saved as int8 tensors with their quantization
+# parameters, which torch.load can load with weights_only=True
+QUANTIZED_WEIGHTS_FORMAT = "int_repr"
 
 
-class MotionTitleGenerator:
+def quantize_dynamic_int8(model):
+    """Quantize the weights of all Linear layers of a model to int8.
+
+    Activations are quantized on the fly in each forward pass, which speeds up
+    the matrix multiplications on CPU.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def _to_plain_values(value):
+    """Return a value of a quantized state dict with quantized tensors and
+    dtypes replaced by dicts of plain tensors, numbers and strings.
+    """
+    import torch
+
+    if isinstance(value, tuple):
+        return tuple(_to_plain_values(item) for item in value)
+    if isinstance(value, torch.dtype):
+        return {"dtype": str(value).replace("torch.", "")}
+    if isinstance(value, torch.Tensor) and value.is_quantized:
+        plain = {"int_repr": value.int_repr(), "dtype": str(value.dtype)[6:]}
+        if value.qscheme() == torch.per_tensor_affine:
+            return {
+                **plain,
+                "scale": value.q_scale(),
+                "zero_point": value.q_zero_point(),
+            }
+        return {
+            **plain,
+            "scales": value.q_per_channel_scales(),
+            "zero_points": value.q_per_channel_zero_points(),
+            "axis": value.q_per_channel_axis(),
+        }
+    return value
+
+
+def _from_plain_values(value):
+    """Return a value of a quantized state dict from its `_to_plain_values`."""
+    import torch
+
+    if isinstance(value, tuple):
+        return tuple(_from_plain_values(item) for item in value)
+    if not isinstance(value, dict):
+        return value
+    dtype = getattr(torch, value["dtype"])
+    if "int_repr" not in value:
+        return dtype
+    values = value["int_repr"].to(torch.float32)
+    if "scale" in value:
+        return torch.quantize_per_tensor(
+            (values - value["zero_point"]) * value["scale"],
+            value["scale"],
+            value["zero_point"],
+            dtype,
+        )
+    shape = [1] * values.dim()
+    shape[value["axis"]] = -1
+    return torch.quantize_per_channel(
+        (values - value["zero_points"].reshape(shape)) * value["scales"].reshape(shape),
+        value["scales"],
+        value["zero_points"],
+        value["axis"],
+        dtype,
+    )
+
+
+def _map_state_dict(function, state_dict):
+    """Return a state dict with the function applied to each value, keeping the
+    state dict's metadata of module versions.
+    """
+    mapped = OrderedDict((name, function(value)) for name, value in state_dict.items())
+    mapped._metadata = getattr(  # type: ignore  # pylint: disable=protected-access
+        state_dict, "_metadata", OrderedDict()
+    )
+    return mapped
+
+
+def save_quantized_model(model, tokenizer, output_dir: Path, source: str) -> None:
+    """Quantize a model and save it with its tokenizer to an artifact directory.
+
+    Quantized layers can't be saved with save_pretrained, so the model config is
+    saved to rebuild the model from, together with the quantized state dict.
+    """
+    import torch
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.config.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    torch.save(
+        _map_state_dict(
+            _to_plain_values, quantize_dynamic_int8(model.eval()).state_dict()
+        ),
+        output_dir / QUANTIZED_WEIGHTS_FILENAME,
+    )
+    with open(
+        output_dir / QUANTIZATION_CONFIG_FILENAME, "w", encoding="utf-8"
+    ) as config_file:
+        json.dump(
+            {
+                "method": "dynamic_int8",
+                "modules": ["Linear"],
+                "weights_format": QUANTIZED_WEIGHTS_FORMAT,
+                "source": source,
+                "torch_version": torch.__version__,
+            },
+            config_file,
+            indent=2,
+        )
+
+
+def load_quantized_model(model_path: str):
+    """Load a model saved by training/save_quantized_artifact.py."""
+    import torch
+    from transformers.models.auto.configuration_auto import AutoConfig
+    from transformers.models.auto.modeling_auto import AutoModelForSeq2SeqLM
+
+    with open(
+        Path(model_path) / QUANTIZATION_CONFIG_FILENAME, "r", encoding="utf-8"
+    ) as config_file:
+        quantization_config = json.load(config_file)
+    if quantization_config.get("method") != "dynamic_int8":
+        raise ValueError(f"Unknown quantization method in {quantization_config}")
+    if quantization_config.get("weights_format") != QUANTIZED_WEIGHTS_FORMAT:
+        raise ValueError(
+            f"The quantized weights in {model_path} are pickled, which is unsafe to "
+            "load. Save the artifact again with training/save_quantized_artifact.py"
+        )
+    model = AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(model_path))
+    model = quantize_dynamic_int8(model)
+    # Only unpickle tensors and plain containers, never arbitrary objects
+    state_dict = torch.load(
+        Path(model_path) / QUANTIZED_WEIGHTS_FILENAME,
+        map_location="cpu",
+        weights_only=True,
+    )
+    model.load_state_dict(_map_state_dict(_from_plain_values, state_dict))
+    return model.eval()
+
+
+def load_model(model_path: str, backend: str = DEFAULT_BACKEND):
+    """Load a seq2seq model that runs on the given backend.
+
+    The "onnx" backend needs the optional optimum[onnxruntime] dependency. A
+    model without ONNX files, like a PyTorch artifact, is exported to ONNX when
+    loaded. Use training/export_artifact_to_onnx.py to export it once instead.
+    Int8 quantized artifacts run on the "pytorch" backend. Artifacts saved with
+    safetensors weights (model.safetensors) are loaded from those, which is
+    faster than unpickling pytorch_model.bin.
+    """
+    if backend == "pytorch":
+        if (Path(model_path) / QUANTIZATION_CONFIG_FILENAME).is_file():
+            return load_quantized_model(model_path)
+        from transformers.models.auto.modeling_auto import AutoModelForSeq2SeqLM
+
+        return AutoModelForSeq2SeqLM.from_pretrained(model_path)
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend requires optimum[onnxruntime]. Install it with "
+                "pip install -r requirements/onnx.in"
+            ) from e
+        export = not (Path(model_path) / ONNX_ENCODER_FILENAME).is_file()
+        return ORTModelForSeq2SeqLM.from_pretrained(
+            model_path, export=export, use_cache=True
+        )
+    raise ValueError(f"Unknown model backend {backend!r}, expected one of {BACKENDS}")
+
+
+def get_model_settings(
+    model_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    long_input: Optional[bool] = None,
+) -> Tuple[str, str, bool]:
+    """Return the model path, backend and whether long texts are split into
+    windows, read from the environment unless given.
+    """
+    if not model_path:
+        # Set in Dockerfile
+        model_path = os.environ.get("HF_REPO_OR_ARTIFACT_PATH", MODEL)
+    if not backend:
+        backend = os.environ.get("MODEL_BACKEND", DEFAULT_BACKEND)
+    if long_input is None:
+        long_input = os.environ.get("PREDICT_LONG_INPUT", "0").lower() in (
+            "1",
+            "true",
+        )
+    return model_path, backend, long_input
+
+
+def get_model_id(
+    model_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    long_input: Optional[bool] = None,
+    decoding: Optional[DecodingConfig] = None,
+) -> str:
+    """Return a string that identifies the model's titles, for example in caches,
+    from the model settings, see `get_model_settings`, and the decoding
+    settings, read from the environment unless given.
+    """
+    model_path, backend, long_input = get_model_settings(
+        model_path, backend, long_input
+    )
+    model_id = f"{backend}:{model_path}" + (":long" if long_input else "")
+    decoding = decoding or DecodingConfig.from_env()
+    if decoding != DecodingConfig():
+        model_id += ":" + json.dumps(decoding.to_dict(), sort_keys=True)
+    return model_id
+
+
+class MotionTitleGenerator:  # pylint: disable=too-many-instance-attributes
     """Class to generate a title for a motion text."""
 
-    def __init__(self):
-        model = os.environ.get("HF_REPO_OR_ARTIFACT_PATH", MODEL)  # Set in Dockerfile
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model)
-        self.tokenizer = MT5Tokenizer.from_pretrained(model)
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        backend: Optional[str] = None,
+        long_input: Optional[bool] = None,
+    ) -> None:
+        from transformers.models.mt5 import MT5Tokenizer
+
+        model_path, self.backend, self.long_input = get_model_settings(
+            model_path, backend, long_input
+        )
+        if self.long_input and self.backend != "pytorch":
+            raise ValueError("Long input mode is only supported by the pytorch backend")
+        # Decoding settings of titles that are not given other settings
+        self.decoding = DecodingConfig.from_env()
+        self.max_beams = int(os.environ.get("PREDICT_MAX_BEAMS", MAX_BEAMS))
+        self.check_decoding(self.decoding)
+        self.model_id = get_model_id(
+            model_path, self.backend, self.long_input, self.decoding
+        )
+        self.model = load_model(model_path, self.backend)
+        self.tokenizer = MT5Tokenizer.from_pretrained(model_path)
+        self.padding = os.environ.get("PREDICT_PADDING", PADDING)
+        self.max_windows = int(os.environ.get("PREDICT_MAX_WINDOWS", MAX_WINDOWS))
+        # Regenerating a title for a text, for example with other decoding
+        # settings, then only runs the decoder. Set PREDICT_ENCODER_CACHE_MB=0
+        # to turn it off.
+        self.encoder_cache = (
+            EncoderCache.from_env() if self.backend == "pytorch" else None
+        )
+        # Set PREDICT_DRAFT_MODEL to the path of a smaller model with the same
+        # vocabulary to draft titles for speculative decoding. By default the
+        # drafts come from an int8 quantized copy of the model. The draft model
+        # is loaded now if it is set or the default decoding is speculative,
+        # so that a server shares it between its workers.
+        self.draft_model_path = os.environ.get("PREDICT_DRAFT_MODEL") or None
+        self._draft_model = None
+        self._draft_model_lock = threading.Lock()
+        if self.decoding.strategy == "speculative" or (
+            self.draft_model_path is not None
+            and self.backend == "pytorch"
+            and not self.long_input
+        ):
+            self.get_draft_model()
+
+    def check_decoding(self, decoding: DecodingConfig) -> None:
+        """Raise ValueError if the decoding settings can't be used with this
+        generator's model, or ask for more than PREDICT_MAX_BEAMS beams.
+        """
+        if decoding.strategy == "beam" and decoding.num_beams > self.max_beams:
+            raise ValueError(
+                f"num_beams must be at most {self.max_beams}, got {decoding.num_beams}"
+            )
+        if decoding.strategy != "speculative":
+            return
+        if self.backend != "pytorch":
+            raise ValueError("Speculative decoding is only supported by pytorch")
+        if self.long_input:
+            raise ValueError("Speculative decoding is not supported for long input")
+
+    @property
+    def draft_model_loaded(self) -> bool:
+        """Whether the draft model of speculative decoding has been loaded."""
+        return self._draft_model is not None
+
+    def get_draft_model(self):
+        """Return the draft model of speculative decoding, loading it the first
+        time it is needed.
+        """
+        with self._draft_model_lock:
+            if self._draft_model is None:
+                if self.draft_model_path is not None:
+                    self._draft_model = load_model(self.draft_model_path, "pytorch")
+                else:
+                    self._draft_model = quantize_dynamic_int8(
+                        copy.deepcopy(self.model).eval()
+                    )
+            return self._draft_model
+
+    def _generate_settings(self, decoding: Optional[DecodingConfig]):
+        """Return the decoding settings to use, and the draft model if they are
+        speculative.
+        """
+        decoding = decoding or self.decoding
+        self.check_decoding(decoding)
+        if decoding.strategy == "speculative":
+            return decoding, self.get_draft_model()
+        return decoding, None
 
     def encode_text(self, text):
-        """Use tokenizer to encode text."""
-        return encode(text, tokenizer=self.tokenizer, max_tokens=MAX_TEXT_TOKENS)
+        """Use tokenizer to encode text, or a list of texts.
+
+        In long input mode, texts are split into windows, see
+        `utils.encode_decode.encode_windows`.
+        """
+        if self.long_input:
+            return encode_windows(
+                text,
+                tokenizer=self.tokenizer,
+                window_tokens=MAX_TEXT_TOKENS,
+                overlap=WINDOW_OVERLAP,
+                max_windows=self.max_windows,
+                padding=self.padding,
+                pad_to_multiple_of=PAD_TO_MULTIPLE_OF,
+            )
+        return encode(
+            text,
+            tokenizer=self.tokenizer,
+            max_tokens=MAX_TEXT_TOKENS,
+            padding=self.padding,
+            pad_to_multiple_of=PAD_TO_MULTIPLE_OF,
+        )
 
-    @torch.no_grad()
-    def predict(self, text: str) -> str:
-        """Generate a title for an input text."""
+    def predict(self, text: str, decoding: Optional[DecodingConfig] = None) -> str:
+        """Generate a title for an input text, decoded as set by `decoding`, or
+        by the generator's decoding settings.
+        """
         enc = self.encode_text(text)
-        return generate(self.model, self.tokenizer, enc, MAX_TITLE_TOKENS)
+        decoding, draft_model = self._generate_settings(decoding)
+        return generate(
+            self.model,
+            self.tokenizer,
+            enc,
+            MAX_TITLE_TOKENS,
+            self.encoder_cache,
+            decoding,
+            draft_model,
+        )
+
+    def predict_stream(self, text: str) -> Generator[str, None, None]:
+        """Generate a title for an input text, yielding it piece by piece as
+        it is decoded. The title comes from a greedy search, see
+        `utils.encode_decode.generate_stream`. Closing the generator stops
+        the generation.
+        """
+        enc = self.encode_text(text)
+        return generate_stream(
+            self.model, self.tokenizer, enc, MAX_TITLE_TOKENS, self.encoder_cache
+        )
+
+    def predict_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        decoding: Optional[DecodingConfig] = None,
+    ) -> List[str]:
+        """Generate one title per input text, in the same order as the input.
+
+        All texts are tokenized in one call and titled in one forward pass, unless
+        `batch_size` is given, in which case at most `batch_size` texts at a time
+        are passed through the model to bound memory usage. Titles are decoded
+        as set by `decoding`, or by the generator's decoding settings.
+        """
+        texts = list(texts)
+        decoding, draft_model = self._generate_settings(decoding)
+        batch_size = batch_size or max(len(texts), 1)
+        preds: List[str] = []
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            enc = self.encode_text(texts[start:end])
+            preds.extend(
+                generate_batch(
+                    self.model,
+                    self.tokenizer,
+                    enc,
+                    MAX_TITLE_TOKENS,
+                    self.encoder_cache,
+                    decoding,
+                    draft_model,
+                )
+            )
+        return preds
@@ -0,0 +1,197 @@
+# pylint: disable=missing-function-docstring
+import argparse
+
+import pandas as pd
+import pytest
+import sentencepiece
+from transformers.models.mt5 import (
+    MT5Config,
+    MT5ForConditionalGeneration,
+    MT5Tokenizer,
+)
+
+from motion_title_generator import batch
+from utils.decoding import DecodingConfig
+
+TEXTS = [
+    "Persontrafik på järnvägen genom Sörmland bör återinföras.",
+    "Riksdagen ställer sig bakom det som anförs i motionen om kollektivtrafik. " * 5,
+    "Fler poliser i glesbygden.",
+    "Skatten på diesel bör sänkas för lantbruket. " * 3,
+    "Ett nationellt register över hyresavtal bör införas.",
+]
+
+
+@pytest.fixture(scope="module", name="artifact_dir")
+def fixture_artifact_dir(tmp_path_factory):
+    # A tiny random model, with a tokenizer trained on the texts, so that the
+    # tests don't download a model
+    artifact_dir = tmp_path_factory.mktemp("artifact")
+    sentencepiece.SentencePieceTrainer.Train(
+        sentence_iterator=iter(TEXTS),
+        model_prefix=str(artifact_dir / "spiece"),
+        vocab_size=64,
+        hard_vocab_limit=False,
+        pad_id=0,
+        eos_id=1,
+        unk_id=2,
+        bos_id=-1,
+    )
+    tokenizer = MT5Tokenizer(str(artifact_dir / "spiece.model"))
+    tokenizer.save_pretrained(artifact_dir)
+    config = MT5Config(
+        vocab_size=len(tokenizer),
+        d_model=16,
+        d_kv=8,
+        d_ff=32,
+        num_layers=1,
+        num_heads=2,
+        decoder_start_token_id=0,
+    )
+    MT5ForConditionalGeneration(config).save_pretrained(artifact_dir)
+    return str(artifact_dir)
+
+
+def _parse_args(*args):
+    parser = batch.add_to_argparse(argparse.ArgumentParser())
+    return parser.parse_args([str(arg) for arg in args])
+
+
+@pytest.mark.parametrize("suffix", [".feather", ".parquet", ".csv"])
+def test_iter_chunks(tmp_path, suffix):
+    path = tmp_path / f"motions{suffix}"
+    data = pd.DataFrame({"id": range(7), "text": [f"text {i}" for i in range(7)]})
+    if suffix == ".csv":
+        data.to_csv(path, index=False)
+    else:
+        getattr(data, f"to_{suffix[1:]}")(path)
+    chunks = list(batch.iter_chunks(path, ["text"], chunk_size=3))
+    assert [chunk for chunk, _ in chunks] == [0, 1, 2]
+    assert [len(frame) for _, frame in chunks] == [3, 3, 1]
+    assert pd.concat(frame for _, frame in chunks).text.tolist() == data.text.tolist()
+    assert chunks[0][1].columns.tolist() == ["text"]
+
+
+def test_titles_are_saved_in_input_order(artifact_dir, tmp_path):
+    input_path, output = tmp_path / "motions.feather", tmp_path / "titles.parquet"
+    pd.DataFrame({"id": list("abcde"), "text": TEXTS}).to_feather(input_path)
+    args = _parse_args(
+        input_path,
+        output,
+        "--model_path",
+        artifact_dir,
+        "--backend",
+        "pytorch",
+        "--id_column",
+        "id",
+        "--chunk_size",
+        2,
+        "--batch_size",
+        2,
+    )
+    batch.run(args)
+
+    titles = pd.read_parquet(output)
+    assert titles.columns.tolist() == ["row", "id", "title"]
+    assert titles.row.tolist() == list(range(len(TEXTS)))
+    assert titles.id.tolist() == list("abcde")
+    assert titles.title.map(len).gt(0).all()
+    assert not (tmp_path / "titles.parquet.parts").exists()
+
+
+def test_run_resumes_from_saved_parts(artifact_dir, tmp_path):
+    input_path, output = tmp_path / "motions.csv", tmp_path / "titles.feather"
+    pd.DataFrame({"text": TEXTS}).to_csv(input_path, index=False)
+    parts_dir = tmp_path / "titles.feather.parts"
+    args = _parse_args(
+        input_path,
+        output,
+        "--model_path",
+        artifact_dir,
+        "--backend",
+        "pytorch",
+        "--chunk_size",
+        2,
+    )
+    # The first chunk of two texts was done before the run was stopped
+    batch.prepare_parts_dir(
+        parts_dir,
+        batch.make_manifest(args, DecodingConfig.from_args(vars(args))),
+        False,
+    )
+    pd.DataFrame({"row": [0, 1], "title": ["saved", "saved"]}).to_parquet(
+        batch.part_path(parts_dir, 0)
+    )
+    batch.run(args)
+
+    titles = pd.read_feather(output)
+    assert titles.row.tolist() == list(range(len(TEXTS)))
+    assert titles.title.tolist()[:2] == ["saved", "saved"]
+    assert "saved" not in titles.title.tolist()[2:]
+
+
+def test_parts_of_other_settings_are_not_resumed(artifact_dir, tmp_path):
+    input_path, output = tmp_path / "motions.csv", tmp_path / "titles.parquet"
+    pd.DataFrame({"text": TEXTS}).to_csv(input_path, index=False)
+    parts_dir = tmp_path / "titles.parquet.parts"
+    args = _parse_args(input_path, output, "--model_path", artifact_dir)
+    batch.prepare_parts_dir(
+        parts_dir,
+        batch.make_manifest(args, DecodingConfig.from_args(vars(args))),
+        False,
+    )
+    pd.DataFrame({"row": [0, 1], "title": ["saved", "saved"]}).to_parquet(
+        batch.part_path(parts_dir, 0)
+    )
+
+    args = _parse_args(
+        input_path, output, "--model_path", artifact_dir, "--chunk_size", 2
+    )
+    with pytest.raises(ValueError, match="--restart"):
+        batch.run(args)
+    args = _parse_args(
+        input_path,
+        output,
+        "--model_path",
+        artifact_dir,
+        "--chunk_size",
+        2,
+        "--restart",
+    )
+    batch.run(args)
+    assert "saved" not in pd.read_parquet(output).title.tolist()
+
+
+def test_input_without_rows(artifact_dir, tmp_path):
+    input_path, output = tmp_path / "motions.parquet", tmp_path / "titles.feather"
+    pd.DataFrame(
+        {"id": pd.Series(dtype="int64"), "text": pd.Series(dtype=str)}
+    ).to_parquet(input_path)
+    batch.run(
+        _parse_args(
+            input_path, output, "--model_path", artifact_dir, "--id_column", "id"
+        )
+    )
+
+    titles = pd.read_feather(output)
+    assert titles.columns.tolist() == ["row", "id", "title"]
+    assert titles.empty
+    assert titles.id.dtype == "int64"
+
+
+def test_title_chunk_batches_by_length_and_keeps_order(monkeypatch):
+    class EchoGenerator:  # pylint: disable=too-few-public-methods
+        """Generator that titles texts with their upper case."""
+
+        def __init__(self):
+            self.batches = []
+
+        def predict_batch(self, texts, decoding=None):  # pylint: disable=W0613
+            self.batches.append(texts)
+            return [text.upper() for text in texts]
+
+    generator = EchoGenerator()
+    monkeypatch.setattr(batch, "_generator", generator)
+    texts = ["ccc", "a", "bb", None, "dddd"]
+    assert batch.title_chunk(texts, batch_size=2) == ["CCC", "A", "BB", "", "DDDD"]
+    assert generator.batches == [["", "a"], ["bb", "ccc"], ["dddd"]]
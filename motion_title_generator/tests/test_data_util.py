@@ -0,0 +1,51 @@
+# pylint: disable=missing-function-docstring
+import torch
+
+from motion_title_generator.data.util import LABEL_PAD_ID, DynamicPaddingCollator
+
+
+def make_example(text_len, title_len):
+    return {
+        "text": "text",
+        "title": "title",
+        "input_ids": torch.arange(1, text_len + 1),
+        "attention_mask": torch.ones(text_len, dtype=torch.long),
+        "title_mod_ids": torch.arange(1, title_len + 1),
+        "title_attention_mask": torch.ones(title_len, dtype=torch.long),
+    }
+
+
+def test_collator_pads_to_longest():
+    collate = DynamicPaddingCollator(pad_token_id=0)
+    batch = collate([make_example(3, 2), make_example(5, 4)])
+
+    assert batch["input_ids"].shape == (2, 5)
+    assert batch["input_ids"][0].tolist() == [1, 2, 3, 0, 0]
+    assert batch["attention_mask"][0].tolist() == [1, 1, 1, 0, 0]
+    assert batch["title_mod_ids"].shape == (2, 4)
+    assert batch["title_mod_ids"][0].tolist() == [1, 2, LABEL_PAD_ID, LABEL_PAD_ID]
+    assert batch["title_attention_mask"][0].tolist() == [1, 1, 0, 0]
+    assert batch["text"] == ["text", "text"]
+
+
+def test_collator_pads_to_multiple_of():
+    collate = DynamicPaddingCollator(pad_token_id=0, pad_to_multiple_of=8)
+    batch = collate([make_example(3, 2), make_example(9, 8)])
+
+    assert batch["input_ids"].shape == (2, 16)
+    assert batch["title_mod_ids"].shape == (2, 8)
+    assert batch["input_ids"][1, 9:].tolist() == [0] * 7
+
+
+def test_collator_pads_windows():
+    collate = DynamicPaddingCollator(pad_token_id=0)
+    examples = [make_example(3, 2), make_example(4, 2)]
+    examples[0]["input_ids"] = torch.ones(2, 3, dtype=torch.long)
+    examples[0]["attention_mask"] = torch.ones(2, 3, dtype=torch.long)
+    examples[1]["input_ids"] = torch.ones(1, 4, dtype=torch.long)
+    examples[1]["attention_mask"] = torch.ones(1, 4, dtype=torch.long)
+    batch = collate(examples)
+
+    assert batch["input_ids"].shape == (2, 2, 4)
+    assert batch["input_ids"][0].tolist() == [[1, 1, 1, 0], [1, 1, 1, 0]]
+    assert batch["attention_mask"][1].tolist() == [[1, 1, 1, 1], [0, 0, 0, 0]]
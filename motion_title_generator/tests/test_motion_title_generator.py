@@ -0,0 +1,149 @@
+# pylint: disable=missing-function-docstring
+import json
+
+import pytest
+import torch
+from transformers import MT5ForConditionalGeneration, MT5Tokenizer
+
+from motion_title_generator.motion_title_generator import (
+    QUANTIZATION_CONFIG_FILENAME,
+    MotionTitleGenerator,
+    get_model_id,
+    load_model,
+    quantize_dynamic_int8,
+    save_quantized_model,
+)
+from utils.decoding import DecodingConfig
+
+TEXTS = [
+    "Persontrafik på järnvägen genom Sörmland bör återinföras.",
+    "Riksdagen ställer sig bakom det som anförs i motionen om kollektivtrafik. " * 5,
+]
+
+
+@pytest.fixture(scope="module", name="artifact_dir")
+def fixture_artifact_dir(tmp_path_factory):
+    """Save a model artifact like save_checkpoint_to_local_artifact.py does."""
+    artifact_dir = tmp_path_factory.mktemp("artifact")
+    MT5ForConditionalGeneration.from_pretrained("google/mt5-small").save_pretrained(
+        artifact_dir
+    )
+    MT5Tokenizer.from_pretrained("google/mt5-small").save_pretrained(artifact_dir)
+    return str(artifact_dir)
+
+
+def test_load_model_with_unknown_backend(artifact_dir):
+    with pytest.raises(ValueError, match="Unknown model backend"):
+        load_model(artifact_dir, backend="tensorrt")
+
+
+def test_backend_is_read_from_environment(artifact_dir, monkeypatch):
+    monkeypatch.setenv("MODEL_BACKEND", "pytorch")
+    generator = MotionTitleGenerator(artifact_dir)
+    assert generator.backend == "pytorch"
+    assert len(generator.predict_batch(TEXTS)) == 2
+
+
+def test_onnx_backend_matches_pytorch(artifact_dir):
+    try:
+        # pylint: disable=import-outside-toplevel,unused-import
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM  # noqa: F401
+    except (ImportError, RuntimeError):
+        pytest.skip("optimum[onnxruntime] is not available")
+    generators = [
+        MotionTitleGenerator(artifact_dir, backend) for backend in ("pytorch", "onnx")
+    ]
+    for generator in generators:
+        generator.padding = False
+    for text in TEXTS:
+        assert generators[0].predict(text) == generators[1].predict(text)
+
+
+def test_quantized_artifact_is_loaded(artifact_dir, tmp_path):
+    model = MT5ForConditionalGeneration.from_pretrained(artifact_dir)
+    tokenizer = MT5Tokenizer.from_pretrained(artifact_dir)
+    save_quantized_model(model, tokenizer, tmp_path, source=artifact_dir)
+
+    generator = MotionTitleGenerator(str(tmp_path), backend="pytorch")
+    linear_layers = [
+        module
+        for module in generator.model.modules()
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+    ]
+    assert linear_layers
+    assert not any(
+        isinstance(module, torch.nn.Linear) for module in generator.model.modules()
+    )
+    quantized = quantize_dynamic_int8(model.eval())
+    for loaded, original in zip(
+        linear_layers,
+        [
+            module
+            for module in quantized.modules()
+            if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+        ],
+    ):
+        assert torch.equal(loaded.weight().int_repr(), original.weight().int_repr())
+        assert loaded.weight().q_scale() == original.weight().q_scale()
+    titles = generator.predict_batch(TEXTS)
+    assert len(titles) == 2
+    assert all(isinstance(title, str) for title in titles)
+
+    # Pickled weights of older artifacts are not loaded
+    config_path = tmp_path / QUANTIZATION_CONFIG_FILENAME
+    config = json.loads(config_path.read_text(encoding="utf-8"))
+    del config["weights_format"]
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    with pytest.raises(ValueError, match="Save the artifact again"):
+        MotionTitleGenerator(str(tmp_path), backend="pytorch")
+
+
+def test_long_input_mode(artifact_dir, monkeypatch):
+    monkeypatch.setenv("PREDICT_LONG_INPUT", "1")
+    generator = MotionTitleGenerator(artifact_dir, backend="pytorch")
+    assert generator.long_input
+    assert generator.model_id == get_model_id(artifact_dir, "pytorch", False) + ":long"
+
+    short_text_title = MotionTitleGenerator(artifact_dir, long_input=False).predict(
+        TEXTS[0]
+    )
+    assert generator.predict(TEXTS[0]) == short_text_title
+
+    long_text = TEXTS[1] * 30
+    assert generator.encode_text(long_text)["input_ids"].shape[1] > 1
+    titles = generator.predict_batch([TEXTS[0], long_text])
+    assert len(titles) == 2
+    assert all(isinstance(title, str) for title in titles)
+
+    with pytest.raises(ValueError, match="only supported by the pytorch backend"):
+        MotionTitleGenerator(artifact_dir, backend="onnx")
+
+
+def test_decoding_settings(artifact_dir, monkeypatch):
+    monkeypatch.setenv("PREDICT_DECODING_STRATEGY", "greedy")
+    generator = MotionTitleGenerator(artifact_dir, backend="pytorch")
+    assert generator.decoding == DecodingConfig("greedy")
+    assert generator.model_id != get_model_id(
+        artifact_dir, "pytorch", False, DecodingConfig()
+    )
+
+    assert not generator.draft_model_loaded
+    with pytest.raises(ValueError, match="num_beams must be at most"):
+        generator.predict(TEXTS[0], decoding=DecodingConfig(num_beams=1000))
+
+    generator.padding = False  # Padding changes the random model's titles
+    speculative = DecodingConfig("speculative", repetition_penalty=1.0)
+    greedy = DecodingConfig("greedy", repetition_penalty=1.0)
+    for text in TEXTS:
+        assert generator.predict(text, decoding=speculative) == generator.predict(
+            text, decoding=greedy
+        )
+    assert isinstance(generator.get_draft_model(), torch.nn.Module)
+    assert generator.draft_model_loaded
+    monkeypatch.setenv("PREDICT_DECODING_STRATEGY", "speculative")
+    monkeypatch.setenv("PREDICT_REPETITION_PENALTY", "1.0")
+    assert MotionTitleGenerator(artifact_dir, backend="pytorch").draft_model_loaded
+    with pytest.raises(ValueError, match="long input"):
+        MotionTitleGenerator(artifact_dir, long_input=True).predict(
+            TEXTS[0], decoding=DecodingConfig("speculative", repetition_penalty=1.0)
+        )
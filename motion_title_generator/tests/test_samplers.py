@@ -0,0 +1,63 @@
+# pylint: disable=missing-function-docstring
+import numpy as np
+import pytest
+
+from motion_title_generator.data.samplers import (
+    LengthBucketBatchSampler,
+    padding_efficiency,
+)
+
+
+@pytest.fixture(name="lengths")
+def fixture_lengths():
+    return np.random.default_rng(0).integers(5, 512, size=1003).tolist()
+
+
+def test_every_index_is_sampled_once(lengths):
+    sampler = LengthBucketBatchSampler(lengths, batch_size=8, bucket_size_multiplier=10)
+    batches = list(sampler)
+    indices = [i for batch in batches for i in batch]
+
+    assert sorted(indices) == list(range(len(lengths)))
+    assert all(len(batch) <= 8 for batch in batches)
+    assert len(batches) == len(sampler)
+
+
+def test_drop_last(lengths):
+    sampler = LengthBucketBatchSampler(
+        lengths, batch_size=8, bucket_size_multiplier=10, drop_last=True
+    )
+    batches = list(sampler)
+    assert all(len(batch) == 8 for batch in batches)
+    assert len(batches) == len(sampler)
+
+
+def test_order_is_deterministic_per_seed_and_epoch(lengths):
+    first = LengthBucketBatchSampler(lengths, batch_size=8, seed=2)
+    second = LengthBucketBatchSampler(lengths, batch_size=8, seed=2)
+    epoch_0 = list(first)
+    assert epoch_0 == list(second)
+
+    epoch_1 = list(first)
+    assert epoch_1 != epoch_0
+
+    second.set_epoch(1)
+    assert list(second) == epoch_1
+
+
+def test_without_shuffle_batches_are_sorted_by_length(lengths):
+    sampler = LengthBucketBatchSampler(lengths, batch_size=8, shuffle=False)
+    sampled_lengths = [lengths[i] for batch in sampler for i in batch]
+    assert sampled_lengths == sorted(lengths)
+
+
+def test_bucketing_reduces_padding(lengths):
+    sampler = LengthBucketBatchSampler(lengths, batch_size=8)
+    list(sampler)
+
+    order = np.random.default_rng(0).permutation(len(lengths))
+    random_batches = np.split(order, range(8, len(order), 8))
+    random_efficiency = padding_efficiency(np.asarray(lengths), random_batches)
+
+    assert sampler.padding_efficiency is not None
+    assert sampler.padding_efficiency > random_efficiency
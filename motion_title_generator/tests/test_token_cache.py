@@ -0,0 +1,75 @@
+# pylint: disable=missing-function-docstring
+import pickle
+
+import pytest
+import torch
+from transformers import MT5Tokenizer
+
+from motion_title_generator.data.t5_encodings_dataset import (
+    MT5EncodingsDataset,
+    MT5TokenCacheDataset,
+)
+from motion_title_generator.data.token_cache import TokenCache
+
+TEXTS = [
+    "This is a sample text.",
+    "This is the first sentence. This is the second sentence.",
+    "Short.",
+]
+TITLES = ["A title", "Another title", "Third"]
+
+
+@pytest.fixture(scope="module", name="tokenizer")
+def setup_tokenizer():
+    yield MT5Tokenizer.from_pretrained("google/mt5-small")
+
+
+@pytest.fixture(name="token_cache")
+def fixture_token_cache(tmp_path, tokenizer):
+    yield TokenCache.load_or_build(tmp_path, TEXTS, TITLES, tokenizer, 8, 4)
+
+
+def test_cache_holds_truncated_token_ids(token_cache, tokenizer):
+    assert len(token_cache) == len(TEXTS)
+    for i, text in enumerate(TEXTS):
+        expected = tokenizer(text, max_length=8, truncation=True)["input_ids"]
+        assert token_cache.ids("text", i).tolist() == expected
+    assert token_cache.lengths("title").tolist() == [
+        len(tokenizer(title, max_length=4, truncation=True)["input_ids"])
+        for title in TITLES
+    ]
+
+
+def test_cache_is_reused(tmp_path, token_cache, tokenizer):
+    reloaded = TokenCache.load_or_build(tmp_path, TEXTS, TITLES, tokenizer, 8, 4)
+    assert reloaded.cache_dir == token_cache.cache_dir
+
+    other = TokenCache.load_or_build(tmp_path, TEXTS, TITLES, tokenizer, 16, 4)
+    assert other.cache_dir != token_cache.cache_dir
+
+
+def test_pickled_cache_does_not_hold_arrays(token_cache):
+    token_cache.ids("text", 0)
+    restored = pickle.loads(pickle.dumps(token_cache))  # nosec B301
+    assert restored.__dict__["_arrays"] is None
+    assert restored.ids("text", 0).tolist() == token_cache.ids("text", 0).tolist()
+
+
+@pytest.mark.parametrize("dynamic_padding", [False, True])
+def test_dataset_matches_tokenizing_dataset(token_cache, tokenizer, dynamic_padding):
+    args = {
+        "max_text_tokens": 8,
+        "max_title_tokens": 4,
+        "dynamic_padding": dynamic_padding,
+    }
+    cached = MT5TokenCacheDataset(
+        token_cache, [2, 0], pad_token_id=tokenizer.pad_token_id, args=args
+    )
+    tokenizing = MT5EncodingsDataset([TEXTS[2], TEXTS[0]], [TITLES[2], TITLES[0]], args)
+
+    assert len(cached) == 2
+    assert cached.token_lengths() == tokenizing.token_lengths()
+    for i in range(2):
+        expected = tokenizing[i]
+        for key, value in cached[i].items():
+            assert torch.equal(value, expected[key]), key
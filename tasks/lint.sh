@@ -15,19 +15,19 @@ else
 fi
 
 echo "pylint"
-pylint api_server training_data_pipeline motion_title_generator training utils || FAILURE=true
+pylint api_server training_data_pipeline motion_title_generator training utils benchmarks || FAILURE=true
 
 echo "pycodestyle"
-pycodestyle api_server training_data_pipeline motion_title_generator training utils || FAILURE=true
+pycodestyle api_server training_data_pipeline motion_title_generator training utils benchmarks || FAILURE=true
 
 echo "pydocstyle"
-pydocstyle api_server training_data_pipeline motion_title_generator training utils || FAILURE=true
+pydocstyle api_server training_data_pipeline motion_title_generator training utils benchmarks || FAILURE=true
 
 echo "mypy"
-mypy api_server training_data_pipeline motion_title_generator training utils || FAILURE=true
+mypy api_server training_data_pipeline motion_title_generator training utils benchmarks || FAILURE=true
 
 echo "bandit"
-bandit -ll -r {api_server,training_data_pipeline,motion_title_generator,training,utils} || FAILURE=true
+bandit -ll -r {api_server,training_data_pipeline,motion_title_generator,training,utils,benchmarks} || FAILURE=true
 
 echo "shellcheck"
 find . -name "*.sh" -print0 | xargs -0 shellcheck || FAILURE=true
@@ -0,0 +1,103 @@
+"""Compare an int8 quantized model artifact with the fp32 artifact it was made from.
+
+Titles are generated for examples in the test split of MotionsDataModule, and
+the quantized model's titles are scored against the fp32 model's titles and
+the motions' real titles. Weights size and per-title latency are reported for
+both models.
+
+Usage:
+    PYTHONPATH=. python training/evaluate_quantized_artifact.py <artifact_dir> \
+        [--quantized_dir=<artifact_dir>_int8] [--output_json=<path>]
+"""
+
+import argparse
+import io
+from typing import Dict, List
+
+import torch
+
+from motion_title_generator.motion_title_generator import MotionTitleGenerator
+from utils import evaluation
+from utils.metrics import exact_match_rate, mean_rouge_l
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("artifact_dir", help="The fp32 model artifact")
+    parser.add_argument(
+        "--quantized_dir",
+        default=None,
+        help="The quantized model artifact, by default <artifact_dir>_int8",
+    )
+    evaluation.add_evaluation_args(parser)
+    return parser
+
+
+def weights_size_mb(model: torch.nn.Module) -> float:
+    """Return the size in MB of a model's serialized state dict."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+
+def evaluate_model(
+    generator: MotionTitleGenerator,
+    texts: List[str],
+    batch_size: int,
+    num_latency_examples: int,
+) -> Dict:
+    """Return the titles of the texts, the weights size and latency numbers.
+    The generator's encoder cache is turned off, so the latency includes the
+    encoder.
+    """
+    generator.encoder_cache = None
+    titles = generator.predict_batch(texts, batch_size=batch_size)
+    return {
+        "titles": titles,
+        "weights_mb": weights_size_mb(generator.model),
+        **evaluation.time_titles(generator.predict, texts[:num_latency_examples]),
+    }
+
+
+def main():
+    """Evaluate both models and print the trade-off."""
+    args = _setup_parser().parse_args()
+    quantized_dir = args.quantized_dir or args.artifact_dir.rstrip("/") + "_int8"
+
+    texts, references = evaluation.load_test_examples(
+        args.num_examples, args.data_fraction
+    )
+
+    results = {}
+    for name, model_path in [("fp32", args.artifact_dir), ("int8", quantized_dir)]:
+        generator = MotionTitleGenerator(model_path, backend="pytorch")
+        results[name] = evaluate_model(
+            generator, texts, args.batch_size, args.num_latency_examples
+        )
+        results[name]["rouge_l_vs_reference"] = mean_rouge_l(
+            results[name]["titles"], references
+        )
+    results["int8"]["exact_match_vs_fp32"] = exact_match_rate(
+        results["int8"]["titles"], results["fp32"]["titles"]
+    )
+    results["int8"]["rouge_l_vs_fp32"] = mean_rouge_l(
+        results["int8"]["titles"], results["fp32"]["titles"]
+    )
+
+    print(f"Test examples:            {len(texts)}")
+    print(f"Exact match int8 vs fp32: {results['int8']['exact_match_vs_fp32']:.1%}")
+    print(f"ROUGE-L int8 vs fp32:     {results['int8']['rouge_l_vs_fp32']:.3f}")
+    for name, result in results.items():
+        print(
+            f"{name + ':':<10}"
+            f"ROUGE-L vs reference {result['rouge_l_vs_reference']:.3f}, "
+            f"weights {result['weights_mb']:8.1f} MB, "
+            + evaluation.format_latency(result)
+        )
+
+    evaluation.save_results(results, args.output_json)
+
+
+if __name__ == "__main__":
+    main()
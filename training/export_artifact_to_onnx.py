@@ -0,0 +1,22 @@
+import argparse
+
+from optimum.exporters.onnx import main_export
+
+from utils.checkpoint import add_artifact_args
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a model artifact to ONNX, to serve with MODEL_BACKEND=onnx."
+    )
+    add_artifact_args(parser, output_suffix="_onnx")
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.artifact_dir.rstrip("/") + "_onnx"
+
+    # Export the tokenizer, the encoder, the decoder for the first step and the
+    # decoder that reuses the past key values for the following steps
+    main_export(
+        args.artifact_dir,
+        output=output_dir,
+        task="text2text-generation-with-past",
+        no_post_process=True,
+    )
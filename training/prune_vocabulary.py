@@ -0,0 +1,45 @@
+import argparse
+
+import pandas as pd
+from transformers.models.auto.modeling_auto import AutoModelForSeq2SeqLM
+from transformers.models.mt5 import MT5Tokenizer
+
+from motion_title_generator.data.motions_data_module import DATA_PATH
+from utils.checkpoint import add_artifact_args
+from utils.log import logger
+from utils.vocab_pruning import MARGIN, prune_vocabulary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Save a copy of a model artifact with a vocabulary pruned to "
+        "the tokens used in the training data."
+    )
+    add_artifact_args(parser, output_suffix="_pruned")
+    parser.add_argument("--data_path", default=str(DATA_PATH))
+    parser.add_argument(
+        "--min_count",
+        type=int,
+        default=1,
+        help="Number of times a token must occur in the data to be kept.",
+    )
+    parser.add_argument(
+        "--margin",
+        type=int,
+        default=MARGIN,
+        help="Number of the most likely unused tokens to keep anyway.",
+    )
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.artifact_dir.rstrip("/") + "_pruned"
+
+    data = pd.read_feather(args.data_path, columns=["title", "text"])
+    model = AutoModelForSeq2SeqLM.from_pretrained(args.artifact_dir)
+    tokenizer = MT5Tokenizer.from_pretrained(args.artifact_dir)
+    prune_vocabulary(
+        model,
+        tokenizer,
+        data["text"].tolist() + data["title"].tolist(),
+        output_dir,
+        min_count=args.min_count,
+        margin=args.margin,
+    )
+    logger.info("Pruned model saved to %s", output_dir)
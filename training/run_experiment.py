@@ -8,6 +8,7 @@ from lightning.pytorch.callbacks import EarlyStopping, ModelCheckpoint
 from lightning.pytorch.loggers import TensorBoardLogger
 
 from motion_title_generator import lit_models
+from utils.decoding import DecodingConfig
 from utils.log import logger
 
 DEFAULT_DATA_CLASS = "MotionsDataModule"
@@ -63,6 +64,7 @@ def _setup_parser():
 
     lit_model_group = parser.add_argument_group("LitModel Args")
     lit_models.BaseLitModel.add_to_argparse(lit_model_group)
+    DecodingConfig.add_to_argparse(lit_model_group)
 
     parser.add_argument("--help", "-h", action="help")
     return parser
@@ -51,7 +51,7 @@ if __name__ == "__main__":
     lit_model = load_litmodel(chkpt_path, config_path)
     tokenizer = MT5Tokenizer.from_pretrained(lit_model.model.model_name)
 
-    lit_model.model.model.save_pretrained(TMP_SAVE_DIR)
+    lit_model.model.model.save_pretrained(TMP_SAVE_DIR, safe_serialization=True)
     tokenizer.save_pretrained(TMP_SAVE_DIR)
     push_model_dir_to_hf(args.hf_model)
     shutil.rmtree(TMP_SAVE_DIR)
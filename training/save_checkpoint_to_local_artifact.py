@@ -23,5 +23,5 @@ if __name__ == "__main__":
         .replace("-", "_")
     )
     artifact_dir = f"{ARTIFACTS_PATH}/version{args.version}_{chkpt_abbr}"
-    lit_model.model.model.save_pretrained(artifact_dir)
+    lit_model.model.model.save_pretrained(artifact_dir, safe_serialization=True)
     tokenizer.save_pretrained(artifact_dir)
@@ -0,0 +1,22 @@
+import argparse
+
+from transformers.models.auto.modeling_auto import AutoModelForSeq2SeqLM
+from transformers.models.mt5 import MT5Tokenizer
+
+from motion_title_generator.motion_title_generator import save_quantized_model
+from utils.checkpoint import add_artifact_args
+from utils.log import logger
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Save an int8 dynamically quantized copy of a model artifact "
+        "for CPU serving."
+    )
+    add_artifact_args(parser, output_suffix="_int8")
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.artifact_dir.rstrip("/") + "_int8"
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(args.artifact_dir)
+    tokenizer = MT5Tokenizer.from_pretrained(args.artifact_dir)
+    save_quantized_model(model, tokenizer, output_dir, source=args.artifact_dir)
+    logger.info("Quantized model saved to %s", output_dir)
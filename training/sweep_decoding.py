@@ -0,0 +1,118 @@
+"""Compare the title quality and latency of decoding strategies on a model.
+
+Titles are generated for examples in the test split of MotionsDataModule with
+each decoding config, and scored against the motions' real titles and the
+titles of the default config, a beam search of 2 beams. Latency is timed one
+title at a time, with the encoder output cache turned off.
+
+Usage:
+    PYTHONPATH=. python training/sweep_decoding.py <artifact_dir or HF repo> \
+        [--configs '{"strategy": "beam", "num_beams": 4}' ...] \
+        [--draft_model_path=<artifact_dir>] [--output_json=<path>]
+
+The speculative strategy drafts titles with --draft_model_path, a smaller model
+with the same vocabulary, or by default with an int8 quantized copy of the
+model.
+"""
+
+import argparse
+import json
+from functools import partial
+from typing import Dict, List
+
+from motion_title_generator.motion_title_generator import MotionTitleGenerator
+from utils import evaluation
+from utils.decoding import DecodingConfig
+from utils.log import logger
+from utils.metrics import exact_match_rate, mean_rouge_l
+
+CONFIGS = [
+    {"strategy": "beam", "num_beams": 2},
+    {"strategy": "greedy"},
+    {"strategy": "greedy", "repetition_penalty": 1.0},
+    {"strategy": "speculative", "repetition_penalty": 1.0},
+    {"strategy": "beam", "num_beams": 4},
+    {"strategy": "beam", "num_beams": 2, "repetition_penalty": 1.0},
+]
+
+
+def _setup_parser() -> argparse.ArgumentParser:
+    """Set up the argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model_path", help="The model artifact or huggingface repo")
+    parser.add_argument(
+        "--configs",
+        type=json.loads,
+        nargs="+",
+        default=CONFIGS,
+        help="Decoding configs to compare, as JSON objects of DecodingConfig "
+        "settings.",
+    )
+    parser.add_argument("--draft_model_path", default=None)
+    evaluation.add_evaluation_args(parser)
+    return parser
+
+
+def evaluate_decoding(
+    generator: MotionTitleGenerator,
+    decoding: DecodingConfig,
+    texts: List[str],
+    batch_size: int,
+    num_latency_examples: int,
+) -> Dict:
+    """Return the titles of the texts decoded with a config, and its latency."""
+    titles = generator.predict_batch(texts, batch_size=batch_size, decoding=decoding)
+    predict = partial(generator.predict, decoding=decoding)
+    return {
+        "decoding": decoding.to_dict(),
+        "titles": titles,
+        **evaluation.time_titles(predict, texts[:num_latency_examples]),
+    }
+
+
+def main():
+    """Evaluate each decoding config and print the trade-off."""
+    args = _setup_parser().parse_args()
+    decodings = [DecodingConfig.from_dict(config) for config in args.configs]
+
+    texts, references = evaluation.load_test_examples(
+        args.num_examples, args.data_fraction
+    )
+
+    generator = MotionTitleGenerator(args.model_path, backend="pytorch")
+    generator.encoder_cache = None  # Time the encoder too
+    generator.draft_model_path = args.draft_model_path
+    default_titles = generator.predict_batch(
+        texts, batch_size=args.batch_size, decoding=DecodingConfig()
+    )
+
+    results = []
+    for decoding in decodings:
+        logger.info("Decoding with %s ...", decoding)
+        result = evaluate_decoding(
+            generator, decoding, texts, args.batch_size, args.num_latency_examples
+        )
+        result["rouge_l_vs_reference"] = mean_rouge_l(result["titles"], references)
+        result["exact_match_vs_default"] = exact_match_rate(
+            result["titles"], default_titles
+        )
+        results.append(result)
+    evaluation.save_results(results, args.output_json)
+
+    print(f"Test examples: {len(texts)}")
+    for result in results:
+        settings = ", ".join(
+            f"{key}={value}"
+            for key, value in result["decoding"].items()
+            if DecodingConfig().to_dict()[key] != value or key == "strategy"
+        )
+        print(
+            f"{settings:<45}"
+            f"ROUGE-L vs reference {result['rouge_l_vs_reference']:.3f}, "
+            f"same as default {result['exact_match_vs_default']:6.1%}, "
+            + evaluation.format_latency(result)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# pylint: disable=missing-function-docstring
+import torch
+
+from training.evaluate_quantized_artifact import evaluate_model
+from utils.encoder_cache import EncoderCache
+
+TEXTS = ["Första motionen.", "Andra motionen.", "Tredje motionen."]
+
+
+class RecordingGenerator:
+    """Generator that records whether each title could use an encoder cache."""
+
+    def __init__(self):
+        self.encoder_cache = EncoderCache()
+        self.model = torch.nn.Linear(2, 2)
+        self.cached_calls = 0
+
+    def predict_batch(self, texts, batch_size=None):  # pylint: disable=W0613
+        return [self.predict(text) for text in texts]
+
+    def predict(self, text):
+        if self.encoder_cache is not None:
+            self.cached_calls += 1
+        return text.upper()
+
+
+def test_latency_is_not_served_from_encoder_cache():
+    generator = RecordingGenerator()
+    result = evaluate_model(generator, TEXTS, batch_size=2, num_latency_examples=2)
+    assert result["titles"] == [text.upper() for text in TEXTS]
+    assert generator.cached_calls == 0
@@ -1,14 +1,24 @@
+import os
+from typing import Optional
+
 from training_data_pipeline.utils.file_downloader import download_motion_zip_files
-from training_data_pipeline.utils.zip_data_reader import (
-    read_zip_file_data_to_pkl,
-    OUTPUT_PATH,
-)
+from training_data_pipeline.utils.zip_data_reader import read_zip_file_data_to_parquet
 from training_data_pipeline.utils.preprocessor import prep_training_dataset
+from utils.log import log_duration
+
 
+def get_data(prep_workers: Optional[int] = None):
+    """Download and prep motions data for training.
 
-def get_data():
-    """Download and prep motions data for training."""
-    downloaded = download_motion_zip_files()
-    if len(downloaded) >= 1 or not OUTPUT_PATH.exists():
-        read_zip_file_data_to_pkl()
-    prep_training_dataset()
+    Each stage caches its output by a hash of its input and its code, so only
+    archives that are new or have changed are parsed and prepped again. The
+    partitions are prepped in `prep_workers` processes, by default one per CPU
+    core.
+    """
+    prep_workers = prep_workers or os.cpu_count() or 1
+    with log_duration("Downloading data"):
+        download_motion_zip_files()
+    with log_duration("Parsing data"):
+        read_zip_file_data_to_parquet()
+    with log_duration("Preprocessing data"):
+        prep_training_dataset(workers=prep_workers)
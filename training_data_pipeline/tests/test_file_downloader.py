@@ -1,44 +1,194 @@
-from unittest.mock import call, patch
+# pylint: disable=missing-function-docstring
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set, Tuple
+from unittest.mock import patch
 
 import pytest
 
 from training_data_pipeline.utils.file_downloader import download_motion_zip_files
 
+CATALOGUE = (
+    b"<datasetlista>"
+    b"<dataset><typ>mot</typ><format>json</format>"
+    b"<filnamn>mot-1.json.zip</filnamn><url>dataset/mot-1.json.zip</url></dataset>"
+    b"<dataset><typ>mot</typ><format>json</format>"
+    b"<filnamn>mot-2.json.zip</filnamn><url>dataset/mot-2.json.zip</url></dataset>"
+    b"<dataset><typ>mot</typ><format>csv</format>"
+    b"<filnamn>mot-1.csv.zip</filnamn><url>dataset/mot-1.csv.zip</url></dataset>"
+    b"<dataset><typ>prop</typ><format>json</format>"
+    b"<filnamn>prop-1.json.zip</filnamn><url>dataset/prop-1.json.zip</url></dataset>"
+    b"</datasetlista>"
+)
 
-@pytest.fixture(name="mock_requests_get")
-def fixture_mock_requests_get():
-    """Mock the requests.get function."""
-    with patch("training_data_pipeline.utils.file_downloader.requests.get") as mock_get:
-        yield mock_get
 
+class FakeRiksdagen(BaseHTTPRequestHandler):
+    """Serve a dataset catalogue and archives with ETags and byte ranges."""
 
-def test_download_motion_zip_files(mock_requests_get, tmp_path):
-    """Test the calls to requests.get and the return value of the function."""
-    # Mock the requests.get function and its return value
-    mock_response = mock_requests_get.return_value
-    mock_response.content = b"<datasetlista><dataset><typ>mot</typ><format>json</format><filnamn>file1.json</filnamn><url>dataset/file1.zip</url></dataset></datasetlista>"  # noqa: E501
+    files: Dict[str, bytes] = {}
+    requests: List[Tuple[str, Dict[str, str]]] = []
+    truncate_next: Set[str] = set()
+    send_etags = True
 
-    # Call the function under test
-    dl_dirname = tmp_path / "downloads"
+    def do_GET(self):  # pylint: disable=invalid-name
+        type(self).requests.append((self.path, dict(self.headers)))
+        if self.path == "/dataset/katalog/dataset.xml":
+            self._send(200, CATALOGUE)
+            return
+        content = self.files.get(self.path)
+        if content is None:
+            self._send(404, b"")
+            return
+        etag = '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+        if not self.send_etags:
+            etag = None
+        if etag and self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", etag)
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and etag and self.headers.get("If-Range") == etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+        body = content[start:]
+        if self.path in self.truncate_next:
+            # Promise the whole body, but hang up halfway through it
+            self.truncate_next.discard(self.path)
+            self._send(206 if start else 200, body, etag, len(body) // 2)
+            self.close_connection = True
+            return
+        self._send(206 if start else 200, body, etag)
+
+    def _send(self, status, body, etag=None, send_bytes=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:send_bytes])
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    """Run a local stand-in for data.riksdagen.se."""
+    FakeRiksdagen.files = {
+        "/dataset/mot-1.json.zip": b"first archive " * 1000,
+        "/dataset/mot-2.json.zip": b"second archive " * 1000,
+    }
+    FakeRiksdagen.requests = []
+    FakeRiksdagen.truncate_next = set()
+    FakeRiksdagen.send_etags = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRiksdagen)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def archive_requests():
+    return [
+        (path, headers)
+        for path, headers in FakeRiksdagen.requests
+        if path != "/dataset/katalog/dataset.xml"
+    ]
+
+
+def test_download_motion_zip_files(server, tmp_path):
     downloaded_files = download_motion_zip_files(
-        dl_dirname=dl_dirname, file_type="json"
+        dl_dirname=tmp_path, file_type="json", base_url=base_url(server)
+    )
+
+    assert downloaded_files == [
+        tmp_path / "mot-1.json.zip",
+        tmp_path / "mot-2.json.zip",
+    ]
+    for path in downloaded_files:
+        assert path.read_bytes() == FakeRiksdagen.files[f"/dataset/{path.name}"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "manifest.json",
+        "mot-1.json.zip",
+        "mot-2.json.zip",
+    ]
+
+
+def test_download_motion_zip_files_revalidates(server, tmp_path):
+    download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server))
+    FakeRiksdagen.requests = []
+
+    # Unchanged archives are not downloaded again
+    assert (
+        download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server)) == []
     )
+    assert all("If-None-Match" in headers for _, headers in archive_requests())
 
-    # Assertions
-    mock_requests_get.assert_has_calls(
-        [
-            call(
-                "https://data.riksdagen.se/dataset/katalog/dataset.xml",
-                allow_redirects=True,
-                timeout=10.0,
-            ),
-            call(
-                "https://data.riksdagen.se/dataset/file1.zip",
-                allow_redirects=True,
-                timeout=10.0,
-            ),
-        ],
-        any_order=True,
+    # An archive that has changed upstream is
+    FakeRiksdagen.files["/dataset/mot-2.json.zip"] = b"updated archive"
+    downloaded_files = download_motion_zip_files(
+        dl_dirname=tmp_path, base_url=base_url(server)
+    )
+    assert downloaded_files == [tmp_path / "mot-2.json.zip"]
+    assert downloaded_files[0].read_bytes() == b"updated archive"
+
+
+def test_download_motion_zip_files_keeps_files_without_validators(server, tmp_path):
+    FakeRiksdagen.send_etags = False
+    download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server))
+    FakeRiksdagen.requests = []
+
+    # The server can't tell if they have changed, so they are not downloaded again
+    assert (
+        download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server)) == []
+    )
+    assert archive_requests() == []
+
+
+def test_download_motion_zip_files_revalidates_files_without_manifest(server, tmp_path):
+    # Archives saved before there was a manifest, one of them outdated
+    (tmp_path / "mot-1.json.zip").write_bytes(
+        FakeRiksdagen.files["/dataset/mot-1.json.zip"]
+    )
+    (tmp_path / "mot-2.json.zip").write_bytes(b"outdated archive")
+
+    download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server))
+    content = FakeRiksdagen.files["/dataset/mot-2.json.zip"]
+    assert (tmp_path / "mot-2.json.zip").read_bytes() == content
+    assert (tmp_path / "manifest.json").is_file()
+
+    # Their headers are recorded, so they are revalidated from then on
+    FakeRiksdagen.requests = []
+    assert (
+        download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server)) == []
+    )
+    assert all("If-None-Match" in headers for _, headers in archive_requests())
+
+
+def test_download_motion_zip_files_resumes(server, tmp_path):
+    FakeRiksdagen.truncate_next = {"/dataset/mot-1.json.zip"}
+    with patch(
+        "training_data_pipeline.utils.file_downloader.CHUNK_SIZE", 1024
+    ), pytest.raises(IOError):
+        download_motion_zip_files(dl_dirname=tmp_path, base_url=base_url(server))
+    # The complete archive is kept, the broken one is left as a part file
+    assert (tmp_path / "mot-2.json.zip").is_file()
+    assert not (tmp_path / "mot-1.json.zip").exists()
+    part_size = (tmp_path / "mot-1.json.zip.part").stat().st_size
+    assert part_size > 0
+
+    FakeRiksdagen.requests = []
+    downloaded_files = download_motion_zip_files(
+        dl_dirname=tmp_path, base_url=base_url(server)
     )
-    assert len(downloaded_files) == 1
-    assert downloaded_files[0] == dl_dirname / "file1.json"
+    assert downloaded_files == [tmp_path / "mot-1.json.zip"]
+    content = FakeRiksdagen.files["/dataset/mot-1.json.zip"]
+    assert downloaded_files[0].read_bytes() == content
+    resumed = dict(archive_requests())["/dataset/mot-1.json.zip"]
+    assert resumed["Range"] == f"bytes={part_size}-"
+    assert not (tmp_path / "mot-1.json.zip.part").exists()
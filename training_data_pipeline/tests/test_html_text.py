@@ -0,0 +1,97 @@
+# pylint: disable=missing-function-docstring
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+from training_data_pipeline.utils.html_text import html_to_text
+
+MOTION_HTML = """<div>
+<style>
+p.Motion { margin: 0cm; font-size: 12.0pt; }
+</style>
+<div class="Section1">
+<p class="Motionr&#228;d">Motion till riksdagen<br>
+2018/19:1 av Anna Andersson (S)</p>
+<h1>Persontrafik p&aring; TGOJ-banan</h1>
+<p>F&ouml;rslag till riksdagsbeslut</p>
+<table><tr><td>Riksdagen st&auml;ller sig bakom det som anf&ouml;rs
+i motionen.</td></tr></table>
+<p>J&auml;rnv&auml;gen&nbsp;str&auml;cker sig fr&aring;n Oxel&ouml;sund &#150; Flen.</p>
+<script type="text/javascript">var x = "<p>not text</p>";</script>
+<!-- comment -->
+<pre>  keep   this\t</pre>
+<p>Stockholm den 1 oktober 2018</p>\t
+</div>
+</div>"""
+
+TRICKY_HTML = [
+    "",
+    "plain text",
+    "<html><body>Sample HTML</body></html>",
+    MOTION_HTML,
+    "a<br>\t</br>b",
+    "a<br/>\t<br/>b",
+    "<p>a</p>\t<p>b</p>",
+    "<pre>\t</pre>x\t<p>",
+    "<textarea> \t </textarea>",
+    "<template><p>hidden</p></template>shown",
+    "<ruby>kanji<rp>(</rp><rt>reading</rt><rp>)</rp></ruby>",
+    "<![CDATA[ cdata ]]><![CDATA[]]>",
+    "<!DOCTYPE html><?xml version='1.0'?><!foo>text",
+    "&amp;&auml;&foo;&foo &#150;&#129;&#x41;&#0;&#99999999;",
+    "<script>unclosed",
+    "<style>a</style><script/>b",
+    "<div><span>a</div>b</span>c",
+    "</p>stray end tags</div>",
+    "<b",
+]
+
+
+def soup_text(html):
+    soup = BeautifulSoup(html, features="html.parser")
+    for tag in soup(["script", "style"]):
+        tag.extract()
+    return soup.get_text()
+
+
+@pytest.mark.parametrize("html", TRICKY_HTML)
+def test_html_to_text_matches_bs4(html):
+    assert html_to_text(html) == soup_text(html)
+
+
+def test_html_to_text_matches_bs4_on_random_markup():
+    pieces = [
+        "<p>",
+        "</p>",
+        "<pre>",
+        "</pre>",
+        "<script>",
+        "</script>",
+        "<style>",
+        "</style>",
+        "<br>",
+        "</br>",
+        "<br/>",
+        "<rt>",
+        "</rt>",
+        "<template>",
+        "</template>",
+        "<!-- c -->",
+        "<![CDATA[ x ]]>",
+        "&amp;",
+        "&foo;",
+        "&#150;",
+        " ",
+        "\t",
+        "\n",
+        "  ",
+        "text",
+        "Åsa",
+        "<",
+        "&",
+    ]
+    rnd = random.Random(0)
+    for _ in range(500):
+        html = "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 20)))
+        assert html_to_text(html) == soup_text(html), html
@@ -0,0 +1,17 @@
+# pylint: disable=missing-function-docstring
+from unittest.mock import patch
+
+import pytest
+
+from training_data_pipeline import pipeline
+
+
+@pytest.mark.parametrize("prep_workers, expected", [(None, 6), (2, 2)])
+def test_get_data_preps_in_parallel(prep_workers, expected):
+    with patch.object(pipeline, "download_motion_zip_files"), patch.object(
+        pipeline, "read_zip_file_data_to_parquet"
+    ), patch.object(pipeline, "prep_training_dataset") as prep, patch(
+        "os.cpu_count", return_value=6
+    ):
+        pipeline.get_data(prep_workers=prep_workers)
+    prep.assert_called_once_with(workers=expected)
@@ -1,5 +1,5 @@
 # pylint: disable=missing-function-docstring
-from pathlib import Path
+from unittest.mock import patch
 
 import pandas as pd
 import pytest
@@ -11,6 +11,8 @@ from training_data_pipeline.utils.preprocessor import (
     filter_short_motions,
     filter_titles,
     load_dataframe,
+    prep_partition,
+    prep_training_dataset,
 )
 
 
@@ -31,20 +33,30 @@ def fixture_sample_dataframe():
     return pd.DataFrame(data)
 
 
-def test_load_dataframe(sample_dataframe):
-    # Create a temporary file for testing
-    temp_file = "test_data.pkl"
-    sample_dataframe.to_pickle(temp_file)
+def test_load_dataframe(sample_dataframe, tmp_path):
+    # Write the data as two partitions
+    sample_dataframe.iloc[:2].to_parquet(tmp_path / "a.parquet", index=False)
+    sample_dataframe.iloc[2:].to_parquet(tmp_path / "b.parquet", index=False)
 
-    loaded_df = load_dataframe(data_path=Path(temp_file))
+    loaded_df = load_dataframe(data_path=tmp_path)
     assert_frame_equal(
         loaded_df[["title", "text"]], sample_dataframe[["title", "text"]]
     )
     assert is_datetime64_any_dtype(loaded_df["date"])
     assert is_datetime64_any_dtype(loaded_df["file_date"])
 
-    # Clean up temporary file
-    Path(temp_file).unlink()
+
+def test_load_dataframe_reads_only_given_columns(sample_dataframe, tmp_path):
+    sample_dataframe.to_parquet(tmp_path / "a.parquet", index=False)
+
+    loaded_df = load_dataframe(data_path=tmp_path, columns=["title", "date"])
+    assert list(loaded_df.columns) == ["title", "date"]
+    assert is_datetime64_any_dtype(loaded_df["date"])
+
+
+def test_load_dataframe_without_data(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_dataframe(data_path=tmp_path)
 
 
 def test_filter_nan_rows(sample_dataframe):
@@ -75,3 +87,61 @@ def test_filter_titles(sample_dataframe):
 
     assert len(filtered_df) == 2
     assert filtered_df["title"].values.tolist() == ["Title 2", "Title 3"]
+
+
+@pytest.fixture(name="parsed_dir")
+def fixture_parsed_dir(sample_dataframe, tmp_path):
+    """Write the sample data as two partitions of parsed motions."""
+    sample_dataframe["id"] = ["1", "2", "3", "4"]
+    sample_dataframe["subtitle"] = "Subtitle"
+    sample_dataframe["main_author"] = "Name"
+    sample_dataframe["author_party"] = "S"
+    sample_dataframe["text"] = [
+        f"Title {i}\n Subtitle  Motion text {i}, " + 20 * "bla bla. " for i in range(4)
+    ]
+    sample_dataframe.loc[1, "text"] = "Too short"
+    sample_dataframe.loc[2, "title"] = "Med anledning av prop. 2022/23:1"
+    parsed_dir = tmp_path / "parsed"
+    parsed_dir.mkdir()
+    sample_dataframe.iloc[:2].to_parquet(parsed_dir / "a.parquet", index=False)
+    sample_dataframe.iloc[2:].to_parquet(parsed_dir / "b.parquet", index=False)
+    return parsed_dir
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_prep_training_dataset(parsed_dir, tmp_path, workers):
+    output_path = tmp_path / "prepped.feather"
+    prep_training_dataset(
+        workers, parsed_dir, output_path, partitions_dir=tmp_path / "prepped"
+    )
+    prepped = pd.read_feather(output_path)
+
+    assert prepped["id"].tolist() == ["1", "4"]
+    assert prepped["text"].tolist() == [
+        f"Motion text {i}, " + " ".join(20 * ["bla bla."]) for i in [0, 3]
+    ]
+    assert is_datetime64_any_dtype(prepped["date"])
+    assert isinstance(prepped.index, pd.RangeIndex)
+
+
+def test_prep_training_dataset_reuses_partitions(parsed_dir, tmp_path):
+    output_path = tmp_path / "prepped.feather"
+    partitions_dir = tmp_path / "prepped"
+    prep_training_dataset(1, parsed_dir, output_path, partitions_dir)
+    mtime = output_path.stat().st_mtime_ns
+
+    with patch("training_data_pipeline.utils.preprocessor.prep_partition") as mock_prep:
+        prep_training_dataset(1, parsed_dir, output_path, partitions_dir)
+        mock_prep.assert_not_called()
+    assert output_path.stat().st_mtime_ns == mtime
+
+    # Only a changed partition is prepped again
+    (parsed_dir / "b.parquet").rename(parsed_dir / "c.parquet")
+    with patch(
+        "training_data_pipeline.utils.preprocessor.prep_partition",
+        wraps=prep_partition,
+    ) as mock_prep:
+        prep_training_dataset(1, parsed_dir, output_path, partitions_dir)
+        assert mock_prep.call_count == 1
+    assert len(list(partitions_dir.glob("*.parquet"))) == 2
+    assert pd.read_feather(output_path)["id"].tolist() == ["1", "4"]
@@ -1,11 +1,19 @@
 # pylint: disable=missing-function-docstring
+import json
 import zipfile
+from unittest.mock import patch
 
+import pandas as pd
+import pyarrow.parquet as pq
 import pytest
 
 from training_data_pipeline.utils.zip_data_reader import (
+    SCHEMA,
     parse_html_text,
+    parse_html_text_bs4,
     read_motions_from_zip_arch,
+    read_zip_file_data_to_parquet,
+    write_motions_partition,
 )
 
 
@@ -76,3 +84,62 @@ def test_parse_html_text():
     html = "<html><body>Sample HTML</body></html>"
     expected_text = "Sample HTML"
     assert parse_html_text(html) == expected_text
+
+
+def test_read_zip_file_data_to_parquet(sample_zip_file, tmp_path):
+    # Add a second archive so that the archives are parsed in parallel
+    zip_dir = sample_zip_file.parent
+    with zipfile.ZipFile(sample_zip_file) as src:
+        with zipfile.ZipFile(zip_dir / "other.zip", "w") as dst:
+            dst.writestr("motion1.json", src.read("motion1.json"))
+    output_dir = tmp_path / "dataset"
+
+    read_zip_file_data_to_parquet(zip_dir, output_dir, workers=2)
+    partitions = sorted(output_dir.glob("*.parquet"))
+    assert [path.name.split("-")[0] for path in partitions] == ["other", "sample"]
+
+    # Archives are read in name order
+    data = pd.concat([pd.read_parquet(path) for path in partitions])
+    assert data["id"].tolist() == ["1", "1", "2"]
+    assert data.columns.tolist() == SCHEMA.names
+    assert data["author_party"].tolist() == ["A", "A", "B"]
+
+
+def test_read_zip_file_data_to_parquet_reuses_partitions(sample_zip_file, tmp_path):
+    output_dir = tmp_path / "dataset"
+    read_zip_file_data_to_parquet(sample_zip_file.parent, output_dir, workers=1)
+
+    with patch(
+        "training_data_pipeline.utils.zip_data_reader.iter_motions_from_zip_arch"
+    ) as mock_iter:
+        read_zip_file_data_to_parquet(sample_zip_file.parent, output_dir, workers=1)
+        mock_iter.assert_not_called()
+
+        # A changed archive is parsed again and its old partition removed
+        with zipfile.ZipFile(sample_zip_file, "a") as f:
+            f.writestr("motion4.json", "{}")
+        mock_iter.return_value = iter([])
+        read_zip_file_data_to_parquet(sample_zip_file.parent, output_dir, workers=1)
+        mock_iter.assert_called_once_with(sample_zip_file)
+    partitions = list(output_dir.glob("*.parquet"))
+    assert len(partitions) == 1
+    assert pd.read_parquet(partitions[0]).empty
+
+
+def test_write_motions_partition_in_record_batches(sample_zip_file, tmp_path):
+    path = tmp_path / "sample.parquet"
+    with patch("training_data_pipeline.utils.zip_data_reader.RECORD_BATCH_SIZE", 1):
+        num_rows = write_motions_partition(sample_zip_file, path)
+
+    assert num_rows == 2
+    assert pq.ParquetFile(path).metadata.num_row_groups == 2
+    assert pd.read_parquet(path)["title"].tolist() == ["Motion 1", "Motion 2"]
+
+
+def test_parse_html_text_matches_bs4_on_fixtures(sample_zip_file):
+    with zipfile.ZipFile(sample_zip_file) as zipped:
+        for filename in zipped.namelist():
+            html = json.loads(zipped.read(filename))["dokumentstatus"]["dokument"][
+                "html"
+            ]
+            assert parse_html_text(html) == parse_html_text_bs4(html)
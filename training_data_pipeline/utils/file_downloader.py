@@ -1,7 +1,12 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, Optional
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 from utils.log import logger
@@ -9,14 +14,30 @@ from utils.log import logger
 DOWNLOADED_DATA_DIRNAME = (
     Path(__file__).resolve().parents[2] / "data" / "downloaded" / "zipped"
 )
+BASE_URL = "https://data.riksdagen.se"
+MANIFEST_FILENAME = "manifest.json"
+MAX_CONCURRENT_DOWNLOADS = 4
+CHUNK_SIZE = 1 << 20
+TIMEOUT = 10.0
 
 
 def download_motion_zip_files(
-    dl_dirname: Path = DOWNLOADED_DATA_DIRNAME, file_type="json"
+    dl_dirname: Path = DOWNLOADED_DATA_DIRNAME,
+    file_type="json",
+    base_url: str = BASE_URL,
+    max_concurrent_downloads: int = MAX_CONCURRENT_DOWNLOADS,
 ):
     """Download a collection of zipped directories to the dl_dirname
     directory. Returns a list of files downloaded.
 
+    Archives are downloaded concurrently over a shared connection pool. Each
+    is streamed to a `.part` file that is renamed when complete, and an
+    interrupted download is resumed from where it stopped on the next call.
+    Archives that are already downloaded are revalidated with the ETag and
+    Last-Modified headers saved in a manifest, and only downloaded again if
+    they have changed. Archives missing from the manifest are downloaded again
+    once, to record their headers.
+
     Args:
     ----
     - file_type     Selects the type of files that the directories
@@ -28,28 +49,145 @@ def download_motion_zip_files(
     downloaded_files = download_motion_zip_files('csv')
     """
     dl_dirname.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(dl_dirname)
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_maxsize=max_concurrent_downloads)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        doc_catalogue_url = base_url + "/dataset/katalog/dataset.xml"
+        response = session.get(doc_catalogue_url, allow_redirects=True, timeout=TIMEOUT)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, features="html.parser")
+        doc_list = soup.datasetlista.findAll("dataset") if soup.datasetlista else []
+        urls = {
+            dl_dirname / doc.filnamn.string: base_url + "/" + doc.url.string
+            for doc in doc_list
+            if (doc.typ.string == "mot") & (doc.format.string == file_type)
+        }
+
+        logger.info("Dowloading %s files from %s.", len(urls), base_url)
+        downloaded = set()
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_concurrent_downloads) as pool:
+            futures = {
+                pool.submit(
+                    download_file, session, url, path, manifest.get(path.name)
+                ): path
+                for path, url in urls.items()
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                path = futures[future]
+                try:
+                    validators = future.result()
+                except (requests.RequestException, OSError) as e:
+                    logger.error("Failed to download %s: %s", urls[path], e)
+                    errors[path] = e
+                    continue
+                if validators is not None:
+                    manifest[path.name] = validators
+                    downloaded.add(path)
+    _save_manifest(dl_dirname, manifest)
+
+    if errors:
+        raise next(iter(errors.values()))
+    return [path for path in urls if path in downloaded]
+
+
+def download_file(
+    session: requests.Session,
+    url: str,
+    output_file_path: Path,
+    validators: Optional[Dict[str, str]] = None,
+) -> Optional[Dict[str, str]]:
+    """Download a file unless the local copy is up to date.
+
+    `validators` holds the ETag and Last-Modified headers of the local copy,
+    if any. A local copy whose validators were never recorded, such as one
+    saved before there was a manifest, is downloaded again to record them. A
+    local copy that the server gave no validators for is kept as it is.
+    Returns the headers of the downloaded file, or None if the local copy was
+    up to date.
+    """
+    part_path = Path(f"{output_file_path}.part")
+    part_validators_path = Path(f"{output_file_path}.part.json")
+    # Byte ranges only make sense for the file as stored on the server
+    headers = {"Accept-Encoding": "identity"}
+    resume_from = 0
+    if part_path.is_file() and part_validators_path.is_file():
+        # Resume, but only if the file is unchanged since the download started
+        with open(part_validators_path, "r", encoding="utf-8") as f:
+            part_validators = json.load(f)
+        if_range = part_validators.get("etag") or part_validators.get("last_modified")
+        if if_range:
+            resume_from = part_path.stat().st_size
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["If-Range"] = if_range
+    elif output_file_path.is_file() and validators is not None:
+        if not validators.get("etag") and not validators.get("last_modified"):
+            # The server gave no validators for the file and can't tell if it
+            # has changed, so keep it
+            logger.debug("%s exists and has no validators.", output_file_path)
+            return None
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    with session.get(
+        url, headers=headers, stream=True, allow_redirects=True, timeout=TIMEOUT
+    ) as response:
+        if response.status_code == 304:
+            logger.debug("%s is up to date.", output_file_path)
+            return None
+        if response.status_code == 416:
+            # The part file is no longer a prefix of the file, start over
+            part_path.unlink()
+            part_validators_path.unlink()
+            return download_file(session, url, output_file_path)
+        response.raise_for_status()
+
+        new_validators = {
+            key: response.headers[header]
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+            if header in response.headers
+        }
+        if response.status_code == 206:
+            logger.debug("Resuming %s from byte %s ...", url, resume_from)
+            mode = "ab"
+        else:
+            logger.debug("Downloading %s to %s ...", url, output_file_path)
+            mode = "wb"
+            with open(part_validators_path, "w", encoding="utf-8") as f:
+                json.dump(new_validators, f)
+
+        received = 0
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                received += len(chunk)
+        expected = response.headers.get("Content-Length")
+        if expected is not None and received < int(expected):
+            raise IOError(
+                f"Download of {url} stopped after {received} of {expected} bytes"
+            )
+
+    os.replace(part_path, output_file_path)
+    part_validators_path.unlink()
+    return new_validators
+
+
+def _load_manifest(dl_dirname: Path) -> Dict[str, Dict[str, str]]:
+    """Load the ETag and Last-Modified headers of previously downloaded files."""
+    manifest_path = dl_dirname / MANIFEST_FILENAME
+    if not manifest_path.is_file():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
 
-    base_url = "https://data.riksdagen.se"
-    doc_catalogue_url = base_url + "/dataset/katalog/dataset.xml"
-    response = requests.get(doc_catalogue_url, allow_redirects=True, timeout=10.0)
-    soup = BeautifulSoup(response.content, features="html.parser")
-    doc_list = soup.datasetlista.findAll("dataset") if soup.datasetlista else []
-    logger.info("Dowloading files from %s.", base_url)
-    paths_to_downloads = []
-    for doc in tqdm(doc_list):
-        if (doc.typ.string == "mot") & (doc.format.string == file_type):
-            output_file_path = Path(dl_dirname / doc.filnamn.string)
-            if not output_file_path.is_file():
-                zip_arch_url = base_url + "/" + doc.url.string
-                response = requests.get(
-                    zip_arch_url, allow_redirects=True, timeout=10.0
-                )
-                with open(output_file_path, "wb") as f:
-                    logger.debug(
-                        "Downloading raw dataset from %s to %s ...",
-                        zip_arch_url,
-                        output_file_path,
-                    )
-                    f.write(response.content)
-                paths_to_downloads.append(output_file_path)
-    return paths_to_downloads
+def _save_manifest(dl_dirname: Path, manifest: Dict[str, Dict[str, str]]) -> None:
+    """Save the ETag and Last-Modified headers of downloaded files."""
+    with open(dl_dirname / MANIFEST_FILENAME, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
@@ -0,0 +1,218 @@
+from collections import Counter
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# The extractor mimics how BeautifulSoup (with the "html.parser" feature)
+# builds its tree and what get_text() returns from it, without building the
+# tree. The constants below are copied from BeautifulSoup's HTMLTreeBuilder.
+EMPTY_ELEMENT_TAGS = frozenset(
+    [
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+        "basefont",
+        "bgsound",
+        "command",
+        "frame",
+        "image",
+        "isindex",
+        "nextid",
+        "spacer",
+    ]
+)
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+# Strings inside these tags are not of the plain string type that get_text() uses
+STRING_CONTAINER_TAGS = frozenset(["rt", "rp", "style", "script", "template"])
+# Tags that are removed together with their content before getting the text
+DROPPED_TAGS = frozenset(["script", "style"])
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+TEXT = "text"
+CDATA = "cdata"
+OTHER = "other"  # Comments, declarations and processing instructions
+
+
+def _entity_to_character() -> Dict[str, str]:
+    """Map HTML5 entity names, without trailing semicolon, to characters."""
+    mapping: Dict[str, str] = {}
+    for name, character in sorted(html5.items()):
+        mapping.setdefault(name[:-1] if name.endswith(";") else name, character)
+    return mapping
+
+
+ENTITY_TO_CHARACTER = _entity_to_character()
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Collect the text of an HTML document, leaving out script and style tags.
+
+    The result is the same as that of
+
+        soup = BeautifulSoup(html, features="html.parser")
+        for tag in soup(["script", "style"]):
+            tag.extract()
+        soup.get_text()
+
+    but the text is collected from the parser callbacks directly. Only the
+    names of the open tags are kept track of, since they decide which strings
+    end up in the text, and how whitespace-only strings are treated.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.texts: List[str] = []
+        self._current_data: List[str] = []
+        self._open_tags: List[str] = []
+        self._open_tag_counts: Counter = Counter()
+        self._already_closed_empty_elements: List[str] = []
+        # Number of open tags of each special kind
+        self._preserve_whitespace_depth = 0
+        self._string_container_depth = 0
+        self._dropped_depth = 0
+
+    def get_text(self) -> str:
+        """Return the text of all the HTML fed to the parser so far."""
+        self.close()
+        self._end_data(TEXT)
+        return "".join(self.texts)
+
+    def _end_data(self, kind: str) -> None:
+        """Turn the data collected since the last tag into a string of a kind."""
+        if not self._current_data:
+            return
+        data = "".join(self._current_data)
+        self._current_data = []
+        if not self._preserve_whitespace_depth and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+
+        if self._dropped_depth:
+            return
+        if kind == CDATA or (kind == TEXT and not self._string_container_depth):
+            self.texts.append(data)
+
+    def _count_open(self, tag: str, change: int) -> None:
+        """Keep count of open tags when a tag is opened or closed."""
+        self._open_tag_counts[tag] += change
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_whitespace_depth += change
+        if tag in STRING_CONTAINER_TAGS:
+            self._string_container_depth += change
+        if tag in DROPPED_TAGS:
+            self._dropped_depth += change
+
+    def _handle_special_data(self, data: str, kind: str) -> None:
+        """Add data that makes up a string on its own, like a comment."""
+        self._end_data(TEXT)
+        self._current_data.append(data)
+        self._end_data(kind)
+
+    def handle_starttag(
+        self,
+        tag: str,
+        attrs: List[Tuple[str, Optional[str]]],
+        handle_empty_element: bool = True,
+    ) -> None:
+        """Open a tag, and close it right away if it is an empty element."""
+        self._end_data(TEXT)
+        self._open_tags.append(tag)
+        self._count_open(tag, 1)
+        if tag in EMPTY_ELEMENT_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed_empty_elements.append(tag)
+
+    def handle_startendtag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        """Open and close a tag written like <tag/>."""
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str, check_already_closed: bool = True) -> None:
+        """Close the most recently opened tag with the name, and the tags
+        opened after it. End tags without an open tag are ignored.
+        """
+        if check_already_closed and tag in self._already_closed_empty_elements:
+            self._already_closed_empty_elements.remove(tag)
+            return
+        self._end_data(TEXT)
+        if not self._open_tag_counts[tag]:
+            return
+        while self._open_tags:
+            closed = self._open_tags.pop()
+            self._count_open(closed, -1)
+            if closed == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        """Collect text between tags."""
+        self._current_data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        """Collect the character of a numeric reference like &#229;.
+
+        References below 256 are read as Windows-1252, since that is what
+        they usually are in practice.
+        """
+        if name.startswith("x"):
+            codepoint = int(name.lstrip("x"), 16)
+        elif name.startswith("X"):
+            codepoint = int(name.lstrip("X"), 16)
+        else:
+            codepoint = int(name)
+
+        data = None
+        if codepoint < 256:
+            try:
+                data = bytearray([codepoint]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name: str) -> None:
+        """Collect the character of a named reference like &auml;."""
+        self.handle_data(ENTITY_TO_CHARACTER.get(name, f"&{name}"))
+
+    def handle_comment(self, data: str) -> None:
+        """Skip comments."""
+        self._handle_special_data(data, OTHER)
+
+    def handle_decl(self, decl: str) -> None:
+        """Skip doctype declarations."""
+        self._handle_special_data(decl, OTHER)
+
+    def unknown_decl(self, data: str) -> None:
+        """Collect the text of CDATA sections, skip other declarations."""
+        if data.upper().startswith("CDATA["):
+            self._handle_special_data(data.partition("[")[2], CDATA)
+        else:
+            self._handle_special_data(data, OTHER)
+
+    def handle_pi(self, data: str) -> None:
+        """Skip processing instructions."""
+        self._handle_special_data(data, OTHER)
+
+
+def html_to_text(html: str) -> str:
+    """Return the text content of an HTML document, without scripts and styles."""
+    extractor = HTMLTextExtractor()
+    extractor.feed(html)
+    return extractor.get_text()
@@ -1,25 +1,62 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional
 
 import pandas as pd
-
-from utils.log import logger
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import utils.text
+from training_data_pipeline.utils.stage_cache import (
+    cache_key,
+    code_fingerprint,
+    remove_stale_files,
+)
+from training_data_pipeline.utils.zip_data_reader import SCHEMA
+from utils.log import add_duration, logger
 from utils.text import prep_text, trim_whitespace
 
 DOWNLOADED_DATA_DIRNAME = Path(__file__).resolve().parents[2] / "data" / "downloaded"
-INPUT_DATA_PATH = DOWNLOADED_DATA_DIRNAME / "raw_swe_parl_mot.pkl"
+INPUT_DATA_PATH = DOWNLOADED_DATA_DIRNAME / "raw_swe_parl_mot"
+PREPPED_PARTITIONS_DIR = DOWNLOADED_DATA_DIRNAME / "prepped_partitions"
 OUTPUT_DATA_PATH = DOWNLOADED_DATA_DIRNAME / "prepped_training_data.feather"
-
-
-def load_dataframe(data_path=INPUT_DATA_PATH) -> pd.DataFrame:
-    """Load data from pickle file into a pandas dataframe."""
+DATE_COLUMNS = ("date", "file_date")
+PREPPED_SCHEMA = pa.schema(
+    [
+        (
+            pa.field(field.name, pa.timestamp("ns"))
+            if field.name in DATE_COLUMNS
+            else field
+        )
+        for field in SCHEMA
+    ]
+)
+BATCH_SIZE = 1000
+# Prepped partitions are rebuilt when the preprocessing code changes
+PREP_FINGERPRINT = code_fingerprint(sys.modules[__name__], utils.text)
+
+
+def load_dataframe(
+    data_path=INPUT_DATA_PATH, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Load the Parquet partitions in a directory into a pandas dataframe.
+
+    Only the given columns are read from the partitions, or all columns if
+    `columns` is None.
+    """
     logger.info("Loading data from %s into pandas dataframe.", data_path)
-    try:
-        df = pd.DataFrame(pd.read_pickle(data_path))  # nosec
-    except FileNotFoundError:
+    paths = sorted(Path(data_path).glob("*.parquet"))
+    if not paths:
         logger.error("No data found at %s.", data_path)
-        raise
-    df["date"] = pd.to_datetime(df["date"])
-    df["file_date"] = pd.to_datetime(df["file_date"])
+        raise FileNotFoundError(f"No Parquet files found in {data_path}")
+    table = pa.concat_tables(pq.read_table(path, columns=columns) for path in paths)
+    df = table.to_pandas()
+    for date_column in DATE_COLUMNS:
+        if date_column in df:
+            df[date_column] = pd.to_datetime(df[date_column])
     return df
 
 
@@ -27,7 +64,7 @@ def filter_nan_rows(df) -> pd.DataFrame:
     """Filter out rows with missing values."""
     pre_filter_len = len(df)
     df = df.dropna()
-    logger.info("Filtered %s rows with missing values.", (pre_filter_len - len(df)))
+    logger.debug("Filtered %s rows with missing values.", (pre_filter_len - len(df)))
     return df
 
 
@@ -35,7 +72,7 @@ def filter_short_motions(df) -> pd.DataFrame:
     """Filter out rows with motions shorter than 150 characters."""
     pre_filter_len = len(df)
     df = df.loc[df["text"].str.len() >= 150].reset_index(drop=True)
-    logger.info(
+    logger.debug(
         "Filtered %s texts shorter than 150 characters.", (pre_filter_len - len(df))
     )
     return df
@@ -47,25 +84,172 @@ def filter_titles(df) -> pd.DataFrame:
     df = df.loc[
         ~df["title"].str.lower().str.startswith("med anledning av prop")
     ].reset_index(drop=True)
-    logger.info("Filtered %s texts based on their title.", (pre_filter_len - len(df)))
+    logger.debug("Filtered %s texts based on their title.", (pre_filter_len - len(df)))
     return df
 
 
 # pylint: disable=unsupported-assignment-operation,unsubscriptable-object
-def prep_training_dataset():
-    """Pipeline to format and filter data."""
-    df = load_dataframe()
-    logger.info("Preprocessing data ...")
-
-    df = filter_nan_rows(df)
-
-    # Prep target and feature texts
+def prep_texts(df) -> pd.DataFrame:
+    """Prep the target and feature texts of a dataframe."""
     df["title"] = trim_whitespace(df["title"])
     df["text"] = prep_text(df)
+    return df
+
+
+def prep_partition(input_path: Path, output_path: Path) -> Dict[str, float]:
+    """Format and filter the motions of a Parquet file and write them to another.
+
+    The motions are read, prepped and written a record batch at a time. Returns
+    the number of seconds spent in each step.
+    """
+    durations: Dict[str, float] = {}
+    num_input_rows = num_output_rows = 0
+    tmp_path = Path(f"{output_path}.tmp")
+    with pq.ParquetWriter(tmp_path, PREPPED_SCHEMA) as writer:
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=BATCH_SIZE):
+            with add_duration(durations, "load"):
+                df = batch.to_pandas()
+                for date_column in DATE_COLUMNS:
+                    df[date_column] = pd.to_datetime(df[date_column])
+            num_input_rows += len(df)
+
+            with add_duration(durations, "NaN filter"):
+                df = filter_nan_rows(df)
+            with add_duration(durations, "text prep"):
+                df = prep_texts(df)
+            with add_duration(durations, "short/title filters"):
+                df = filter_short_motions(df)
+                df = filter_titles(df)
+
+            num_output_rows += len(df)
+            with add_duration(durations, "partition write"):
+                table = pa.Table.from_pandas(
+                    df, schema=PREPPED_SCHEMA, preserve_index=False
+                )
+                writer.write_table(table.replace_schema_metadata(None))
+    os.replace(tmp_path, output_path)
+    logger.info(
+        "Kept %s of %s motions from %s.", num_output_rows, num_input_rows, input_path
+    )
+    return durations
+
+
+def write_feather(input_paths: List[Path], output_path: Path, key: str) -> int:
+    """Concatenate Parquet files into a feather file a record batch at a time.
+
+    The key is stored in the feather file's schema metadata. Returns the
+    number of rows written.
+    """
+    num_rows = 0
+    tmp_path = Path(f"{output_path}.tmp")
+    schema = PREPPED_SCHEMA.with_metadata({"cache_key": key})
+    options = pa.ipc.IpcWriteOptions(compression="lz4")
+    with pa.ipc.new_file(tmp_path, schema, options=options) as writer:
+        for input_path in input_paths:
+            for batch in pq.ParquetFile(input_path).iter_batches(batch_size=BATCH_SIZE):
+                # Older Parquet format versions store the dates in microseconds
+                table = pa.Table.from_batches([batch]).cast(PREPPED_SCHEMA)
+                writer.write_table(table)
+                num_rows += batch.num_rows
+    os.replace(tmp_path, output_path)
+    return num_rows
+
+
+def _feather_cache_key(path: Path) -> Optional[str]:
+    """Return the key stored by `write_feather`, if the file exists."""
+    if not path.is_file():
+        return None
+    with pa.ipc.open_file(path) as reader:
+        metadata = reader.schema.metadata or {}
+    key = metadata.get(b"cache_key")
+    return key.decode() if key else None
+
+
+def prep_training_dataset(
+    workers: int = 1,
+    data_path=INPUT_DATA_PATH,
+    output_path=OUTPUT_DATA_PATH,
+    partitions_dir=PREPPED_PARTITIONS_DIR,
+):
+    """Pipeline to format and filter data.
+
+    Each partition of parsed motions is prepped a record batch at a time, in
+    `workers` processes, so memory use does not grow with the size of the
+    data. The prepped partitions are kept in `partitions_dir`, named by a hash
+    of their input and of the preprocessing code, and only partitions that are
+    new or have changed since the last run are prepped. The time spent in each
+    step, summed over the partitions, is logged.
+    """
+    input_paths = sorted(Path(data_path).glob("*.parquet"))
+    if not input_paths:
+        logger.error("No data found at %s.", data_path)
+        raise FileNotFoundError(f"No Parquet files found in {data_path}")
+    partitions_dir = Path(partitions_dir)
+    partitions_dir.mkdir(parents=True, exist_ok=True)
+    prepped_paths = [
+        partitions_dir / f"{path.stem}-{cache_key(path.name, PREP_FINGERPRINT)}.parquet"
+        for path in input_paths
+    ]
+    to_prep = [
+        (input_path, prepped_path)
+        for input_path, prepped_path in zip(input_paths, prepped_paths)
+        if not prepped_path.is_file()
+    ]
+    logger.info(
+        "Preprocessing %s new or changed of %s partitions with %s worker(s) ...",
+        len(to_prep),
+        len(input_paths),
+        workers,
+    )
+
+    durations: Dict[str, float] = {}
+    if workers > 1 and len(to_prep) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_prep))) as pool:
+            partition_durations = list(pool.map(prep_partition, *zip(*to_prep)))
+    else:
+        partition_durations = [prep_partition(*paths) for paths in to_prep]
+    for stage_durations in partition_durations:
+        for stage, seconds in stage_durations.items():
+            durations[stage] = durations.get(stage, 0.0) + seconds
+    remove_stale_files(partitions_dir, prepped_paths, "*.parquet")
+
+    output_path = Path(output_path)
+    key = cache_key(*(path.name for path in prepped_paths))
+    if _feather_cache_key(output_path) == key:
+        logger.info("Preprocessed data at %s is up to date.", output_path)
+    else:
+        with add_duration(durations, "feather write"):
+            num_rows = write_feather(prepped_paths, output_path, key)
+        logger.info("Number of rows remaining: %s", num_rows)
+        logger.info("Preprocessed data saved to %s", output_path)
+    for stage, seconds in durations.items():
+        logger.info("%s took %.2f seconds.", stage.capitalize(), seconds)
+
+
+def _setup_parser():
+    """Set up Python's ArgumentParser with the preprocessing arguments."""
+    parser = argparse.ArgumentParser(description="Prep the motions for training.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes to prep partitions in",
+    )
+    return parser
+
+
+def main():
+    """
+    Prep the training data.
+
+    Sample command:
+    ```
+    python -m training_data_pipeline.utils.preprocessor --workers=8
+    ```
+    """
+    args = _setup_parser().parse_args()
+    prep_training_dataset(workers=args.workers)
 
-    df = filter_short_motions(df)
-    df = filter_titles(df)
 
-    logger.info("Number of rows remaining: %s", len(df))
-    df.to_feather(path=OUTPUT_DATA_PATH)
-    logger.info("Preprocessed data saved to %s", OUTPUT_DATA_PATH)
+if __name__ == "__main__":
+    main()
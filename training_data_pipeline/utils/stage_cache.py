@@ -0,0 +1,31 @@
+import hashlib
+from pathlib import Path
+from types import ModuleType
+from typing import Iterable
+
+
+def code_fingerprint(*modules: ModuleType) -> str:
+    """Return a hash of the source code of modules.
+
+    Including it in the cache key of a stage's output makes the cache invalid
+    whenever the code that produced the output changes.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(Path(str(module.__file__)).read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(*parts: str) -> str:
+    """Return a short key that changes whenever any of the parts do."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def remove_stale_files(directory: Path, keep: Iterable[Path], pattern: str) -> None:
+    """Remove files matching the pattern in a directory, except those to keep."""
+    for stale_path in set(Path(directory).glob(pattern)) - set(keep):
+        stale_path.unlink()
@@ -1,29 +1,152 @@
+import hashlib
 import json
-import pickle
+import os
+import sys
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterator, Optional
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 from bs4 import BeautifulSoup
 
+from training_data_pipeline.utils import html_text
+from training_data_pipeline.utils.html_text import html_to_text
+from training_data_pipeline.utils.stage_cache import (
+    cache_key,
+    code_fingerprint,
+    remove_stale_files,
+)
 from utils.log import logger
 
 DOWNLOADED_DATA_DIRNAME = Path(__file__).resolve().parents[2] / "data" / "downloaded"
 ZIP_DIR = DOWNLOADED_DATA_DIRNAME / "zipped"
-OUTPUT_PATH = DOWNLOADED_DATA_DIRNAME / "raw_swe_parl_mot.pkl"
-
-
-def read_zip_file_data_to_pkl(zip_dir=ZIP_DIR, output_path=OUTPUT_PATH):
-    """Read data from directory with zip files and save it to a pickle file."""
+OUTPUT_DIR = DOWNLOADED_DATA_DIRNAME / "raw_swe_parl_mot"
+MANIFEST_FILENAME = "manifest.json"
+# Partitions are rebuilt when the parsing code changes
+PARSER_FINGERPRINT = code_fingerprint(sys.modules[__name__], html_text)
+RECORD_BATCH_SIZE = 1000
+SCHEMA = pa.schema(
+    [
+        ("title", pa.string()),
+        ("id", pa.string()),
+        ("date", pa.string()),
+        ("file_date", pa.string()),
+        ("subtitle", pa.string()),
+        ("text", pa.string()),
+        ("main_author", pa.string()),
+        ("author_party", pa.string()),
+    ]
+)
+
+
+def read_zip_file_data_to_parquet(
+    zip_dir=ZIP_DIR,
+    output_dir=OUTPUT_DIR,
+    workers: Optional[int] = None,
+):
+    """Read data from directory with zip files into a partitioned Parquet dataset.
+
+    The motions of each archive are written to a Parquet file of their own in
+    `output_dir`, named by a hash of the archive and the parsing code, so only
+    archives that are new or have changed since the last run are parsed. These
+    are parsed in parallel by `workers` processes, by default one per CPU.
+    Partitions of archives that are no longer in `zip_dir` are removed.
+    Returns the paths of all partitions, in archive name order.
+    """
     logger.info("Reading data from zip files in %s ...", zip_dir)
-    data = []
-    for zip_file in zip_dir.glob("*.zip"):
-        data_list = read_motions_from_zip_arch(zip_file)
-        data.extend(data_list)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+
+    partition_paths = {}
+    to_parse = []
+    for zip_file in sorted(Path(zip_dir).glob("*.zip")):
+        digest = _archive_digest(zip_file, manifest)
+        key = cache_key(digest, PARSER_FINGERPRINT)
+        partition_paths[zip_file] = output_dir / f"{zip_file.stem}-{key}.parquet"
+        if not partition_paths[zip_file].is_file():
+            to_parse.append(zip_file)
+    logger.info(
+        "Parsing %s new or changed of %s zip files.",
+        len(to_parse),
+        len(partition_paths),
+    )
 
-    logger.info("Saving data ...")
-    with open(output_path, "wb") as target_file:
-        pickle.dump(data, target_file)
-    logger.info("The %s file was saved at %s", target_file, output_path)
+    paths = [partition_paths[zip_file] for zip_file in to_parse]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(to_parse) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_parse))) as pool:
+            list(pool.map(write_motions_partition, to_parse, paths))
+    else:
+        for zip_file, path in zip(to_parse, paths):
+            write_motions_partition(zip_file, path)
+    _save_manifest(output_dir, manifest)
+    remove_stale_files(output_dir, partition_paths.values(), "*.parquet")
+    logger.info("The motions dataset was saved at %s", output_dir)
+    return list(partition_paths.values())
+
+
+def write_motions_partition(zip_arch, path: Path) -> int:
+    """Parse the motions of a zip archive and write them to a Parquet file.
+
+    Motions are written in record batches as they are parsed, so the archive
+    is never held in memory as a whole. Returns the number of motions written.
+    """
+    tmp_path = Path(f"{path}.tmp")
+    num_rows = 0
+    with pq.ParquetWriter(tmp_path, SCHEMA) as writer:
+        rows = []
+        for doc in iter_motions_from_zip_arch(zip_arch):
+            rows.append(doc)
+            if len(rows) == RECORD_BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=SCHEMA))
+                num_rows += len(rows)
+                rows = []
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=SCHEMA))
+            num_rows += len(rows)
+    os.replace(tmp_path, path)
+    return num_rows
+
+
+def _archive_digest(zip_file: Path, manifest: Dict[str, Dict]) -> str:
+    """Return the sha256 hash of an archive's content.
+
+    The hash is stored in the manifest together with the file's size and
+    modification time, and is only recomputed when either of those change.
+    """
+    stat = zip_file.stat()
+    entry = manifest.get(zip_file.name, {})
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(zip_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    manifest[zip_file.name] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+    return manifest[zip_file.name]["sha256"]
+
+
+def _load_manifest(cache_dir: Path) -> Dict[str, Dict]:
+    """Load the size, modification time and hash of previously read archives."""
+    manifest_path = cache_dir / MANIFEST_FILENAME
+    if not manifest_path.is_file():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def _save_manifest(cache_dir: Path, manifest: Dict[str, Dict]) -> None:
+    """Save the size, modification time and hash of read archives."""
+    with open(cache_dir / MANIFEST_FILENAME, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
 
 
 def read_motions_from_zip_arch(zip_arch):
@@ -41,14 +164,20 @@ def read_motions_from_zip_arch(zip_arch):
     data = read_motions_from_zip_arch('data/raw/mot-2018-2021.json.zip')
     df = pd.DataFrame(data)
     """
-    parsed_docs = []
+    return list(iter_motions_from_zip_arch(zip_arch))
+
+
+def iter_motions_from_zip_arch(zip_arch) -> Iterator[Dict]:
+    """Yield the motions of a zipped directory one at a time, as dictionaries
+    like those returned by `read_motions_from_zip_arch`.
+    """
+    parsed_docs = 0
     total_docs = 0
     with zipfile.ZipFile(zip_arch) as zipped:
         for filename in zipped.namelist():
             total_docs += 1
             with zipped.open(filename) as f:
-                data = f.read()
-                data = json.loads(data.decode("utf-8-sig"))
+                data = json.loads(f.read().decode("utf-8-sig"))
                 try:
                     document = data["dokumentstatus"]["dokument"]
                 except TypeError as e:
@@ -73,7 +202,6 @@ def read_motions_from_zip_arch(zip_arch):
                     else:
                         doc["main_author"] = authors["namn"]
                         doc["author_party"] = authors["partibet"]
-                    parsed_docs.append(doc)
                 except (KeyError, TypeError) as e:
                     logger.debug(
                         "Did not find key %s in motion id=%s, title=%s",
@@ -81,24 +209,37 @@ def read_motions_from_zip_arch(zip_arch):
                         document["dok_id"],
                         document["titel"],
                     )
+                    continue
+            parsed_docs += 1
+            yield doc
     logger.info(
         "Successfully parsed %s of %s documents from %s.",
-        len(parsed_docs),
+        parsed_docs,
         total_docs,
         zip_arch,
     )
-    return parsed_docs
 
 
 def parse_html_text(html: str) -> str:
     """Parse html text and return a string with the text content."""
+    return _normalize_whitespace(html_to_text(html))
+
+
+def parse_html_text_bs4(html: str) -> str:
+    """Parse html text with BeautifulSoup and return a string with the text
+    content. This is the slower reference that parse_html_text must match.
+    """
     soup = BeautifulSoup(html, features="html.parser")
 
     # Drop script and style elements
     for script in soup(["script", "style"]):
         script.extract()
 
-    text = soup.get_text()
+    return _normalize_whitespace(soup.get_text())
+
+
+def _normalize_whitespace(text: str) -> str:
+    """Strip lines and join the phrases of a text, separated by single spaces."""
     lines = (line.strip() for line in text.splitlines())
     chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
     text = " ".join(chunk for chunk in chunks if chunk)
@@ -53,3 +53,21 @@ def add_version_arg(parser: argparse.ArgumentParser):
         help="the version in the directory name in yor lightning_logs directory",
     )
     return parser
+
+
+def add_artifact_args(parser: argparse.ArgumentParser, output_suffix: str):
+    """Add arguments of a model artifact to read and where to save a copy of it
+    to parser. The copy is saved next to the artifact by default, with the
+    suffix appended to its directory name.
+    """
+    parser.add_argument(
+        "artifact_dir",
+        help="Directory saved by save_checkpoint_to_local_artifact.py, "
+        "or a Hugging Face repo",
+    )
+    parser.add_argument(
+        "--output_dir",
+        default=None,
+        help=f"Where to save the copy, by default <artifact_dir>{output_suffix}",
+    )
+    return parser
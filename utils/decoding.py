@@ -0,0 +1,192 @@
+import math
+import os
+from typing import Any, Dict, Optional
+
+# "speculative" is a greedy search where a draft model proposes a few tokens at
+# a time and the model checks them in one forward pass. It gives the same
+# titles as "greedy", faster if the draft model mostly agrees with the model.
+# It takes no repetition penalty, since transformers' assisted generation
+# doesn't apply it to the last token of each check, which changes the titles.
+STRATEGIES = ("greedy", "beam", "speculative")
+STRATEGY = "beam"
+NUM_BEAMS = 2
+REPETITION_PENALTY = 2.5
+LENGTH_PENALTY = 1.0
+
+
+class DecodingConfig:
+    """Settings for decoding titles from a model.
+
+    Parameters
+    ----------
+    strategy
+        one of "greedy", "beam" and "speculative"
+    num_beams
+        number of beams of a beam search
+    repetition_penalty
+        penalty for generating tokens that are already in the title, 1.0 for none
+    length_penalty
+        exponent of the length that a beam's score is divided by, where larger
+        values favour longer titles
+    early_stopping
+        whether a beam search stops when `num_beams` titles are done
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        strategy: str = STRATEGY,
+        num_beams: int = NUM_BEAMS,
+        repetition_penalty: float = REPETITION_PENALTY,
+        length_penalty: float = LENGTH_PENALTY,
+        early_stopping: bool = True,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown decoding strategy {strategy!r}, expected one of {STRATEGIES}"
+            )
+        # bool is a subclass of int, but True is not a number of beams
+        if isinstance(num_beams, bool) or not isinstance(num_beams, int):
+            raise ValueError(f"num_beams must be an integer, got {num_beams!r}")
+        if num_beams < 1:
+            raise ValueError(f"num_beams must be positive, got {num_beams}")
+        for name, value in [
+            ("repetition_penalty", repetition_penalty),
+            ("length_penalty", length_penalty),
+        ]:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name} must be a number, got {value!r}")
+        if not isinstance(early_stopping, bool):
+            raise ValueError(
+                f"early_stopping must be true or false, got {early_stopping!r}"
+            )
+        repetition_penalty, length_penalty = (
+            float(repetition_penalty),
+            float(length_penalty),
+        )
+        if not math.isfinite(repetition_penalty) or repetition_penalty <= 0:
+            raise ValueError(
+                "repetition_penalty must be a positive number, "
+                f"got {repetition_penalty}"
+            )
+        if not math.isfinite(length_penalty):
+            raise ValueError(f"length_penalty must be a number, got {length_penalty}")
+        if strategy == "speculative" and repetition_penalty != 1.0:
+            raise ValueError(
+                "Speculative decoding takes no repetition penalty, set "
+                f"repetition_penalty to 1.0, got {repetition_penalty}"
+            )
+        self.strategy = strategy
+        self.num_beams = num_beams
+        self.repetition_penalty = repetition_penalty
+        self.length_penalty = length_penalty
+        self.early_stopping = early_stopping
+
+    @staticmethod
+    def add_to_argparse(parser):  # pylint: disable=missing-function-docstring
+        parser.add_argument(
+            "--decoding_strategy",
+            type=str,
+            choices=STRATEGIES,
+            default=STRATEGY,
+            help="How to decode titles.",
+        )
+        parser.add_argument(
+            "--num_beams",
+            type=int,
+            default=NUM_BEAMS,
+            help="Number of beams when decoding titles with beam search.",
+        )
+        parser.add_argument(
+            "--repetition_penalty", type=float, default=REPETITION_PENALTY
+        )
+        parser.add_argument("--length_penalty", type=float, default=LENGTH_PENALTY)
+        return parser
+
+    @classmethod
+    def from_args(cls, args: Optional[Dict] = None) -> "DecodingConfig":
+        """Create a config from parsed arguments, see `add_to_argparse`."""
+        args = args if args is not None else {}
+        return cls(
+            strategy=args.get("decoding_strategy", STRATEGY),
+            num_beams=args.get("num_beams", NUM_BEAMS),
+            repetition_penalty=args.get("repetition_penalty", REPETITION_PENALTY),
+            length_penalty=args.get("length_penalty", LENGTH_PENALTY),
+        )
+
+    @classmethod
+    def from_env(cls) -> "DecodingConfig":
+        """Create a config from environment variables."""
+        return cls(
+            strategy=os.environ.get("PREDICT_DECODING_STRATEGY", STRATEGY),
+            num_beams=int(os.environ.get("PREDICT_NUM_BEAMS", NUM_BEAMS)),
+            repetition_penalty=float(
+                os.environ.get("PREDICT_REPETITION_PENALTY", REPETITION_PENALTY)
+            ),
+            length_penalty=float(
+                os.environ.get("PREDICT_LENGTH_PENALTY", LENGTH_PENALTY)
+            ),
+        )
+
+    @classmethod
+    def from_dict(
+        cls, settings: Dict[str, Any], defaults: Optional["DecodingConfig"] = None
+    ) -> "DecodingConfig":
+        """Create a config from a dict of settings, like one in a request body.
+
+        Settings that are not in the dict are taken from `defaults`. Raises
+        ValueError for unknown or invalid settings, including values of the
+        wrong type, such as a string for `early_stopping` or a float for
+        `num_beams`.
+        """
+        merged = (defaults or cls()).to_dict()
+        unknown = set(settings) - set(merged)
+        if unknown:
+            raise ValueError(
+                f"Unknown decoding settings {sorted(unknown)}, "
+                f"expected some of {sorted(merged)}"
+            )
+        merged.update(settings)
+        try:
+            return cls(**merged)
+        except TypeError as e:
+            raise ValueError(f"Invalid decoding settings: {e}") from e
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the settings as a dict, that `from_dict` accepts."""
+        return {
+            "strategy": self.strategy,
+            "num_beams": self.num_beams,
+            "repetition_penalty": self.repetition_penalty,
+            "length_penalty": self.length_penalty,
+            "early_stopping": self.early_stopping,
+        }
+
+    def generate_kwargs(self) -> Dict[str, Any]:
+        """Return the arguments to pass to the model's generate method.
+
+        The draft model of the "speculative" strategy is passed separately, as
+        generate's `assistant_model`.
+        """
+        if self.strategy == "beam":
+            return {
+                "num_beams": self.num_beams,
+                "repetition_penalty": self.repetition_penalty,
+                "length_penalty": self.length_penalty,
+                "early_stopping": self.early_stopping,
+            }
+        return {
+            "num_beams": 1,
+            "do_sample": False,
+            "repetition_penalty": self.repetition_penalty,
+        }
+
+    def __eq__(self, other) -> bool:
+        """Return whether the other config has the same settings."""
+        return isinstance(other, DecodingConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        """Return the settings, as they are passed to the constructor."""
+        settings = ", ".join(
+            f"{key}={value!r}" for key, value in self.to_dict().items()
+        )
+        return f"DecodingConfig({settings})"
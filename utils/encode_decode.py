@@ -1,9 +1,27 @@
-def encode(text, tokenizer, max_tokens):
-    """Use tokenizer to encode text."""
+import math
+import threading
+from typing import Dict, Generator, List
+
+from utils.decoding import DecodingConfig
+
+# Beam search only knows its best title at the end, so titles are streamed
+# from a greedy search
+STREAM_DECODING = DecodingConfig("greedy")
+
+
+def encode(text, tokenizer, max_tokens, padding="max_length", pad_to_multiple_of=None):
+    """Use tokenizer to encode text, or a list of texts.
+
+    By default all encodings are padded to `max_tokens`. Pass `padding="longest"`
+    to only pad to the longest text in the batch, or `padding=False` to not pad
+    at all. `pad_to_multiple_of` rounds the padded length up to a multiple of
+    the given number.
+    """
     return tokenizer(
         text,
         max_length=max_tokens,
-        padding="max_length",
+        padding=padding,
+        pad_to_multiple_of=pad_to_multiple_of,
         truncation=True,
         return_attention_mask=True,
         add_special_tokens=True,
@@ -11,24 +29,359 @@ def encode(text, tokenizer, max_tokens):
     )
 
 
-def generate(model, tokenizer, text_encoding, max_title_tokens):
-    """Generate title for single text."""
+def _split_into_windows(ids, window_tokens, overlap, max_windows, eos_token_id):
+    """Return overlapping windows of a text's token ids, each ending with the
+    end of sequence token. See `encode_windows`.
+    """
+    content_tokens = window_tokens - 1  # Leave room for the end of sequence token
+    step = content_tokens - overlap
+    num_windows = 1 + max(0, math.ceil((len(ids) - content_tokens) / step))
+    if max_windows is not None:
+        num_windows = min(num_windows, max_windows)
+    windows = []
+    for start in range(0, num_windows * step, step):
+        end = start + content_tokens
+        windows.append(ids[start:end] + [eos_token_id])
+    return windows
+
+
+def _pad_windows(windows_per_text, length, pad_token_id):
+    """Return the input ids and attention mask of the windows of texts, padded
+    to the largest number of windows and to `length` tokens.
+    """
+    import torch  # pylint: disable=import-outside-toplevel
+
+    num_windows = max((len(windows) for windows in windows_per_text), default=0)
+    shape = (len(windows_per_text), num_windows, length)
+    input_ids = torch.full(shape, pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros(shape, dtype=torch.long)
+    for i, windows in enumerate(windows_per_text):
+        for j, window in enumerate(windows):
+            input_ids[i, j, : len(window)] = torch.tensor(window)
+            attention_mask[i, j, : len(window)] = 1
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def encode_windows(  # pylint: disable=too-many-arguments
+    text,
+    tokenizer,
+    window_tokens,
+    overlap,
+    max_windows=None,
+    padding="longest",
+    pad_to_multiple_of=None,
+):
+    """Split a text, or each of a list of texts, into overlapping windows of at
+    most `window_tokens` tokens and encode them, instead of truncating them.
+
+    Consecutive windows share `overlap` tokens, and each window ends with the
+    end of sequence token. Texts are cut after `max_windows` windows, if given.
+    The returned "input_ids" and "attention_mask" have the shape (texts,
+    windows, tokens). Texts with fewer windows than the longest text are padded
+    with empty windows. Windows are padded to the longest window, or to
+    `window_tokens` with `padding="max_length"`. Titles are generated from the
+    windows by fusing their encoder outputs, see `encode_fused`.
+    """
+    if overlap >= window_tokens - 1:
+        raise ValueError(
+            f"overlap must be less than window_tokens - 1, got {overlap} "
+            f"and {window_tokens}"
+        )
+    texts = [text] if isinstance(text, str) else list(text)
+    windows_per_text = [
+        _split_into_windows(
+            ids, window_tokens, overlap, max_windows, tokenizer.eos_token_id
+        )
+        for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]
+    ]
+    length = max(
+        (len(window) for windows in windows_per_text for window in windows), default=0
+    )
+    if padding == "max_length":
+        length = window_tokens
+    if pad_to_multiple_of:
+        length = math.ceil(length / pad_to_multiple_of) * pad_to_multiple_of
+    return _pad_windows(windows_per_text, length, tokenizer.pad_token_id)
+
+
+def encode_fused(model, input_ids, attention_mask):
+    """Run the encoder on windows of texts, encoded by `encode_windows`, as one
+    batch, and concatenate each text's windows' hidden states, as in Fusion-in-
+    Decoder (Izacard and Grave, 2021).
+
+    The decoder attends to all windows of a text at once, while the encoder's
+    cost only grows linearly with the number of windows. Returns the encoder
+    outputs and attention mask to pass to the model's forward or generate.
+    """
+    # pylint: disable=import-outside-toplevel
+    from transformers.modeling_outputs import BaseModelOutput
+
+    num_texts, num_windows, length = input_ids.shape
+    input_ids = input_ids.reshape(-1, length)
+    attention_mask = attention_mask.reshape(-1, length)
+    # Empty windows only pad out the batch, so they are not encoded
+    used = attention_mask.any(dim=1)
+    hidden_states = model.get_encoder()(
+        input_ids=input_ids[used], attention_mask=attention_mask[used]
+    ).last_hidden_state
+    fused = hidden_states.new_zeros(input_ids.shape + hidden_states.shape[-1:])
+    fused[used] = hidden_states
+    return (
+        BaseModelOutput(
+            last_hidden_state=fused.reshape(num_texts, num_windows * length, -1)
+        ),
+        attention_mask.reshape(num_texts, num_windows * length),
+    )
+
+
+def _run_encoder(model, input_ids, attention_mask):
+    """Return the encoder's hidden states and attention mask for a batch of
+    texts, fusing the windows of texts that are split into windows.
+    """
+    if input_ids.dim() == 3:
+        encoder_outputs, attention_mask = encode_fused(model, input_ids, attention_mask)
+        return encoder_outputs.last_hidden_state, attention_mask
+    hidden_states = model.get_encoder()(
+        input_ids=input_ids, attention_mask=attention_mask
+    ).last_hidden_state
+    return hidden_states, attention_mask
+
+
+def encode_cached(model, text_encoding, encoder_cache):
+    """Return the encoder outputs and attention mask for an encoding of texts,
+    running the encoder only on the texts whose hidden states are not in
+    `encoder_cache`, a `utils.encoder_cache.EncoderCache`, and caching them.
+    """
+    # pylint: disable=import-outside-toplevel
+    from transformers.modeling_outputs import BaseModelOutput
+
+    input_ids, attention_mask = (
+        text_encoding["input_ids"],
+        text_encoding["attention_mask"],
+    )
+    keys = [
+        encoder_cache.key(ids, mask) for ids, mask in zip(input_ids, attention_mask)
+    ]
+    states = [encoder_cache.get(key) for key in keys]
+    missing = [i for i, hidden_states in enumerate(states) if hidden_states is None]
+    if missing:
+        hidden_states, mask = _run_encoder(
+            model, input_ids[missing], attention_mask[missing]
+        )
+        for i, row_states, row_mask in zip(missing, hidden_states, mask.bool()):
+            # Only keep the states of the text's tokens, not of its padding
+            states[i] = row_states[row_mask]
+            encoder_cache.set(keys[i], states[i])
+
+    hidden_states, attention_mask = _pad_hidden_states(states, attention_mask)
+    return BaseModelOutput(last_hidden_state=hidden_states), attention_mask
+
+
+def _pad_hidden_states(states, attention_mask):
+    """Return the hidden states of texts, of different lengths, padded into one
+    tensor, and its attention mask, of the type of `attention_mask`.
+    """
+    length = max(len(hidden_states) for hidden_states in states)
+    fused = states[0].new_zeros((len(states), length, states[0].shape[-1]))
+    fused_mask = attention_mask.new_zeros((len(states), length))
+    for i, hidden_states in enumerate(states):
+        fused[i, : len(hidden_states)] = hidden_states
+        fused_mask[i, : len(hidden_states)] = 1
+    return fused, fused_mask
+
+
+def _generate_inputs(model, text_encoding, encoder_cache=None) -> Dict:
+    """Return the inputs to model.generate for an encoding of texts, with the
+    encoder outputs already fused if the texts are split into windows, or
+    taken from the encoder cache if one is given.
+    """
+    if encoder_cache is not None:
+        import torch  # pylint: disable=import-outside-toplevel
+
+        with torch.no_grad():
+            encoder_outputs, attention_mask = encode_cached(
+                model, text_encoding, encoder_cache
+            )
+        return {"encoder_outputs": encoder_outputs, "attention_mask": attention_mask}
+    if text_encoding["input_ids"].dim() < 3:
+        return {
+            "input_ids": text_encoding["input_ids"],
+            "attention_mask": text_encoding["attention_mask"],
+        }
+    import torch  # pylint: disable=import-outside-toplevel
+
+    with torch.no_grad():
+        encoder_outputs, attention_mask = encode_fused(
+            model, text_encoding["input_ids"], text_encoding["attention_mask"]
+        )
+    return {"encoder_outputs": encoder_outputs, "attention_mask": attention_mask}
+
+
+def generate(  # pylint: disable=too-many-arguments
+    model,
+    tokenizer,
+    text_encoding,
+    max_title_tokens,
+    encoder_cache=None,
+    decoding=None,
+    draft_model=None,
+):
+    """Generate title for single text.
+
+    Use `generate_batch` to get one title per text for several texts.
+    """
     if len(text_encoding["input_ids"]) == 0:
         return ""
+    if len(text_encoding["input_ids"]) > 1:
+        raise ValueError(
+            f"Expected encoding of a single text, got {len(text_encoding['input_ids'])}"
+            " texts. Use generate_batch to generate titles for multiple texts."
+        )
+    return generate_batch(
+        model,
+        tokenizer,
+        text_encoding,
+        max_title_tokens,
+        encoder_cache,
+        decoding,
+        draft_model,
+    )[0]
+
+
+def generate_batch(  # pylint: disable=too-many-arguments
+    model,
+    tokenizer,
+    text_encoding,
+    max_title_tokens,
+    encoder_cache=None,
+    decoding=None,
+    draft_model=None,
+):
+    """Generate titles for a batch of texts in one forward pass.
+
+    Returns a list with one title per row in `text_encoding["input_ids"]`.
+    The texts can be encoded by `encode`, or split into windows by
+    `encode_windows`. With an `encoder_cache`, the encoder only runs on texts
+    whose encoder outputs are not cached, see `encode_cached`. Titles are
+    decoded as set by `decoding`, a `utils.decoding.DecodingConfig`, by
+    default with a beam search of 2 beams. The "speculative" strategy needs a
+    `draft_model`, see `generate_speculative`.
+    """
+    if len(text_encoding["input_ids"]) == 0:
+        return []
+    decoding = decoding or DecodingConfig()
+    if decoding.strategy == "speculative":
+        return generate_speculative(
+            model, tokenizer, text_encoding, max_title_tokens, decoding, draft_model
+        )
 
     generated_ids = model.generate(
-        input_ids=text_encoding["input_ids"],
-        attention_mask=text_encoding["attention_mask"],
+        **_generate_inputs(model, text_encoding, encoder_cache),
         max_length=max_title_tokens,
-        num_beams=2,
-        repetition_penalty=2.5,
-        length_penalty=1.0,
-        early_stopping=True,
+        **decoding.generate_kwargs(),
+    )
+    return tokenizer.batch_decode(
+        generated_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True
     )
-    preds = [
-        tokenizer.decode(
-            gen_id, skip_special_tokens=True, clean_up_tokenization_spaces=True
+
+
+def generate_speculative(  # pylint: disable=too-many-arguments
+    model, tokenizer, text_encoding, max_title_tokens, decoding, draft_model
+) -> List[str]:
+    """Generate titles with a greedy search, where `draft_model` drafts a few
+    tokens at a time and `model` verifies them all in one forward pass.
+
+    The titles are the same as those of a greedy search with `model` alone.
+    The draft model must share the model's vocabulary, and is typically
+    smaller or quantized. Texts are decoded one at a time, as transformers'
+    assisted generation only takes one text, and the encoder cache is not
+    used, since the draft model encodes the input ids itself.
+    """
+    if draft_model is None:
+        raise ValueError("Speculative decoding needs a draft model")
+    if text_encoding["input_ids"].dim() == 3:
+        raise ValueError(
+            "Speculative decoding of texts split into windows is not supported"
         )
-        for gen_id in generated_ids
-    ]
-    return "".join(preds)
+    titles = []
+    for input_ids, attention_mask in zip(
+        text_encoding["input_ids"], text_encoding["attention_mask"]
+    ):
+        input_ids = input_ids[attention_mask.bool()].unsqueeze(0)
+        generated_ids = model.generate(
+            input_ids=input_ids,
+            attention_mask=input_ids.new_ones(input_ids.shape),
+            max_length=max_title_tokens,
+            assistant_model=draft_model,
+            **decoding.generate_kwargs(),
+        )
+        titles.append(
+            tokenizer.decode(
+                generated_ids[0],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True,
+            )
+        )
+    return titles
+
+
+def generate_stream(
+    model, tokenizer, text_encoding, max_title_tokens, encoder_cache=None
+) -> Generator[str, None, None]:
+    """Generate a title for a single text with greedy search, and yield the
+    title's text piece by piece as its tokens are decoded.
+
+    The title is decoded as set by `STREAM_DECODING`, so it can differ from
+    the titles of `generate`. The generation stops when the generator is
+    closed, for example when a client stops reading the stream.
+    """
+    if len(text_encoding["input_ids"]) != 1:
+        raise ValueError(
+            f"Expected encoding of a single text, got {len(text_encoding['input_ids'])}"
+        )
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import (
+        StoppingCriteria,
+        StoppingCriteriaList,
+        TextIteratorStreamer,
+    )
+
+    streamer = TextIteratorStreamer(
+        tokenizer,
+        skip_prompt=True,  # The decoder start token
+        skip_special_tokens=True,
+        clean_up_tokenization_spaces=True,
+    )
+    stop = threading.Event()
+    errors = []
+
+    class StopWhenClosed(StoppingCriteria):  # pylint: disable=too-few-public-methods
+        """Stop generating once the stream has been closed."""
+
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return stop.is_set()
+
+    def run_generate():
+        try:
+            with torch.no_grad():
+                model.generate(
+                    **_generate_inputs(model, text_encoding, encoder_cache),
+                    max_length=max_title_tokens,
+                    **STREAM_DECODING.generate_kwargs(),
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopWhenClosed()]),
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=run_generate, name="generate-stream")
+    thread.start()
+    try:
+        yield from (text for text in streamer if text)
+    finally:
+        stop.set()
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import torch
+
+MAX_MB = 256
+
+
+class EncoderCache:
+    """Bounded LRU cache of encoder outputs, keyed by a hash of the input ids.
+
+    An entry holds the encoder's hidden states at the unpadded positions of one
+    text, so a text is a hit however it was padded or batched. The least
+    recently used entries are dropped when the entries' tensors take more than
+    `max_bytes`. The cache is meant for a single model, since entries don't
+    record which model made them.
+
+    Parameters
+    ----------
+    max_bytes
+        largest number of bytes of hidden states to keep
+    """
+
+    def __init__(self, max_bytes: int = MAX_MB * 2**20) -> None:
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self._entries: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["EncoderCache"]:
+        """Create a cache with a budget of PREDICT_ENCODER_CACHE_MB megabytes,
+        or return None if caching is turned off with PREDICT_ENCODER_CACHE_MB=0.
+        """
+        max_mb = float(os.environ.get("PREDICT_ENCODER_CACHE_MB", MAX_MB))
+        if max_mb == 0:
+            return None
+        return cls(max_bytes=int(max_mb * 2**20))
+
+    @staticmethod
+    def key(input_ids, attention_mask) -> str:
+        """Return the cache key of a text's input ids, ignoring padding.
+
+        The lengths of the windows of a text that is split into windows are
+        hashed too, so a text split into several windows doesn't share a key
+        with the same ids encoded whole.
+        """
+        mask = attention_mask.bool()
+        lengths = mask.sum(dim=-1).reshape(-1)
+        lengths = lengths[lengths > 0]
+        digest = hashlib.sha256()
+        digest.update(f"{len(lengths)}:".encode("utf-8"))
+        digest.update(lengths.cpu().numpy().tobytes())
+        digest.update(input_ids[mask].cpu().numpy().tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """Return the cached hidden states for a key, or None if there are none."""
+        with self._lock:
+            hidden_states = self._entries.get(key)
+            if hidden_states is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hidden_states
+
+    def set(self, key: str, hidden_states: torch.Tensor) -> None:
+        """Cache hidden states, unless they alone are larger than the budget."""
+        size = hidden_states.element_size() * hidden_states.nelement()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                old = self._entries.pop(key)
+                self.num_bytes -= old.element_size() * old.nelement()
+            self._entries[key] = hidden_states
+            self.num_bytes += size
+            while self.num_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.num_bytes -= evicted.element_size() * evicted.nelement()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit and miss counts, and the number and size of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.num_bytes,
+            }
@@ -0,0 +1,87 @@
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple, cast
+
+from motion_title_generator.data.motions_data_module import MotionsDataModule
+from motion_title_generator.data.t5_encodings_dataset import MT5EncodingsDataset
+from utils.log import logger
+
+NUM_EXAMPLES = 200
+NUM_LATENCY_EXAMPLES = 50
+BATCH_SIZE = 8
+
+
+def add_evaluation_args(parser: argparse.ArgumentParser):
+    """Add arguments of the test examples to evaluate on to parser."""
+    parser.add_argument(
+        "--num_examples",
+        type=int,
+        default=NUM_EXAMPLES,
+        help="Number of test examples to compare titles on.",
+    )
+    parser.add_argument(
+        "--num_latency_examples",
+        type=int,
+        default=NUM_LATENCY_EXAMPLES,
+        help="Number of test examples to time one at a time.",
+    )
+    parser.add_argument("--batch_size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--data_fraction",
+        type=float,
+        default=1.0,
+        help="Share of the data to split, must match the training run's value "
+        "for the test split to be held out.",
+    )
+    parser.add_argument("--output_json", default=None, help="Also save results here")
+    return parser
+
+
+def load_test_examples(
+    num_examples: int, data_fraction: float
+) -> Tuple[List[str], List[str]]:
+    """Return the texts and real titles of the first examples in the test split
+    of MotionsDataModule.
+    """
+    data_module = MotionsDataModule({"data_fraction": data_fraction})
+    data_module.setup("fit")
+    # Without a token cache, the splits keep their texts and titles
+    data_test = cast(MT5EncodingsDataset, data_module.data_test)
+    end = min(num_examples, len(data_test))
+    texts = list(data_test.data)[:end]
+    references = list(data_test.targets)[:end]
+    logger.info("Evaluating on %s test examples ...", len(texts))
+    return texts, references
+
+
+def time_titles(predict: Callable[[str], str], texts: List[str]) -> Dict:
+    """Return the mean and median milliseconds of titling the texts one at a
+    time, after a warm up.
+    """
+    seconds = []
+    predict(texts[0])  # Warm up
+    for text in texts:
+        start = time.perf_counter()
+        predict(text)
+        seconds.append(time.perf_counter() - start)
+    return {
+        "mean_ms_per_title": 1000 * statistics.mean(seconds),
+        "median_ms_per_title": 1000 * statistics.median(seconds),
+    }
+
+
+def format_latency(result: Dict) -> str:
+    """Return the latency numbers of `time_titles` in a result as text."""
+    return (
+        f"mean {result['mean_ms_per_title']:8.1f} ms, "
+        f"median {result['median_ms_per_title']:8.1f} ms per title"
+    )
+
+
+def save_results(results, output_json: Optional[str]) -> None:
+    """Save results as JSON to `output_json`, if given."""
+    if output_json:
+        with open(output_json, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2, ensure_ascii=False)
@@ -1,6 +1,25 @@
 import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
 
 logging.getLogger("torch").setLevel(logging.WARNING)
 
 logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def log_duration(stage: str) -> Iterator[None]:
+    """Log the number of seconds spent in a with block."""
+    start = time.perf_counter()
+    yield
+    logger.info("%s took %.2f seconds.", stage, time.perf_counter() - start)
+
+
+@contextmanager
+def add_duration(durations: Dict[str, float], stage: str) -> Iterator[None]:
+    """Add the number of seconds spent in a with block to a stage's total."""
+    start = time.perf_counter()
+    yield
+    durations[stage] = durations.get(stage, 0.0) + time.perf_counter() - start
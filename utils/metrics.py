@@ -0,0 +1,48 @@
+from typing import List, Sequence
+
+
+def _lcs_length(first: Sequence[str], second: Sequence[str]) -> int:
+    """Return the length of the longest common subsequence of two sequences."""
+    previous = [0] * (len(second) + 1)
+    for item in first:
+        current = [0]
+        for j, other in enumerate(second):
+            if item == other:
+                current.append(previous[j] + 1)
+            else:
+                current.append(max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def rouge_l(prediction: str, reference: str) -> float:
+    """Return the ROUGE-L F1 score of a prediction, on lowercased words."""
+    prediction_words = prediction.lower().split()
+    reference_words = reference.lower().split()
+    if not prediction_words or not reference_words:
+        return float(prediction_words == reference_words)
+    lcs = _lcs_length(prediction_words, reference_words)
+    if lcs == 0:
+        return 0.0
+    precision = lcs / len(prediction_words)
+    recall = lcs / len(reference_words)
+    return 2 * precision * recall / (precision + recall)
+
+
+def mean_rouge_l(predictions: List[str], references: List[str]) -> float:
+    """Return the mean ROUGE-L F1 score of predictions against references."""
+    if len(predictions) != len(references):
+        raise ValueError("Predictions and references must be of equal length")
+    if not predictions:
+        return 0.0
+    scores = [rouge_l(p, r) for p, r in zip(predictions, references)]
+    return sum(scores) / len(scores)
+
+
+def exact_match_rate(predictions: List[str], references: List[str]) -> float:
+    """Return the share of predictions that are identical to their reference."""
+    if len(predictions) != len(references):
+        raise ValueError("Predictions and references must be of equal length")
+    if not predictions:
+        return 0.0
+    return sum(p == r for p, r in zip(predictions, references)) / len(predictions)
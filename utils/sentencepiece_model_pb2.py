@@ -0,0 +1,71 @@
+"""Protocol buffer messages of SentencePiece models.
+
+The module that comes with sentencepiece was generated by an older protoc and
+can't be imported with protobuf 4, so the messages are built here from the same
+file descriptor. They are kept in a descriptor pool of their own, so that they
+don't clash with other copies of sentencepiece_model.proto.
+"""
+
+from google.protobuf import descriptor_pool
+from google.protobuf.internal import builder
+
+_SERIALIZED_FILE = (
+    b'\n\x19sentencepiece_model.proto\x12\rsentencepiece"\x80\x0c\n\x0bTrainerSpec'
+    b"\x12\r\n\x05input\x18\x01 \x03(\t\x12\x14\n\x0cinput_format\x18\x07 \x01(\t"
+    b"\x12\x14\n\x0cmodel_prefix\x18\x02 \x01(\t\x12A\n\nmodel_type\x18\x03 \x01("
+    b"\x0e2$.sentencepiece.TrainerSpec.ModelType:\x07UNIGRAM\x12\x18\n\nvocab_size"
+    b"\x18\x04 \x01(\x05:\x048000\x12\x17\n\x0faccept_language\x18\x05 \x03(\t\x12 "
+    b"\n\x15self_test_sample_size\x18\x06 \x01(\x05:\x010\x12*\n\x1benable_differen"
+    b"tial_privacy\x182 \x01(\x08:\x05false\x12+\n differential_privacy_noise_level"
+    b"\x183 \x01(\x02:\x010\x122\n'differential_privacy_clipping_threshold\x184 "
+    b'\x01(\x04:\x010\x12"\n\x12character_coverage\x18\n \x01(\x02:\x060.9995\x12'
+    b"\x1e\n\x13input_sentence_size\x18\x0b \x01(\x04:\x010\x12$\n\x16shuffle_input"
+    b"_sentence\x18\x13 \x01(\x08:\x04true\x12 \n\x14mining_sentence_size\x18\x0c "
+    b'\x01(\x05B\x02\x18\x01\x12"\n\x16training_sentence_size\x18\r \x01(\x05B\x02'
+    b"\x18\x01\x12(\n\x17seed_sentencepiece_size\x18\x0e \x01(\x05:\x071000000\x12"
+    b"\x1e\n\x10shrinking_factor\x18\x0f \x01(\x02:\x040.75\x12!\n\x13max_sentence_"
+    b"length\x18\x12 \x01(\x05:\x044192\x12\x17\n\x0bnum_threads\x18\x10 \x01(\x05:"
+    b"\x0216\x12\x1d\n\x12num_sub_iterations\x18\x11 \x01(\x05:\x012\x12$\n\x18max_"
+    b"sentencepiece_length\x18\x14 \x01(\x05:\x0216\x12%\n\x17split_by_unicode_scri"
+    b"pt\x18\x15 \x01(\x08:\x04true\x12\x1d\n\x0fsplit_by_number\x18\x17 \x01(\x08:"
+    b"\x04true\x12!\n\x13split_by_whitespace\x18\x16 \x01(\x08:\x04true\x12)\n\x1at"
+    b"reat_whitespace_as_suffix\x18\x18 \x01(\x08:\x05false\x12+\n\x1callow_whitesp"
+    b"ace_only_pieces\x18\x1a \x01(\x08:\x05false\x12\x1b\n\x0csplit_digits\x18\x19"
+    b" \x01(\x08:\x05false\x12#\n\x19pretokenization_delimiter\x185 \x01(\t:\x00"
+    b"\x12\x17\n\x0fcontrol_symbols\x18\x1e \x03(\t\x12\x1c\n\x14user_defined_symbo"
+    b"ls\x18\x1f \x03(\t\x12\x16\n\x0erequired_chars\x18$ \x01(\t\x12\x1c\n\rbyte_f"
+    b"allback\x18# \x01(\x08:\x05false\x12+\n\x1dvocabulary_output_piece_score\x18 "
+    b" \x01(\x08:\x04true\x12\x1e\n\x10hard_vocab_limit\x18! \x01(\x08:\x04true\x12"
+    b'\x1c\n\ruse_all_vocab\x18" \x01(\x08:\x05false\x12\x11\n\x06unk_id\x18( \x01('
+    b"\x05:\x010\x12\x11\n\x06bos_id\x18) \x01(\x05:\x011\x12\x11\n\x06eos_id\x18* "
+    b"\x01(\x05:\x012\x12\x12\n\x06pad_id\x18+ \x01(\x05:\x02-1\x12\x18\n\tunk_piec"
+    b"e\x18- \x01(\t:\x05<unk>\x12\x16\n\tbos_piece\x18. \x01(\t:\x03<s>\x12\x17\n"
+    b"\teos_piece\x18/ \x01(\t:\x04</s>\x12\x18\n\tpad_piece\x180 \x01(\t:\x05<pad>"
+    b"\x12\x1a\n\x0bunk_surface\x18, \x01(\t:\x05 \xe2\x81\x87 \x12+\n\x1ctrain_ext"
+    b'remely_large_corpus\x181 \x01(\x08:\x05false"5\n\tModelType\x12\x0b\n\x07UNIG'
+    b"RAM\x10\x01\x12\x07\n\x03BPE\x10\x02\x12\x08\n\x04WORD\x10\x03\x12\x08\n\x04C"
+    b'HAR\x10\x04*\t\x08\xc8\x01\x10\x80\x80\x80\x80\x02"\xd1\x01\n\x0eNormalizerSp'
+    b"ec\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x1c\n\x14precompiled_charsmap\x18"
+    b"\x02 \x01(\x0c\x12\x1e\n\x10add_dummy_prefix\x18\x03 \x01(\x08:\x04true\x12&"
+    b"\n\x18remove_extra_whitespaces\x18\x04 \x01(\x08:\x04true\x12 \n\x12escape_wh"
+    b"itespaces\x18\x05 \x01(\x08:\x04true\x12\x1e\n\x16normalization_rule_tsv\x18"
+    b'\x06 \x01(\t*\t\x08\xc8\x01\x10\x80\x80\x80\x80\x02"y\n\x0cSelfTestData\x123'
+    b'\n\x07samples\x18\x01 \x03(\x0b2".sentencepiece.SelfTestData.Sample\x1a)\n'
+    b"\x06Sample\x12\r\n\x05input\x18\x01 \x01(\t\x12\x10\n\x08expected\x18\x02 "
+    b'\x01(\t*\t\x08\xc8\x01\x10\x80\x80\x80\x80\x02"\xfe\x03\n\nModelProto\x127\n'
+    b"\x06pieces\x18\x01 \x03(\x0b2'.sentencepiece.ModelProto.SentencePiece\x120\n"
+    b"\x0ctrainer_spec\x18\x02 \x01(\x0b2\x1a.sentencepiece.TrainerSpec\x126\n\x0fn"
+    b"ormalizer_spec\x18\x03 \x01(\x0b2\x1d.sentencepiece.NormalizerSpec\x123\n\x0e"
+    b"self_test_data\x18\x04 \x01(\x0b2\x1b.sentencepiece.SelfTestData\x128\n\x11de"
+    b"normalizer_spec\x18\x05 \x01(\x0b2\x1d.sentencepiece.NormalizerSpec\x1a\xd2"
+    b"\x01\n\rSentencePiece\x12\r\n\x05piece\x18\x01 \x01(\t\x12\r\n\x05score\x18"
+    b"\x02 \x01(\x02\x12B\n\x04type\x18\x03 \x01(\x0e2,.sentencepiece.ModelProto.Se"
+    b'ntencePiece.Type:\x06NORMAL"T\n\x04Type\x12\n\n\x06NORMAL\x10\x01\x12\x0b\n'
+    b"\x07UNKNOWN\x10\x02\x12\x0b\n\x07CONTROL\x10\x03\x12\x10\n\x0cUSER_DEFINED"
+    b"\x10\x04\x12\x08\n\x04BYTE\x10\x06\x12\n\n\x06UNUSED\x10\x05*\t\x08\xc8\x01"
+    b"\x10\x80\x80\x80\x80\x02*\t\x08\xc8\x01\x10\x80\x80\x80\x80\x02B\x02H\x03"
+)
+
+DESCRIPTOR = descriptor_pool.DescriptorPool().AddSerializedFile(_SERIALIZED_FILE)
+builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, __name__, globals())
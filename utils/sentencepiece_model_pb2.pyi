@@ -0,0 +1,32 @@
+from typing import Any
+
+from google.protobuf import descriptor, message
+from google.protobuf.internal import containers
+
+DESCRIPTOR: descriptor.FileDescriptor
+
+class TrainerSpec(message.Message):
+    def __getattr__(self, name: str) -> Any: ...
+
+class NormalizerSpec(message.Message):
+    def __getattr__(self, name: str) -> Any: ...
+
+class SelfTestData(message.Message):
+    def __getattr__(self, name: str) -> Any: ...
+
+class ModelProto(message.Message):
+    class SentencePiece(message.Message):
+        NORMAL: int
+        UNKNOWN: int
+        CONTROL: int
+        USER_DEFINED: int
+        BYTE: int
+        UNUSED: int
+        piece: str
+        score: float
+        type: int
+    pieces: containers.RepeatedCompositeFieldContainer[ModelProto.SentencePiece]
+    trainer_spec: TrainerSpec
+    normalizer_spec: NormalizerSpec
+    self_test_data: SelfTestData
+    denormalizer_spec: NormalizerSpec
@@ -0,0 +1,112 @@
+# pylint: disable=missing-function-docstring
+import argparse
+
+import pytest
+from transformers import MT5ForConditionalGeneration, MT5Tokenizer
+
+from motion_title_generator.motion_title_generator import quantize_dynamic_int8
+from utils.decoding import DecodingConfig
+from utils.encode_decode import encode, encode_windows, generate_batch
+
+
+@pytest.fixture(scope="module", name="model")
+def setup_model():
+    yield MT5ForConditionalGeneration.from_pretrained("google/mt5-small").eval()
+
+
+@pytest.fixture(scope="module", name="tokenizer")
+def setup_tokenizer():
+    yield MT5Tokenizer.from_pretrained("google/mt5-small")
+
+
+def test_generate_kwargs():
+    assert DecodingConfig().generate_kwargs() == {
+        "num_beams": 2,
+        "repetition_penalty": 2.5,
+        "length_penalty": 1.0,
+        "early_stopping": True,
+    }
+    greedy = DecodingConfig("greedy", num_beams=4).generate_kwargs()
+    assert greedy["num_beams"] == 1
+    assert not greedy["do_sample"]
+
+
+def test_from_dict_keeps_defaults_and_rejects_unknown_settings():
+    defaults = DecodingConfig("beam", num_beams=3)
+    decoding = DecodingConfig.from_dict({"repetition_penalty": 1.0}, defaults)
+    assert decoding.num_beams == 3
+    assert decoding.repetition_penalty == 1.0
+    assert DecodingConfig.from_dict(decoding.to_dict()) == decoding
+
+    with pytest.raises(ValueError, match="Unknown decoding settings"):
+        DecodingConfig.from_dict({"temperature": 0.7})
+    with pytest.raises(ValueError, match="Unknown decoding strategy"):
+        DecodingConfig.from_dict({"strategy": "sampling"})
+    with pytest.raises(ValueError, match="num_beams"):
+        DecodingConfig.from_dict({"num_beams": 0})
+    with pytest.raises(ValueError, match="repetition_penalty"):
+        DecodingConfig.from_dict({"repetition_penalty": float("nan")})
+    with pytest.raises(ValueError, match="length_penalty"):
+        DecodingConfig.from_dict({"length_penalty": float("inf")})
+    for settings in [
+        {"num_beams": 2.7},
+        {"num_beams": "2"},
+        {"num_beams": True},
+        {"early_stopping": "false"},
+        {"early_stopping": 0},
+        {"repetition_penalty": "2.5"},
+        {"length_penalty": None},
+    ]:
+        with pytest.raises(ValueError, match=next(iter(settings))):
+            DecodingConfig.from_dict(settings)
+
+
+def test_from_args_and_env(monkeypatch):
+    parser = DecodingConfig.add_to_argparse(argparse.ArgumentParser())
+    args = vars(parser.parse_args(["--decoding_strategy=greedy"]))
+    assert DecodingConfig.from_args(args) == DecodingConfig("greedy")
+    assert DecodingConfig.from_args() == DecodingConfig()
+
+    monkeypatch.setenv("PREDICT_DECODING_STRATEGY", "beam")
+    monkeypatch.setenv("PREDICT_NUM_BEAMS", "4")
+    assert DecodingConfig.from_env() == DecodingConfig("beam", num_beams=4)
+
+
+def test_speculative_titles_match_greedy(model, tokenizer):
+    draft_model = quantize_dynamic_int8(
+        MT5ForConditionalGeneration.from_pretrained("google/mt5-small").eval()
+    )
+    for text in ["This is a sample text.", "This is the first sentence. And more."]:
+        # Unpadded, since padding changes the random model's titles
+        encoding = encode(text, tokenizer, 32, padding=False)
+        greedy = generate_batch(
+            model,
+            tokenizer,
+            encoding,
+            10,
+            decoding=DecodingConfig("greedy", repetition_penalty=1.0),
+        )
+        speculative = generate_batch(
+            model,
+            tokenizer,
+            encoding,
+            10,
+            decoding=DecodingConfig("speculative", repetition_penalty=1.0),
+            draft_model=draft_model,
+        )
+        assert speculative == greedy
+
+
+def test_speculative_needs_a_draft_model_and_whole_texts(model, tokenizer):
+    with pytest.raises(ValueError, match="repetition penalty"):
+        DecodingConfig("speculative")
+    decoding = DecodingConfig("speculative", repetition_penalty=1.0)
+    with pytest.raises(ValueError, match="draft model"):
+        generate_batch(
+            model, tokenizer, encode("A text.", tokenizer, 8), 10, decoding=decoding
+        )
+    windows = encode_windows("A text.", tokenizer, window_tokens=8, overlap=2)
+    with pytest.raises(ValueError, match="windows"):
+        generate_batch(
+            model, tokenizer, windows, 10, decoding=decoding, draft_model=model
+        )
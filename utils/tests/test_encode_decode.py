@@ -2,7 +2,13 @@ import pytest
 import torch
 from transformers import MT5ForConditionalGeneration, MT5Tokenizer
 
-from utils.encode_decode import encode, generate
+from utils.encode_decode import (
+    encode,
+    encode_windows,
+    generate,
+    generate_batch,
+    generate_stream,
+)
 
 
 @pytest.fixture(scope="module", name="model")
@@ -52,3 +58,154 @@ def test_generate_without_input(model, tokenizer):
     }
     title = generate(model, tokenizer, text_encoding, max_title_tokens=10)
     assert title == ""
+
+
+def test_generate_with_multiple_inputs_raises(model, tokenizer):
+    """Test that generate refuses to merge titles for several texts."""
+    text_encoding = {
+        "input_ids": torch.tensor([[1, 2, 3], [4, 5, 6]]),
+        "attention_mask": torch.tensor([[1, 1, 1], [1, 1, 1]]),
+    }
+    with pytest.raises(ValueError):
+        generate(model, tokenizer, text_encoding, max_title_tokens=10)
+
+
+def test_generate_batch(model, tokenizer):
+    """Test that generate_batch returns one title per text, matching generate."""
+    texts = ["This is a sample text.", "This is the first sentence."]
+    titles = generate_batch(
+        model, tokenizer, encode(texts, tokenizer, 15), max_title_tokens=10
+    )
+    assert isinstance(titles, list)
+    assert len(titles) == len(texts)
+    for text, title in zip(texts, titles):
+        single = generate(
+            model, tokenizer, encode(text, tokenizer, 15), max_title_tokens=10
+        )
+        assert title == single
+
+
+def test_generate_batch_without_input(model, tokenizer):
+    """Test that generate_batch returns an empty list when input is empty."""
+    text_encoding = {
+        "input_ids": torch.empty(0, dtype=torch.long),
+        "attention_mask": torch.empty(0, dtype=torch.long),
+    }
+    assert not generate_batch(model, tokenizer, text_encoding, max_title_tokens=10)
+
+
+def test_encode_longest_padding(tokenizer):
+    """Test that a batch is only padded to its longest text."""
+    texts = ["This is a sample text.", "This is the first sentence. And a second."]
+    encoding = encode(texts, tokenizer, 512, padding="longest")
+    longest = max(len(tokenizer(text)["input_ids"]) for text in texts)
+    assert encoding["input_ids"].shape == (2, longest)
+
+    encoding = encode(texts, tokenizer, 512, padding="longest", pad_to_multiple_of=8)
+    assert encoding["input_ids"].shape[-1] % 8 == 0
+
+
+def test_generate_stream_matches_greedy_search(model, tokenizer):
+    """Test that the streamed pieces make up the greedy search's title."""
+    encoding = encode("This is the first sentence.", tokenizer, 15)
+    pieces = list(generate_stream(model, tokenizer, encoding, max_title_tokens=10))
+    assert len(pieces) > 1
+    with torch.no_grad():
+        ids = model.generate(
+            **encoding, max_length=10, num_beams=1, repetition_penalty=2.5
+        )
+    title = tokenizer.decode(
+        ids[0], skip_special_tokens=True, clean_up_tokenization_spaces=True
+    )
+    assert "".join(pieces).strip() == title.strip()
+
+
+def test_generate_stream_raises_errors_of_generation(tokenizer):
+    """Test that an error in the generation thread reaches the caller."""
+
+    class BrokenModel:
+        """Model that fails to generate."""
+
+        def generate(self, **kwargs):  # pylint: disable=missing-function-docstring
+            raise RuntimeError("out of memory")
+
+    encoding = encode("This is a sample text.", tokenizer, 15)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        list(generate_stream(BrokenModel(), tokenizer, encoding, max_title_tokens=10))
+
+
+def test_generate_stream_stops_when_closed(tokenizer):
+    """Test that closing the stream stops the generation thread."""
+
+    class EndlessModel:
+        """Model that generates the same word until it is stopped."""
+
+        steps = 0
+
+        def generate(self, streamer, stopping_criteria, **kwargs):
+            # pylint: disable=missing-function-docstring,unused-argument
+            ids = torch.tensor([[tokenizer.pad_token_id]])
+            streamer.put(ids)  # The decoder start token
+            word = tokenizer(" word", add_special_tokens=False)["input_ids"]
+            while self.steps < 10000 and not stopping_criteria(ids, None):
+                self.steps += 1
+                streamer.put(torch.tensor(word))
+            streamer.end()
+
+    model = EndlessModel()
+    encoding = encode("This is a sample text.", tokenizer, 15)
+    pieces = generate_stream(model, tokenizer, encoding, max_title_tokens=10)
+    next(pieces)
+    pieces.close()
+    assert model.steps < 10000
+
+
+def test_encode_windows_overlap(tokenizer):
+    """Test that a long text is split into overlapping windows that end with EOS."""
+    text = " ".join(f"word{i}" for i in range(100))
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    encoding = encode_windows(text, tokenizer, window_tokens=32, overlap=8)
+
+    num_windows = encoding["input_ids"].shape[1]
+    assert encoding["input_ids"].shape == (1, num_windows, 32)
+    windows = [
+        window[mask.bool()].tolist()
+        for window, mask in zip(encoding["input_ids"][0], encoding["attention_mask"][0])
+    ]
+    assert all(window[-1] == tokenizer.eos_token_id for window in windows)
+    assert windows[0][:-1] == ids[:31]
+    assert windows[1][:8] == ids[23:31]
+    assert windows[-1][-2] == ids[-1]
+
+
+def test_encode_windows_pads_texts_with_empty_windows(tokenizer):
+    """Test that texts with fewer windows are padded with empty windows."""
+    texts = ["Short text.", " ".join(f"word{i}" for i in range(100))]
+    encoding = encode_windows(texts, tokenizer, window_tokens=32, overlap=8)
+    assert encoding["attention_mask"][0, 0].sum() == len(tokenizer(texts[0]).input_ids)
+    assert not encoding["attention_mask"][0, 1:].any()
+    assert encoding["attention_mask"][1].all(dim=1).sum() >= 2
+
+    capped = encode_windows(texts, tokenizer, 32, overlap=8, max_windows=2)
+    assert capped["input_ids"].shape == (2, 2, 32)
+
+
+def test_generate_batch_with_windows(model, tokenizer):
+    """Test that texts that fit in one window get the same titles as when they
+    are encoded whole, and that longer texts get a title too.
+    """
+    short_texts = ["This is a sample text.", "This is the first sentence."]
+    titles = generate_batch(
+        model,
+        tokenizer,
+        encode_windows(short_texts, tokenizer, window_tokens=15, overlap=4),
+        max_title_tokens=10,
+    )
+    assert titles == generate_batch(
+        model, tokenizer, encode(short_texts, tokenizer, 15), max_title_tokens=10
+    )
+
+    long_text = " ".join(short_texts * 5)
+    encoding = encode_windows(long_text, tokenizer, window_tokens=15, overlap=4)
+    assert encoding["input_ids"].shape[1] > 1
+    assert isinstance(generate(model, tokenizer, encoding, max_title_tokens=10), str)
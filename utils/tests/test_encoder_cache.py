@@ -0,0 +1,83 @@
+# pylint: disable=missing-function-docstring
+import pytest
+import torch
+from transformers import MT5ForConditionalGeneration, MT5Tokenizer
+
+from utils.encode_decode import encode, encode_windows, generate, generate_batch
+from utils.encoder_cache import EncoderCache
+
+
+@pytest.fixture(scope="module", name="model")
+def setup_model():
+    yield MT5ForConditionalGeneration.from_pretrained("google/mt5-small")
+
+
+@pytest.fixture(scope="module", name="tokenizer")
+def setup_tokenizer():
+    yield MT5Tokenizer.from_pretrained("google/mt5-small")
+
+
+def test_key_ignores_padding():
+    ids = torch.tensor([5, 6, 1, 0, 0])
+    mask = torch.tensor([1, 1, 1, 0, 0])
+    assert EncoderCache.key(ids, mask) == EncoderCache.key(ids[:3], mask[:3])
+    assert EncoderCache.key(ids, mask) != EncoderCache.key(ids[:2], mask[:2])
+
+
+def test_key_of_windows_differs_from_whole_text():
+    ids = torch.tensor([[5, 6, 1], [7, 8, 1]])
+    mask = torch.ones_like(ids)
+    assert EncoderCache.key(ids, mask) != EncoderCache.key(
+        ids.flatten(), mask.flatten()
+    )
+
+
+def test_least_recently_used_entries_are_evicted_over_budget():
+    entry = torch.zeros(4, 2)  # 32 bytes
+    cache = EncoderCache(max_bytes=80)
+    cache.set("a", entry)
+    cache.set("b", entry)
+    assert cache.get("a") is entry
+    cache.set("c", entry)
+    assert cache.get("b") is None
+    assert cache.get("a") is entry
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 2, "bytes": 64}
+
+    cache.set("too big", torch.zeros(100))
+    assert cache.get("too big") is None
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("PREDICT_ENCODER_CACHE_MB", "0")
+    assert EncoderCache.from_env() is None
+    monkeypatch.setenv("PREDICT_ENCODER_CACHE_MB", "2")
+    assert EncoderCache.from_env().max_bytes == 2 * 2**20
+
+
+def test_cached_titles_match_and_skip_the_encoder(model, tokenizer, monkeypatch):
+    texts = ["This is a sample text.", "This is the first sentence. And a second."]
+    cache = EncoderCache()
+    for text in texts:
+        encoding = encode(text, tokenizer, 32, padding="longest")
+        assert generate(model, tokenizer, encoding, 10, cache) == generate(
+            model, tokenizer, encoding, 10
+        )
+    assert cache.stats()["misses"] == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The encoder should not run")
+
+    monkeypatch.setattr(model, "get_encoder", lambda: fail)
+    encoding = encode(texts, tokenizer, 32, padding="longest")
+    assert len(generate_batch(model, tokenizer, encoding, 10, cache)) == 2
+    assert cache.stats()["hits"] == 2
+
+
+def test_cached_windows(model, tokenizer):
+    text = " ".join(f"word{i}" for i in range(40))
+    encoding = encode_windows(text, tokenizer, window_tokens=16, overlap=4)
+    cache = EncoderCache()
+    title = generate(model, tokenizer, encoding, 10)
+    assert generate(model, tokenizer, encoding, 10, cache) == title
+    assert generate(model, tokenizer, encoding, 10, cache) == title
+    assert cache.stats()["hits"] == 1
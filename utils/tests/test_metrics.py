@@ -0,0 +1,27 @@
+import pytest
+
+from utils.metrics import exact_match_rate, mean_rouge_l, rouge_l
+
+
+def test_rouge_l_of_identical_titles():
+    assert rouge_l("Motion om järnvägen", "motion om  järnvägen") == 1.0
+
+
+def test_rouge_l_of_partly_matching_titles():
+    # LCS "motion om" gives precision 2/3 and recall 2/5
+    assert rouge_l("Motion om järnvägen", "En motion om ny järnväg") == 0.5
+    assert rouge_l("Motion om järnvägen", "Skatt på bensin") == 0.0
+
+
+def test_rouge_l_of_empty_titles():
+    assert rouge_l("", "") == 1.0
+    assert rouge_l("", "Skatt på bensin") == 0.0
+
+
+def test_mean_scores():
+    predictions = ["Skatt på bensin", "Motion om järnvägen"]
+    references = ["Skatt på bensin", "Skatt på diesel"]
+    assert exact_match_rate(predictions, references) == 0.5
+    assert mean_rouge_l(predictions, references) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        exact_match_rate(predictions, references[:1])
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pandas as pd
 import pytest
 from utils.text import (
@@ -10,8 +12,11 @@ from utils.text import (
     set_empty_when_leading_date,
     delete_footer,
     prep_text,
+    clean_text,
 )
 
+TEST_DATA_PATH = Path(__file__).resolve().parents[2] / "data" / "test" / "test_data.csv"
+
 
 @pytest.fixture
 def sample_row():
@@ -100,3 +105,47 @@ def test_prep_text():
         ["breaks", "Trim whitespace", "a sample text."], name="text"
     )
     pd.testing.assert_series_equal(result, expected_result)
+
+
+def apply_row_functions(df, has_title_cols=True):
+    """Reference implementation of prep_text using the row functions."""
+    df["text"] = trim_linebreaks(df["text"])
+    df["text"] = trim_whitespace(df["text"])
+    if has_title_cols:
+        df["text"] = df.apply(trim_motion_text_by_subtitle, axis=1)
+        df["text"] = df.apply(trim_motion_text_by_leading_title, axis=1)
+    df["text"] = df.apply(trim_motion_text_by_proposed_decision, axis=1)
+    df["text"] = df.apply(trim_leadning_motivation, axis=1)
+    df["text"] = df.apply(set_empty_when_leading_date, axis=1)
+    df["text"] = df.apply(delete_footer, axis=1)
+    return df["text"]
+
+
+@pytest.mark.parametrize("has_title_cols", [True, False])
+def test_prep_text_matches_row_functions(has_title_cols):
+    motions = pd.read_csv(TEST_DATA_PATH)
+    df = pd.DataFrame(
+        {
+            "text": (
+                "Förslag till riksdagsbeslut Riksdagen bemyndigar regeringen. "
+                + motions["title"]
+                + "\n"
+                + motions["text"]
+                + " Stockholm den 1 oktober 2018 Namn Namnsson (S)"
+            ),
+            "subtitle": motions["text"].str[:20],
+            "title": motions["title"],
+        }
+    )
+    expected = apply_row_functions(df.copy(), has_title_cols)
+    result = prep_text(df.copy(), has_title_cols)
+    pd.testing.assert_series_equal(result, expected)
+
+
+def test_clean_text():
+    text = (
+        "Motivering  Förslag till riksdagsbeslut Riksdagen beslutar om\r\nett "
+        "förslag. Vi vill se fler tåg. Stockholm den 4 oktober 2022 Namn (S)"
+    )
+    assert clean_text(text) == "Vi vill se fler tåg."
+    assert clean_text("Stockholm den 4 oktober 2022 Namn (S)") == ""
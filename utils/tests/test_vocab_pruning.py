@@ -0,0 +1,70 @@
+# pylint: disable=missing-function-docstring
+import numpy as np
+import pytest
+import torch
+from transformers import MT5ForConditionalGeneration, MT5Tokenizer
+
+from motion_title_generator.motion_title_generator import MotionTitleGenerator
+from utils.vocab_pruning import count_token_ids, prune_vocabulary, select_token_ids
+
+TEXTS = [
+    "Persontrafik på järnvägen genom Sörmland bör återinföras.",
+    "Riksdagen ställer sig bakom det som anförs i motionen om kollektivtrafik.",
+    "Motion om järnvägen",
+]
+
+
+@pytest.fixture(name="model")
+def fixture_model():
+    return MT5ForConditionalGeneration.from_pretrained("google/mt5-small").eval()
+
+
+@pytest.fixture(name="tokenizer")
+def fixture_tokenizer():
+    return MT5Tokenizer.from_pretrained("google/mt5-small")
+
+
+def test_select_token_ids_keeps_used_special_and_extra_ids(tokenizer):
+    counts = count_token_ids(tokenizer, TEXTS)
+    token_ids = select_token_ids(tokenizer, counts, margin=0)
+
+    used = set(np.flatnonzero(counts).tolist())
+    special = {tokenizer.pad_token_id, tokenizer.eos_token_id, tokenizer.unk_token_id}
+    extra = set(tokenizer.convert_tokens_to_ids(tokenizer.additional_special_tokens))
+    assert token_ids == sorted(token_ids)
+    assert set(token_ids) == used | special | extra
+
+    with_margin = select_token_ids(tokenizer, counts, margin=5)
+    assert len(with_margin) == len(token_ids) + 5
+
+
+def test_pruned_model_gives_same_outputs(model, tokenizer, tmp_path):
+    original = MT5ForConditionalGeneration.from_pretrained("google/mt5-small").eval()
+    counts = count_token_ids(tokenizer, TEXTS)
+    token_ids = select_token_ids(tokenizer, counts, margin=0)
+    pruned_tokenizer = prune_vocabulary(model, tokenizer, TEXTS, tmp_path, margin=0)
+    assert len(pruned_tokenizer) == len(token_ids) < len(tokenizer)
+
+    old_to_new = {old: new for new, old in enumerate(token_ids)}
+    for text in TEXTS:
+        old_ids = tokenizer(text)["input_ids"]
+        assert pruned_tokenizer(text)["input_ids"] == [old_to_new[i] for i in old_ids]
+    assert (
+        pruned_tokenizer.convert_tokens_to_ids("<extra_id_0>")
+        == old_to_new[tokenizer.convert_tokens_to_ids("<extra_id_0>")]
+    )
+
+    old = tokenizer(TEXTS[0], return_tensors="pt")
+    new = pruned_tokenizer(TEXTS[0], return_tensors="pt")
+    decoder_input_ids = torch.tensor([[0]])
+    with torch.no_grad():
+        old_logits = original(**old, decoder_input_ids=decoder_input_ids).logits
+        new_logits = model(**new, decoder_input_ids=decoder_input_ids).logits
+    torch.testing.assert_close(new_logits, old_logits[:, :, token_ids])
+
+
+def test_pruned_artifact_is_loaded(model, tokenizer, tmp_path):
+    prune_vocabulary(model, tokenizer, TEXTS, tmp_path)
+    generator = MotionTitleGenerator(str(tmp_path), backend="pytorch")
+    assert generator.model.config.vocab_size == len(generator.tokenizer)
+    assert len(generator.predict_batch(TEXTS)) == 3
@@ -1,27 +1,72 @@
 import re
+from typing import Optional
+
+import pandas as pd
+
+WHITESPACE = re.compile(r"\s+")
+# .+?(?=(\. [A-ZÅÄÖ])) --> All up to first '.' followed by whitespace and
+# upper case letter. Not watertight by any means but a reasonable best effort.
+PROPOSED_DECISION = re.compile(
+    "|".join(
+        [
+            r"Förslag till riksdagsbeslut .+?\. (?=([A-ZÅÄÖ]))",
+            r"Riksdagen tillkännager för [A-Öa-ö]+ som sin mening .+?\. (?=([A-ZÅÄÖ]))",
+            r"Riksdagen bemyndigar .+?\. (?=([A-ZÅÄÖ]))",
+            r"Riksdagen beslutar om .+?\. (?=([A-ZÅÄÖ]))",
+            r"Härmed hemställs att riksdagen .+?\. (?=([A-ZÅÄÖ]))",
+            r"Med hänvisning till vad so(?:m|rn) anförts .+?\. (?=([A-ZÅÄÖ]))",
+            r"Riksdagen ställer sig bakom det som anförs .+?\. (?=([A-ZÅÄÖ]))",
+        ]
+    )
+)
+LEADING_MOTIVATION = re.compile(r"^Motivering [A-ZÅÄÖ\d]")
+LEADING_DATE = re.compile(r"^Stockholm den [\d]+ [a-z]+ \d{4}")
+FOOTER = re.compile(r"(?<=\.) Stockholm den [\d]+ [a-z]+ \d{4} .+")
 
 
-def trim_motion_text_by_subtitle(row):
-    """Remove leading text up to and including the subtitle"""
+def _trim_by_subtitle(text: str, subtitle: str) -> str:
     try:
-        split = row["text"].split(row["subtitle"], 1)
+        split = text.split(subtitle, 1)
         return split[-1].strip()
     except ValueError:
-        return row["text"]
+        return text
+
+
+def _trim_by_leading_title(text: str, title: str) -> str:
+    if text.startswith(title):
+        return text.split(title, 1)[-1].strip()
+    return text
+
+
+def _trim_by_proposed_decision(text: str) -> str:
+    return PROPOSED_DECISION.split(text)[-1].strip()
+
+
+def _trim_leading_motivation(text: str) -> str:
+    if LEADING_MOTIVATION.match(text):
+        return text.split("Motivering", 1)[-1].strip()
+    return text
+
+
+def _set_empty_when_leading_date(text: str) -> str:
+    if LEADING_DATE.match(text):
+        return ""
+    return text
+
+
+def trim_motion_text_by_subtitle(row):
+    """Remove leading text up to and including the subtitle"""
+    return _trim_by_subtitle(row["text"], row["subtitle"])
 
 
 def trim_motion_text_by_leading_title(row):
     """Remove leading text up to and including the title"""
-    if row["text"].startswith(row["title"]):
-        text = row["text"].split(row["title"], 1)[-1].strip()
-    else:
-        text = row["text"]
-    return text
+    return _trim_by_leading_title(row["text"], row["title"])
 
 
 def trim_whitespace(series):
     """Remove trailing and multiple whitespaces from a pandas series"""
-    return series.replace(r"\s+", " ", regex=True).str.strip()
+    return series.replace(WHITESPACE, " ", regex=True).str.strip()
 
 
 def trim_linebreaks(series):
@@ -33,49 +78,51 @@ def trim_linebreaks(series):
 
 def trim_motion_text_by_proposed_decision(row):
     """Remove leading text up to and including the proposed decision"""
-    # .+?(?=(\. [A-ZÅÄÖ])) --> All up to first '.' followed by whitespace and
-    # upper case letter. Not watertight by any means but a reasonable best effort.
-    patterns = [
-        r"Förslag till riksdagsbeslut .+?\. (?=([A-ZÅÄÖ]))",
-        r"Riksdagen tillkännager för [A-Öa-ö]+ som sin mening .+?\. (?=([A-ZÅÄÖ]))",
-        r"Riksdagen bemyndigar .+?\. (?=([A-ZÅÄÖ]))",
-        r"Riksdagen beslutar om .+?\. (?=([A-ZÅÄÖ]))",
-        r"Härmed hemställs att riksdagen .+?\. (?=([A-ZÅÄÖ]))",
-        r"Med hänvisning till vad so(?:m|rn) anförts .+?\. (?=([A-ZÅÄÖ]))",
-        r"Riksdagen ställer sig bakom det som anförs .+?\. (?=([A-ZÅÄÖ]))",
-    ]
-    split = re.split("|".join(patterns), row["text"])
-    return split[-1].strip()
+    return _trim_by_proposed_decision(row["text"])
 
 
 def trim_leadning_motivation(row):
     """Remove leading text up to and including the motivation header"""
-    if re.match(r"^Motivering [A-ZÅÄÖ\d]", row["text"]):
-        row["text"] = row["text"].split("Motivering", 1)[-1].strip()
-    return row["text"]
+    return _trim_leading_motivation(row["text"])
 
 
 def set_empty_when_leading_date(row):
     """Set string to empty if only place and date signature is left"""
-    if re.match(r"^Stockholm den [\d]+ [a-z]+ \d{4}", row["text"]):
-        row["text"] = ""
-    return row["text"]
+    return _set_empty_when_leading_date(row["text"])
 
 
 def delete_footer(row):
     """Remove footer"""
-    return re.sub(r"(?<=\.) Stockholm den [\d]+ [a-z]+ \d{4} .+", "", row["text"])
+    return FOOTER.sub("", row["text"])
+
+
+def clean_text(
+    text: str, subtitle: Optional[str] = None, title: Optional[str] = None
+) -> str:
+    """Preprocess a single motion text.
+
+    Does the same as `prep_text` in one pass over the text. The text is
+    trimmed by the subtitle and the leading title if they are given.
+    """
+    # Same as replacing \s+ with a space and stripping, since both split on
+    # the characters for which str.isspace() is true
+    text = " ".join(text.split())
+    if subtitle is not None:
+        text = _trim_by_subtitle(text, subtitle)
+    if title is not None:
+        text = _trim_by_leading_title(text, title)
+    text = _trim_by_proposed_decision(text)
+    text = _trim_leading_motivation(text)
+    text = _set_empty_when_leading_date(text)
+    return FOOTER.sub("", text)
 
 
 def prep_text(df, has_title_cols=True):
     """Pipeline to preproces text column."""
-    df["text"] = trim_linebreaks(df["text"])
-    df["text"] = trim_whitespace(df["text"])
     if has_title_cols:
-        df["text"] = df.apply(trim_motion_text_by_subtitle, axis=1)
-        df["text"] = df.apply(trim_motion_text_by_leading_title, axis=1)
-    df["text"] = df.apply(trim_motion_text_by_proposed_decision, axis=1)
-    df["text"] = df.apply(trim_leadning_motivation, axis=1)
-    df["text"] = df.apply(set_empty_when_leading_date, axis=1)
-    df["text"] = df.apply(delete_footer, axis=1)
+        rows = zip(df["text"], df["subtitle"], df["title"])
+        texts = [clean_text(text, subtitle, title) for text, subtitle, title in rows]
+    else:
+        texts = [clean_text(text) for text in df["text"]]
+    df["text"] = pd.Series(texts, index=df.index, dtype=object)
     return df["text"]
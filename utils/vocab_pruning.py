@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+import torch
+
+from utils import sentencepiece_model_pb2
+from utils.log import logger
+
+TOKENIZE_CHUNK_SIZE = 1000
+# Number of the most likely SentencePiece pieces to keep although unused, so
+# that words missing from the corpus can still be split into known pieces
+MARGIN = 2000
+NORMAL_PIECE_TYPE = sentencepiece_model_pb2.ModelProto.SentencePiece.NORMAL
+PRUNING_INFO_FILENAME = "vocab_pruning.json"
+
+
+def count_token_ids(tokenizer, texts: Sequence[str]) -> np.ndarray:
+    """Return how many times each token id of a tokenizer occurs in the texts."""
+    counts = np.zeros(len(tokenizer), dtype=np.int64)
+    for start in range(0, len(texts), TOKENIZE_CHUNK_SIZE):
+        end = start + TOKENIZE_CHUNK_SIZE
+        encodings = tokenizer(list(texts[start:end]), add_special_tokens=False)
+        for ids in encodings["input_ids"]:
+            counts += np.bincount(ids, minlength=len(counts))
+    return counts
+
+
+def select_token_ids(
+    tokenizer, counts: np.ndarray, min_count: int = 1, margin: int = MARGIN
+) -> List[int]:
+    """Return the sorted token ids to keep.
+
+    All special pieces and extra ids are kept, together with the pieces that
+    occur at least `min_count` times and the `margin` most likely of the rest.
+    """
+    proto = _load_model_proto(tokenizer)
+    num_pieces = len(proto.pieces)
+    keep = counts[:num_pieces] >= min_count
+    keep |= np.array([piece.type != NORMAL_PIECE_TYPE for piece in proto.pieces])
+
+    scores = np.array([piece.score for piece in proto.pieces])
+    unused = np.flatnonzero(~keep)
+    keep[unused[np.argsort(-scores[unused], kind="stable")[:margin]]] = True
+
+    num_extra_ids = tokenizer._extra_ids  # pylint: disable=protected-access
+    extra_ids = list(range(num_pieces, num_pieces + num_extra_ids))
+    return np.flatnonzero(keep).tolist() + extra_ids
+
+
+def prune_sentencepiece_model(tokenizer, token_ids: Sequence[int]) -> bytes:
+    """Return a serialized SentencePiece model with only the given pieces.
+
+    The pieces keep their order, so piece i of the pruned model is the piece
+    with the i:th smallest of the token ids.
+    """
+    proto = _load_model_proto(tokenizer)
+    pruned = sentencepiece_model_pb2.ModelProto()
+    pruned.CopyFrom(proto)
+    pruned.ClearField("pieces")
+    pruned.pieces.extend(proto.pieces[i] for i in token_ids if i < len(proto.pieces))
+    return pruned.SerializeToString()
+
+
+def prune_model_vocabulary(model, token_ids: Sequence[int]) -> None:
+    """Keep the rows of the token embeddings and LM head for the given ids."""
+    index = torch.tensor(token_ids, dtype=torch.long)
+    old_embeddings = model.get_input_embeddings()
+    new_embeddings = torch.nn.Embedding(len(token_ids), old_embeddings.embedding_dim)
+    new_embeddings.weight.data = old_embeddings.weight.data[index].clone()
+    model.set_input_embeddings(new_embeddings)
+
+    if not model.config.tie_word_embeddings:
+        old_lm_head = model.get_output_embeddings()
+        new_lm_head = torch.nn.Linear(
+            old_lm_head.in_features, len(token_ids), bias=False
+        )
+        new_lm_head.weight.data = old_lm_head.weight.data[index].clone()
+        model.set_output_embeddings(new_lm_head)
+    model.config.vocab_size = len(token_ids)
+    model.tie_weights()
+
+
+def prune_vocabulary(  # pylint: disable=too-many-arguments
+    model,
+    tokenizer,
+    texts: Sequence[str],
+    output_dir: Path,
+    min_count: int = 1,
+    margin: int = MARGIN,
+):
+    """Save a copy of a model and tokenizer with only the tokens the texts need.
+
+    Returns the pruned tokenizer. The model is pruned in place.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.info("Counting tokens in %s texts ...", len(texts))
+    counts = count_token_ids(tokenizer, texts)
+    token_ids = select_token_ids(tokenizer, counts, min_count, margin)
+    logger.info(
+        "Keeping %s of %s tokens, of which %s are used in the texts.",
+        len(token_ids),
+        model.config.vocab_size,
+        int((counts >= min_count).sum()),
+    )
+
+    vocab_file = output_dir / "spiece.model"
+    vocab_file.write_bytes(prune_sentencepiece_model(tokenizer, token_ids))
+    pruned_tokenizer = type(tokenizer)(
+        vocab_file=str(vocab_file),
+        extra_ids=tokenizer._extra_ids,  # pylint: disable=protected-access
+        sp_model_kwargs=tokenizer.sp_model_kwargs,
+        **{k: v for k, v in tokenizer.init_kwargs.items() if k == "legacy"},
+    )
+    pruned_tokenizer.save_pretrained(output_dir)
+
+    original_vocab_size = model.config.vocab_size
+    prune_model_vocabulary(model, token_ids)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    with open(output_dir / PRUNING_INFO_FILENAME, "w", encoding="utf-8") as info_file:
+        json.dump(
+            {
+                "original_vocab_size": original_vocab_size,
+                "vocab_size": len(token_ids),
+                "min_count": min_count,
+                "margin": margin,
+                "num_texts": len(texts),
+            },
+            info_file,
+            indent=2,
+        )
+    return pruned_tokenizer
+
+
+def _load_model_proto(tokenizer) -> sentencepiece_model_pb2.ModelProto:
+    """Return the SentencePiece model of a tokenizer as a protobuf message."""
+    proto = sentencepiece_model_pb2.ModelProto()
+    proto.ParseFromString(Path(tokenizer.vocab_file).read_bytes())
+    return proto